@@ -0,0 +1,108 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading, time
+from collections import deque
+
+ALERT_QUEUE_CAPACITY = 1024  # Max alerts waiting to be processed
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class AlertQueue(object):
+	'''Thread-safe FIFO of sensor alerts.
+
+	Appending and popping are O(1) (collections.deque). Consumers can block
+	until an alert arrives instead of polling, and producers are held back
+	(for up to a timeout) while the queue is at capacity.
+	'''
+
+	def __init__(self, capacity=ALERT_QUEUE_CAPACITY):
+		'''Init method for the alert queue.
+
+		:param int capacity: Max number of queued alerts (None for unbounded).
+
+		:return: AlertQueue object
+		'''
+
+		self.capacity = capacity
+		self._alerts = deque()
+		self._lock = threading.Lock()
+		self._not_empty = threading.Condition(self._lock)
+		self._not_full = threading.Condition(self._lock)
+
+	def __len__(self):
+		with self._lock:
+			return len(self._alerts)
+
+	def put(self, alert, timeout=None):
+		'''Adds an alert to the queue, waking up any waiting consumer. If the
+		queue is full, waits for room.
+
+		:param dict alert: Alert from a sensor.
+		:param float timeout: Max seconds to wait for room (None waits forever).
+
+		:return: True if the alert was queued, False if the queue stayed full.
+		'''
+
+		with self._not_full:
+			if self.capacity is not None:
+				deadline = None if timeout is None else _now() + timeout
+				while len(self._alerts) >= self.capacity:
+					remaining = None if deadline is None else deadline - _now()
+					if remaining is not None and remaining <= 0:
+						return False
+					self._not_full.wait(remaining)
+
+			self._alerts.append(alert)
+			self._not_empty.notify()
+
+		return True
+
+	def get(self, timeout=0):
+		'''Removes and returns the oldest alert.
+
+		:param float timeout: Max seconds to wait for an alert (None waits
+			forever, 0 doesn't wait).
+
+		:return: Alert dict, or None if no alert arrived in time.
+		'''
+
+		with self._not_empty:
+			if not self._waitForAlerts(timeout):
+				return None
+			alert = self._alerts.popleft()
+			self._not_full.notify()
+
+		return alert
+
+	def drain(self):
+		'''Removes and returns every queued alert, oldest first.'''
+
+		with self._lock:
+			alerts = list(self._alerts)
+			self._alerts.clear()
+			self._not_full.notify_all()
+
+		return alerts
+
+	def waitForAlerts(self, timeout=None):
+		'''Blocks until the queue is non-empty.
+
+		:return: True if there are alerts to process, False on timeout.
+		'''
+
+		with self._not_empty:
+			return self._waitForAlerts(timeout)
+
+	def _waitForAlerts(self, timeout):
+		if self._alerts or timeout == 0:
+			return bool(self._alerts)
+
+		deadline = None if timeout is None else _now() + timeout
+		while not self._alerts:
+			remaining = None if deadline is None else deadline - _now()
+			if remaining is not None and remaining <= 0:
+				return False
+			self._not_empty.wait(remaining)
+
+		return True
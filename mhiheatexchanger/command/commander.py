@@ -1,8 +1,22 @@
 # Author: "Mars Home Improvement" Space Apps 2017 Team.
 
-import time, os, sys
+import threading, time, os, sys
+from collections import OrderedDict
 sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
 
+from mhiheatexchanger.command.alertqueue import AlertQueue
+from mhiheatexchanger.command.inventory import InventoryWatcher, \
+	diffInventory, loadInventory, INVENTORY_PATH
+from mhiheatexchanger.command.ledger import FavorLedger
+from mhiheatexchanger.command.optimizer import HeatExchangePlanner, \
+	DIRECTION_HOT, DIRECTION_COLD
+from mhiheatexchanger.command.scheduler import PollScheduler
+from mhiheatexchanger.command.sharding import ShardedFleet
+from mhiheatexchanger.command.tempindex import TempIndex
+from mhiheatexchanger.history.rollups import CompactionJob
+from mhiheatexchanger.metrics.export import startExport
+from mhiheatexchanger.metrics.registry import getMetrics
+from mhiheatexchanger.sensor.fleetstate import FleetState
 from mhiheatexchanger.sensor.sensor import Sensor, DEBUG, \
 	CENTRAL_CMD_MESSAGE_COLD, CENTRAL_CMD_MESSAGE_HOT, CENTRAL_CMD_MESSAGE_HAPPY
 
@@ -21,72 +35,325 @@ ACTIVE_SENSORS = [
 	}
 ]
 
-ALERT_QUEUE_CHECK_PULSE = 5  # Interval (s) that central module checks for sensor alerts
+ALERT_QUEUE_CHECK_PULSE = 5  # Max time (s) central module waits for sensor alerts before reporting idle
+ALERT_QUEUE_PUT_TIMEOUT = 1  # Max time (s) a sensor waits for room in a full alert queue
+HELPER_COUNT = 1  # Max number of sensors that open their valves to help a HOT/COLD sensor
+PLANNER_ENABLED = True  # Plan HOT/COLD alerts in batches (needs NumPy), instead of one by one
+SHARD_WORKERS = 0  # Worker processes polling sensors, grouped by room (0 polls them all in this process)
 
 # Console message strings
 ALERT_SENSOR_HOT = "Sensor {0} too hot. Searching for cooler area..."
 ALERT_SENSOR_COLD = "Sensor {0} too cold. Searching for warmer area..."
 ALERT_FOUND_HELPER_SENSOR = "Sensor {0} to the rescue. Exchanging heat..."
 ALERT_CLOSING_HELPER_VALVE = "Sensor {0} temp is now nominal. Closing sensor {1} valve..."
-ALERT_CHECK_FOR_MORE  = "Checking for more alerts..."
+ALERT_HELPER_STILL_SERVING = "Sensor {0} temp is now nominal. Sensor {1} valve stays open for {2} other sensor(s)."
+ALERT_CLOSING_OWN_VALVE = "Sensor {0} temp is now nominal. Closing its valve..."
+ALERT_BATCH_STATS_MSG = "Processed {0} alerts ({1} after coalescing) at {2:.0f} alerts/s."
 ALERT_DONE_PROCESSING_QUEUE = "Alert queue has been fully processed."
 NO_WORK_MSG = "Queue empty: No work to do."
+ERROR_ALERT_QUEUE_FULL = "ERROR: Alert queue full. Dropped alert from sensor {0}."
+ERROR_SENSOR_SETUP = "ERROR: Could not set up sensor {0}: {1!r}"
+ERROR_INVENTORY_SHARDED = "ERROR: Sensor inventory can't be changed while sensors are sharded; restart to apply it."
 SHUTDOWN_MSG = "Shutting down command center..."
 
 SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID = 1
 
+_now = getattr(time, 'monotonic', time.time)
+
+# Hot path metrics (see mhiheatexchanger.metrics)
+_metrics = getMetrics()
+_ALERTS = _metrics.counter('controller.alerts')
+_ALERTS_COALESCED = _metrics.counter('controller.alerts_coalesced')
+_BATCH_ALERTS = _metrics.gauge('controller.batch_alerts')  # Alerts in the latest batch
+_BATCH_TIME = _metrics.histogram('controller.batch_seconds')  # processAlertQueue()
+_PLAN_TIME = _metrics.histogram('controller.plan_seconds')  # Batch heat exchange plan
+_ALERT_LATENCY = _metrics.histogram('controller.alert_latency_seconds')  # Queued until acted on
+
 class MissionControl(object):
 	'''Class for the central module that handles incoming alerts from sensors,
 	and issues commands for opening valves connected to sensors in the system, for 
 	heat exchange.
 
 	Future considerations:
-		- Handle sensors added/removed on the fly, w/o having to restart system.
 		- Expose REST API for receiving alerts from sensors, and issuing commands.
 	'''
 
-	def __init__(self):
+	def __init__(self, sensor_inventory=None, start_polling=True, \
+		shard_workers=SHARD_WORKERS, inventory_path=None, \
+		motion_executor=None, temp_log=None):
 		'''Init method for command module object. This requires an inventory of 
 		sensors in the ACTIVE_SENSORS dict.
-		'''
 
-		self.alert_queue = []  # List tracking alerts from sensors
-		self.favor_ledger = {}  # Dict tracking which sensors are currently helping others
+		:param list sensor_inventory: Optional list of sensor dicts to use
+			instead of ACTIVE_SENSORS.
+		:param bool start_polling: Whether to start polling the sensors right
+			away (set to False to drive runTempCheck() manually).
+		:param int shard_workers: Number of worker processes to poll the
+			sensors in (0 polls them in this process).
+		:param str inventory_path: Optional sensor inventory file to load the
+			sensors from (instead of sensor_inventory). The file is watched,
+			and sensors are added/removed as it changes (not when sharded).
+		:param MotionExecutor motion_executor: Optional executor for the valve
+			moves of the sensors polled here (defaults to the shared one).
+		:param TempLogWriter temp_log: Optional writer for the readings of the
+			sensors polled here (defaults to the shared one).
+		'''
 
-		# Generate list of currently-connected sensors
+		self.alert_queue = AlertQueue()  # Queue tracking alerts from sensors
+		self.favor_ledger = FavorLedger()  # Tracks which sensors are currently helping others
+		self.open_alerts = {}  # sensor_id -> HOT/COLD signal, until the sensor is HAPPY again
+		self.alert_stats = {'alerts': 0, 'coalesced': 0, 'seconds': 0.0}
+		self.motion_executor = motion_executor
+		self.temp_log = temp_log
+
+		# Sensors are polled from the scheduler's worker threads, so alert
+		# handling has to be serialized
+		self.alert_lock = threading.RLock()
+		self.scheduler = PollScheduler()
+		self.temp_index = TempIndex()  # Sensors ordered by latest temp reading
+		self.planner = None  # Batch heat exchange planner, if available
+		if PLANNER_ENABLED:
+			try:
+				self.planner = HeatExchangePlanner()
+			except ImportError:
+				pass
+
+		self.inventory_watcher = None
+		if inventory_path is not None:
+			sensor_inventory = loadInventory(inventory_path)
+			if shard_workers == 0:
+				self.inventory_watcher = InventoryWatcher(self, inventory_path)
+		elif sensor_inventory is None:
+			sensor_inventory = ACTIVE_SENSORS
+
+		# Generate list of currently-connected sensors. Their latest temps,
+		# valve states and threshold flags are kept in the fleet state
 		self.connected_sensors = []
-		for sensor in ACTIVE_SENSORS:
-			# Override for Space Apps 2017 demo on single Edison box (Sensor ID 1 
-			# is a 'virtual' sensor module -- it only has a dedicated temp sensor, 
-			# no LCD or stepper motor)
-			if sensor['sensor_id'] == SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID:
-				self.connected_sensors.append(Sensor(self, \
-					sensor['sensor_room'], sensor['sensor_name'], \
-					sensor['sensor_id'], sensor['temp_sensor_pin'], \
-					temp_sensor_only=True))			
-
-			# Otherwise, set up as a sensor module matching the HW schematic
-			else:
-				self.connected_sensors.append(Sensor(self, \
-					sensor['sensor_room'], sensor['sensor_name'], \
-					sensor['sensor_id'], sensor['temp_sensor_pin']))
+		self.sensors_by_id = {}
+		self.inventory = {}  # sensor_id -> sensor dict, for sensors polled here
+		self.polling = False
+		self.fleet = None  # Shard worker processes, if any
+		self.fleet_state = FleetState()
+		if shard_workers > 0:
+			self.fleet = ShardedFleet(self, sensor_inventory, shard_workers, \
+				SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID)
+			self.fleet_state = self.fleet.fleet_state  # In shared memory
+			for proxy in self.fleet.proxies:
+				self.connectSensor(proxy)
+			sensor_inventory = []
+
+		for sensor in sensor_inventory:
+			self.addSensor(sensor)
+
+		if self.inventory_watcher is not None:
+			self.inventory_watcher.start()
+
+		if start_polling:
+			self.startPolling()
+
+	def startPolling(self):
+		'''Starts the temp check loop on each active sensor. In standard mode,
+		every sensor is polled concurrently by the scheduler, with start times
+		staggered across one poll interval so that reads don't bunch up. In
+		sharded mode, the shard worker processes do the polling.
+		'''
 
-		# Now, start the temp check loop on each active sensor
-		for active_sensor in self.connected_sensors:
-			if DEBUG:
+		if DEBUG:
+			for active_sensor in self.connected_sensors:
 				active_sensor.runSensorTest()
-			else:
-				active_sensor.startSensor()
+			return True
+
+		if self.fleet is not None:
+			return self.fleet.start()
+
+		with self.alert_lock:
+			self.polling = True
+			sensor_count = len(self.inventory)
+			for index, sensor_id in enumerate(self.inventory):
+				active_sensor = self.sensors_by_id[sensor_id]
+				active_sensor.startPolling()
+				self.scheduler.addJob(sensor_id, \
+					active_sensor.runTempCheck, active_sensor.pollInterval, \
+					delay=active_sensor.pollInterval() * index / float(sensor_count))
+		self.scheduler.start()
+
+		return True
+
+	def shutdown(self):
+		'''Stops polling and tears down each sensor polled here.'''
+
+		print(SHUTDOWN_MSG)
+		if self.fleet is not None:
+			return self.fleet.stop()
+
+		if self.inventory_watcher is not None:
+			self.inventory_watcher.stop()
+		self.scheduler.stop()
+		for sensor_id in self.inventory:
+			self.sensors_by_id[sensor_id].teardown()
+
+		return True
+
+	def addSensor(self, sensor):
+		'''Sets up the Sensor for an inventory entry and connects it. If the
+		other sensors are already being polled, the new one starts polling
+		right away.
+
+		:param dict sensor: Sensor dict (as in ACTIVE_SENSORS).
+
+		:return: The new Sensor.
+		'''
+
+		# Override for Space Apps 2017 demo on single Edison box (Sensor ID 1 
+		# is a 'virtual' sensor module -- it only has a dedicated temp sensor, 
+		# no LCD or stepper motor). Otherwise, set up as a sensor module
+		# matching the HW schematic
+		new_sensor = Sensor(self, sensor['sensor_room'], sensor['sensor_name'], \
+			sensor['sensor_id'], sensor['temp_sensor_pin'], \
+			temp_sensor_only=sensor['sensor_id'] == SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID, \
+			motion_executor=self.motion_executor, temp_log=self.temp_log, \
+			fleet_state=self.fleet_state)
+
+		with self.alert_lock:
+			self.connectSensor(new_sensor)
+			self.inventory[new_sensor.sensor_id] = dict(sensor)
+			if self.polling:
+				new_sensor.startPolling()
+				self.scheduler.addJob(new_sensor.sensor_id, \
+					new_sensor.runTempCheck, new_sensor.pollInterval)
+
+		return new_sensor
+
+	def removeSensor(self, sensor_id):
+		'''Stops polling an inventory sensor and disconnects it, then tears
+		down its hardware handles (closing its valve). The other sensors are
+		left running.
+
+		:return: The removed Sensor, or None if it isn't in the inventory.
+		'''
+
+		with self.alert_lock:
+			if self.inventory.pop(sensor_id, None) is None:
+				return None
+
+		# Let a poll in flight finish before its temp sensor goes away
+		self.scheduler.removeJob(sensor_id, wait=True)
+		removed_sensor = self.disconnectSensor(sensor_id)
+		if removed_sensor is not None:
+			removed_sensor.teardown()
+
+		return removed_sensor
+
+	def applyInventory(self, sensor_inventory):
+		'''Brings the sensors polled here in line with a new inventory:
+		sensors that left it are removed, new ones are added, and ones whose
+		room, name or pin changed are set up again. Sensors that didn't
+		change keep running untouched, along with their valve state and
+		ledger entries. Can be called from any thread (e.g. the inventory
+		watcher's). A sensor that fails to come up is left out, and is
+		tried again the next time the inventory lists it as new.
+
+		:param list sensor_inventory: Sensor dicts (as in ACTIVE_SENSORS).
+
+		:return: (added, removed, changed), as from diffInventory().
+		'''
+
+		if self.fleet is not None:
+			print(ERROR_INVENTORY_SHARDED)
+			return [], [], []
+
+		added, removed, changed = diffInventory(self.inventory, sensor_inventory)
+		for sensor_id in removed:
+			self.removeSensor(sensor_id)
+		for sensor in changed:
+			self.removeSensor(sensor['sensor_id'])
+		for sensor in changed + added:
+			try:
+				self.addSensor(sensor)
+			except Exception as e:
+				print(ERROR_SENSOR_SETUP.format(sensor['sensor_id'], e))
+
+		return added, removed, changed
+
+	def connectSensor(self, sensor):
+		'''Adds a sensor to the system while it's running (e.g. a sensor
+		module that connected over the network). The sensor is expected to
+		poll itself; it's only registered for alerts and commands. Its state
+		has to be kept in this MissionControl's fleet_state.
+		'''
+
+		with self.alert_lock:
+			# A sensor replacing one with the same ID takes over its slot
+			self.disconnectSensor(sensor.sensor_id, release_slot=False)
+			self.connected_sensors.append(sensor)
+			self.sensors_by_id[sensor.sensor_id] = sensor
+			if sensor.latest_temp_c is not None:
+				self.temp_index.update(sensor.sensor_id, sensor.latest_temp_c)
+
+		return True
+
+	def disconnectSensor(self, sensor_id, release_slot=True):
+		'''Removes a sensor from the system, along with its temp index and
+		ledger entries.
+
+		:param int sensor_id: ID of the sensor to remove.
+		:param bool release_slot: Whether to free the sensor's fleet state
+			slot as well.
+
+		:return: The removed sensor, or None if it wasn't connected.
+		'''
+
+		with self.alert_lock:
+			sensor = self.sensors_by_id.pop(sensor_id, None)
+			if sensor is None:
+				return None
+
+			self.connected_sensors.remove(sensor)
+			if release_slot:
+				self.fleet_state.removeSensor(sensor_id)
+			self.temp_index.remove(sensor_id)
+			self.open_alerts.pop(sensor_id, None)
+
+			# Helpers that were only serving this sensor can close up
+			for helper_id in self.favor_ledger.removeSensor(sensor_id):
+				helper = self.sensors_by_id.get(helper_id)
+				if helper is not None:
+					self.sendCommandToSensor(helper, 'close_valve')
+
+		return sensor
 
 	@staticmethod
 	def receiveAlertFromSensor(self, alert):
 		'''Receives alerts from sensors when they pass the upper or lower temp
-		threshold. Possible future improvement: create separate thread for 
-		processAlertQueue() call.
+		threshold. The alert is queued, which immediately wakes up the main loop
+		waiting in checkAlertQueue(). If the queue is full, the sensor is held
+		back for up to ALERT_QUEUE_PUT_TIMEOUT seconds.
+
+		:return: True if the alert was queued, False if it was dropped.
+		'''
+
+		alert['queued_at'] = _now()
+		if not self.alert_queue.put(alert, timeout=ALERT_QUEUE_PUT_TIMEOUT):
+			print(ERROR_ALERT_QUEUE_FULL.format(alert['sensor'].sensor_id))
+			return False
+
+		# In test mode the sensors run before the main loop starts, so there's
+		# nothing waiting on the queue; process the alert right away instead
+		if DEBUG:
+			self.checkAlertQueue()
+
+		return True
+
+	def receiveTempFromSensor(self, sensor):
+		'''Receives a sensor's latest temp reading, keeping the temp index
+		used for picking helper sensors up to date.
 		'''
 
-		self.alert_queue.append(alert)
-		self.processAlertQueue()
+		# Not from a sensor that was removed while it was polling
+		if self.sensors_by_id.get(sensor.sensor_id) is not sensor:
+			return False
+
+		self.temp_index.update(sensor.sensor_id, sensor.latest_temp_c)
 
 		return True
 
@@ -98,117 +365,243 @@ class MissionControl(object):
 		return True
 
 	def closeAssistingSensorValves(self, sensor_to_help):
-		if sensor_to_help.sensor_id in self.favor_ledger.keys():
-			if len(self.favor_ledger[sensor_to_help.sensor_id]) > 0:
-				assisting_sensor = self.favor_ledger[sensor_to_help.sensor_id].pop(0)
-				print(ALERT_CLOSING_HELPER_VALVE.\
-					format(sensor_to_help.sensor_id, assisting_sensor))
-				for connected_sensor in self.connected_sensors:
-					if connected_sensor.sensor_id == assisting_sensor:
-						self.sendCommandToSensor(connected_sensor, 'close_valve')
-
-				if len(self.favor_ledger[sensor_to_help.sensor_id]) > 0:
-					self.closeAssistingSensorValves(sensor_to_help)
+		'''Settles the favors done for sensor_to_help, closing the valves of
+		the helpers that aren't still serving another sensor, and its own
+		valve unless it's still serving one.
+		'''
+
+		assisting_sensors, freed = self.favor_ledger.release(sensor_to_help.sensor_id)
+		freed = set(freed)
+		for assisting_sensor in assisting_sensors:
+			if assisting_sensor not in freed:
+				print(ALERT_HELPER_STILL_SERVING.format(sensor_to_help.sensor_id, \
+					assisting_sensor, self.favor_ledger.valveRefCount(assisting_sensor)))
+				continue
+
+			print(ALERT_CLOSING_HELPER_VALVE.\
+				format(sensor_to_help.sensor_id, assisting_sensor))
+			connected_sensor = self.sensors_by_id.get(assisting_sensor)
+			if connected_sensor is not None:
+				self.sendCommandToSensor(connected_sensor, 'close_valve')
+
+		ref_count = self.favor_ledger.valveRefCount(sensor_to_help.sensor_id)
+		if ref_count > 0:
+			print(ALERT_HELPER_STILL_SERVING.format(sensor_to_help.sensor_id, \
+				sensor_to_help.sensor_id, ref_count))
+		elif sensor_to_help.valve_open:
+			print(ALERT_CLOSING_OWN_VALVE.format(sensor_to_help.sensor_id))
+			self.sendCommandToSensor(sensor_to_help, 'close_valve')
 
 		return True
 
-	def checkAlertQueue(self):
-		'''Method for checking the alert queue on demand.'''
+	def checkAlertQueue(self, timeout=0):
+		'''Method for checking the alert queue on demand.
 
-		if len(self.alert_queue) > 0:
-			self.processAlertQueue()
-			return True
-		else:
+		:param float timeout: Max seconds to wait for an alert to arrive (None
+			waits forever, 0 doesn't wait).
+
+		:return: True if alerts were processed, False otherwise.
+		'''
+
+		if not self.alert_queue.waitForAlerts(timeout):
 			return False
 
+		with self.alert_lock:
+			self.processAlertQueue()
+
+		return True
+
 	def processAlertQueue(self):
 		'''Goes through queue of alerts from sensors, and decides what action
 		to take. Results in calls to self.sendCommandToSensor().
 
+		The whole queue is drained in one pass. Alerts are coalesced per
+		sensor_id first, so a sensor that sent several HOT/COLD/HAPPY alerts
+		since the last pass is only acted on for its newest state. HOT/COLD
+		alerts are then handled in order of their (predicted) threshold
+		crossing time, most urgent first.
+
 		Many possible future improvements in terms of algorithms that could be
 		used to optimize the heat exchange between hot/cold sensor areas.
+
+		:return: True if any alerts were processed, False if queue was empty.
 		'''
 
-		if len(self.alert_queue) == 0:
+		alerts = self.alert_queue.drain()
+		if len(alerts) == 0:
 			print(NO_WORK_MSG)
+			return False
 
-		elif len(self.alert_queue) > 0:
-			alert_to_process = self.alert_queue.pop(0)
-			print("Processing sensor alert...")
-			sensor_to_help = alert_to_process['sensor']
-			sensor_ask = alert_to_process['signal']
-			sensor_temp_c = sensor_to_help.latest_temp_c
-
-			if sensor_ask == CENTRAL_CMD_MESSAGE_HAPPY:
-				self.closeAssistingSensorValves(sensor_to_help)
-				return True
-
-			# If the sensor temp is too high, find first sensor with lower temp
-			elif sensor_ask == CENTRAL_CMD_MESSAGE_HOT:
-				print(ALERT_SENSOR_HOT.format(sensor_to_help.sensor_id))
-				for active_sensor in self.connected_sensors:
-					# Skip the current sensor being helped
-					if active_sensor.sensor_id == sensor_to_help.sensor_id:
-						active_sensor = None
-						pass
-					else:
-						if active_sensor.latest_temp_c < sensor_temp_c:
-							print(ALERT_FOUND_HELPER_SENSOR.format(active_sensor.sensor_id))
-							self.sendCommandToSensor(sensor_to_help, 'open_valve')
-							self.sendCommandToSensor(active_sensor, 'open_valve')
-
-						else:
-							active_sensor = None
-
-			# Else if sensor temp is too low, find sensor with higher temp
-			elif sensor_ask == CENTRAL_CMD_MESSAGE_COLD:
-				print(ALERT_SENSOR_COLD.format(sensor_to_help.sensor_id))
-				for active_sensor in self.connected_sensors:
-					# Skip the current sensor being helped
-					if active_sensor.sensor_id == sensor_to_help.sensor_id:
-						active_sensor = None
-						pass
-					else:
-						if active_sensor.latest_temp_c > sensor_temp_c:
-							print(ALERT_FOUND_HELPER_SENSOR.format(active_sensor.sensor_id))
-							self.sendCommandToSensor(sensor_to_help, 'open_valve')
-							self.sendCommandToSensor(active_sensor, 'open_valve')
-
-						else:
-							active_sensor = None
-
-			if active_sensor:  # If a sensor helped out, update the 'sensor IOU' ledger
-				if sensor_to_help.sensor_id in self.favor_ledger.keys():
-					sensors_curr_helping = self.favor_ledger[sensor_to_help.sensor_id]		
-					if active_sensor.sensor_id not in sensors_curr_helping:
-						self.favor_ledger[sensor_to_help.sensor_id].append(active_sensor.sensor_id)
-
-				else:
-					self.favor_ledger[sensor_to_help.sensor_id] = [active_sensor.sensor_id]
-
-			print(ALERT_CHECK_FOR_MORE)
-			if len(alert_to_process) > 0:  # Check for more alerts to process
-				self.processAlertQueue()
+		batch_start = _now()
+
+		newest_alerts = OrderedDict()  # sensor_id -> newest alert
+		for alert in alerts:
+			sensor_id = alert['sensor'].sensor_id
+			if self.sensors_by_id.get(sensor_id) is not alert['sensor']:
+				continue  # Sensor was removed since
+			newest_alerts.pop(sensor_id, None)  # Re-insert in arrival order
+			newest_alerts[sensor_id] = alert
+
+		exchange_alerts = []
+		for sensor_id, alert in newest_alerts.items():
+			if alert['signal'] in (CENTRAL_CMD_MESSAGE_HOT, CENTRAL_CMD_MESSAGE_COLD):
+				self.open_alerts[sensor_id] = alert['signal']
+				exchange_alerts.append(alert)
 			else:
-				print(ALERT_DONE_PROCESSING_QUEUE)
-				return True
+				self.open_alerts.pop(sensor_id, None)
+				self.processAlert(alert)
+
+		# Most urgent first: rooms past a threshold, then the ones predicted
+		# to pass one soonest
+		exchange_alerts.sort(key=lambda alert: alert.get('crossing_at', batch_start))
+
+		if self.planner is not None and len(exchange_alerts) > 0:
+			plan_start = _now()
+			self.planHeatExchange(exchange_alerts)
+			_PLAN_TIME.since(plan_start)
+		else:
+			for alert in exchange_alerts:
+				self.processAlert(alert)
+
+		batch_end = _now()
+		batch_seconds = batch_end - batch_start
+		_ALERTS.inc(len(alerts))
+		_ALERTS_COALESCED.inc(len(alerts) - len(newest_alerts))
+		_BATCH_ALERTS.set(len(alerts))
+		_BATCH_TIME.observe(batch_seconds)
+		for alert in alerts:
+			if 'queued_at' in alert:
+				_ALERT_LATENCY.observe(batch_end - alert['queued_at'])
+		self.alert_stats['alerts'] += len(alerts)
+		self.alert_stats['coalesced'] += len(alerts) - len(newest_alerts)
+		self.alert_stats['seconds'] += batch_seconds
+		print(ALERT_BATCH_STATS_MSG.format(len(alerts), len(newest_alerts), \
+			len(alerts) / batch_seconds if batch_seconds > 0 else float('inf')))
+		print(ALERT_DONE_PROCESSING_QUEUE)
+
+		return True
+
+	def processAlert(self, alert_to_process):
+		'''Decides what action to take for a single sensor alert.'''
+
+		print("Processing sensor alert...")
+		sensor_to_help = alert_to_process['sensor']
+		sensor_ask = alert_to_process['signal']
+		sensor_temp_c = sensor_to_help.latest_temp_c
+
+		if sensor_ask == CENTRAL_CMD_MESSAGE_HAPPY:
+			self.closeAssistingSensorValves(sensor_to_help)
+			return True
+
+		# If the sensor temp is too high, find the coldest sensor(s) with
+		# lower temp (sensors that haven't been polled yet aren't indexed)
+		elif sensor_ask == CENTRAL_CMD_MESSAGE_HOT:
+			print(ALERT_SENSOR_HOT.format(sensor_to_help.sensor_id))
+			candidates = self.temp_index.coldest(HELPER_COUNT, \
+				below=sensor_temp_c, exclude=(sensor_to_help.sensor_id,))
+
+		# Else if sensor temp is too low, find the hottest sensor(s) with
+		# higher temp
+		elif sensor_ask == CENTRAL_CMD_MESSAGE_COLD:
+			print(ALERT_SENSOR_COLD.format(sensor_to_help.sensor_id))
+			candidates = self.temp_index.hottest(HELPER_COUNT, \
+				above=sensor_temp_c, exclude=(sensor_to_help.sensor_id,))
+
+		else:
+			return False
+
+		helpers = []
+		for sensor_id, temp_c in candidates:
+			active_sensor = self.sensors_by_id[sensor_id]
+			print(ALERT_FOUND_HELPER_SENSOR.format(active_sensor.sensor_id))
+			if not active_sensor.valve_open:  # May already be serving another sensor
+				self.sendCommandToSensor(active_sensor, 'open_valve')
+			helpers.append(active_sensor)
+
+		if len(helpers) > 0 and not sensor_to_help.valve_open:
+			self.sendCommandToSensor(sensor_to_help, 'open_valve')
+
+		for active_sensor in helpers:
+			self.recordFavor(sensor_to_help, active_sensor)
+
+		return len(helpers) > 0
+
+	def planHeatExchange(self, alerts):
+		'''Answers a batch of HOT/COLD alerts together, using the planner to
+		pair hot and cold sensors across the whole system. Only valves that
+		aren't already open are moved.
+		'''
+
+		for alert in alerts:
+			message = ALERT_SENSOR_HOT if alert['signal'] == CENTRAL_CMD_MESSAGE_HOT \
+				else ALERT_SENSOR_COLD
+			print(message.format(alert['sensor'].sensor_id))
+
+		# Whole-fleet columns, straight from the fleet state
+		sensor_ids, sensor_temps, valve_open = self.fleet_state.snapshot()
+		sensor_ids = sensor_ids.tolist()
+		now = _now()
+		lead_times = [max(0.0, alert.get('crossing_at', now) - now) \
+			for alert in alerts]
+
+		pairs = self.planner.plan(\
+			[alert['sensor'].sensor_id for alert in alerts], \
+			[DIRECTION_HOT if alert['signal'] == CENTRAL_CMD_MESSAGE_HOT \
+				else DIRECTION_COLD for alert in alerts], \
+			sensor_ids, sensor_temps, valve_open, lead_times)
+
+		for sensor_id, helper_id in pairs:
+			sensor_to_help = self.sensors_by_id[sensor_id]
+			active_sensor = self.sensors_by_id[helper_id]
+			print(ALERT_FOUND_HELPER_SENSOR.format(active_sensor.sensor_id))
+			for valve_sensor in (active_sensor, sensor_to_help):
+				if not valve_sensor.valve_open:
+					self.sendCommandToSensor(valve_sensor, 'open_valve')
+			self.recordFavor(sensor_to_help, active_sensor)
+
+		return pairs
+
+	def recordFavor(self, sensor_to_help, active_sensor):
+		'''Updates the 'sensor IOU' ledger when a sensor helps out another.
+		If the helper is past the opposite threshold itself (a HOT/COLD pair),
+		the favor goes both ways, so neither valve closes while the other
+		sensor still needs it.
+
+		:return: True if the favor is new.
+		'''
+
+		helped_signal = self.open_alerts.get(sensor_to_help.sensor_id)
+		helper_signal = self.open_alerts.get(active_sensor.sensor_id)
+		if helped_signal is not None and helper_signal is not None and \
+			helped_signal != helper_signal:
+			self.favor_ledger.recordFavor(active_sensor.sensor_id, \
+				sensor_to_help.sensor_id)
+
+		return self.favor_ledger.recordFavor(sensor_to_help.sensor_id, \
+			active_sensor.sensor_id)
 
 def main():
 	'''Main loop for executing command center. To quit, just kill the process
 	(ctrl+c).
 	'''
 
-	houston = MissionControl()
+	houston = MissionControl(inventory_path=INVENTORY_PATH \
+		if os.path.exists(INVENTORY_PATH) else None)
+	exporters = startExport()
+	compaction = CompactionJob()
+	compaction.start()
 
 	try:	
 		while True:
-			work_to_do = houston.checkAlertQueue()
+			work_to_do = houston.checkAlertQueue(timeout=ALERT_QUEUE_CHECK_PULSE)
 			if not work_to_do:
 				print(NO_WORK_MSG)
-				time.sleep(ALERT_QUEUE_CHECK_PULSE)
 
-	except KeyboardInterrupt:
-		print(SHUTDOWN_MSG)
+	except (KeyboardInterrupt, SystemExit):
+		compaction.stop()
+		houston.shutdown()
+		for exporter in exporters:
+			exporter.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Sensor inventory file. A JSON list of sensor dicts, in the same form as
+# ACTIVE_SENSORS:
+#
+#   [
+#       {"sensor_id": 0, "sensor_room": "Room_A", "sensor_name": "Sensor_1",
+#        "temp_sensor_pin": 0},
+#       ...
+#   ]
+
+import json, os, threading
+
+INVENTORY_PATH = os.path.join(os.path.expanduser("~"), "mhiSensors.json")
+INVENTORY_CHECK_INTERVAL = 5  # Seconds between checks for inventory file changes
+INVENTORY_KEYS = ('sensor_id', 'sensor_room', 'sensor_name', 'temp_sensor_pin')
+
+ERROR_INVENTORY_FORMAT = "Sensor inventory must be a list of sensor dicts with keys {0}."
+ERROR_INVENTORY_DUPLICATE = "Sensor inventory lists sensor {0} more than once."
+ERROR_INVENTORY_RELOAD = "ERROR: Could not reload sensor inventory {0}: {1}"
+INVENTORY_RELOADED_MSG = "Sensor inventory reloaded: {0} added, {1} removed, {2} changed."
+
+
+def loadInventory(path=INVENTORY_PATH):
+	'''Reads and checks a sensor inventory file.
+
+	:return: List of sensor dicts. Raises ValueError if the file isn't a
+		valid inventory (and IOError/OSError if it can't be read).
+	'''
+
+	with open(path) as inventory_file:
+		inventory = json.load(inventory_file)
+
+	if not isinstance(inventory, list):
+		raise ValueError(ERROR_INVENTORY_FORMAT.format(", ".join(INVENTORY_KEYS)))
+
+	sensor_ids = set()
+	for sensor in inventory:
+		if not isinstance(sensor, dict) or \
+			any(key not in sensor for key in INVENTORY_KEYS):
+			raise ValueError(ERROR_INVENTORY_FORMAT.format(", ".join(INVENTORY_KEYS)))
+		if sensor['sensor_id'] in sensor_ids:
+			raise ValueError(ERROR_INVENTORY_DUPLICATE.format(sensor['sensor_id']))
+		sensor_ids.add(sensor['sensor_id'])
+
+	return inventory
+
+
+def diffInventory(current, inventory):
+	'''Compares two inventories by sensor_id.
+
+	:param dict current: sensor_id -> sensor dict of the running sensors.
+	:param list inventory: Sensor dicts wanted from now on.
+
+	:return: (added, removed, changed): sensor dicts to add, sensor_ids to
+		remove, and sensor dicts whose room, name or pin changed.
+	'''
+
+	wanted = dict((sensor['sensor_id'], sensor) for sensor in inventory)
+	added = [sensor for sensor_id, sensor in wanted.items() \
+		if sensor_id not in current]
+	removed = [sensor_id for sensor_id in current if sensor_id not in wanted]
+	changed = [sensor for sensor_id, sensor in wanted.items() \
+		if sensor_id in current and any(current[sensor_id].get(key) != \
+			sensor.get(key) for key in INVENTORY_KEYS)]
+
+	return added, removed, changed
+
+
+class InventoryWatcher(object):
+	'''Watches a sensor inventory file, and applies it to a MissionControl
+	whenever it changes (see MissionControl.applyInventory()). The file's
+	modification time and size are checked every INVENTORY_CHECK_INTERVAL
+	seconds; a file that can't be read or isn't a valid inventory (e.g. one
+	caught halfway through being saved) is skipped until it changes again.
+	'''
+
+	def __init__(self, commander, path=INVENTORY_PATH, \
+		check_interval=INVENTORY_CHECK_INTERVAL):
+		'''Init method for the watcher. Nothing is watched until start().
+
+		:param MissionControl commander: Central module to apply changes to.
+		:param str path: Inventory file to watch.
+		:param float check_interval: Seconds between checks.
+
+		:return: InventoryWatcher object
+		'''
+
+		self.commander = commander
+		self.path = path
+		self.check_interval = check_interval
+		self._signature = self._fileSignature()  # Already applied
+		self._stopped = threading.Event()
+		self._thread = None
+
+	def start(self):
+		'''Starts checking the file for changes in the background.'''
+
+		self._stopped.clear()
+		self._thread = threading.Thread(target=self._run, \
+			name="mhi-inventory-watcher")
+		self._thread.daemon = True
+		self._thread.start()
+
+		return True
+
+	def stop(self):
+		'''Stops checking the file.'''
+
+		self._stopped.set()
+		if self._thread is not None and \
+			self._thread is not threading.current_thread():
+			self._thread.join()
+
+		return True
+
+	def check(self):
+		'''Applies the inventory file if it changed since the last check.
+
+		:return: True if a new inventory was applied.
+		'''
+
+		signature = self._fileSignature()
+		if signature is None or signature == self._signature:
+			return False
+
+		try:
+			inventory = loadInventory(self.path)
+		except (IOError, OSError, ValueError) as e:
+			print(ERROR_INVENTORY_RELOAD.format(self.path, e))
+			self._signature = signature  # Don't retry until it changes again
+			return False
+
+		self._signature = signature
+		added, removed, changed = self.commander.applyInventory(inventory)
+		print(INVENTORY_RELOADED_MSG.format(len(added), len(removed), len(changed)))
+
+		return True
+
+	def _fileSignature(self):
+		try:
+			stat = os.stat(self.path)
+		except OSError:
+			return None
+
+		return (stat.st_mtime, stat.st_size)
+
+	def _run(self):
+		while not self._stopped.wait(self.check_interval):
+			try:
+				self.check()
+			except Exception as e:
+				print(ERROR_INVENTORY_RELOAD.format(self.path, repr(e)))
@@ -0,0 +1,122 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading
+from collections import OrderedDict
+
+
+class FavorLedger(object):
+	'''The 'sensor IOU' ledger: which sensors are helping which.
+
+	Kept in both directions as insertion-ordered sets (OrderedDicts with no
+	values): helped sensor -> its helpers, and helper -> the sensors it's
+	serving. A sensor's valve is open for as long as it's serving anyone or
+	being helped itself, so the size of its serving set (plus one while it's
+	being helped) is the reference count on that valve. Recording,
+	releasing and membership checks are all O(1) per favor.
+
+	Supports 'sensor_id in ledger' and 'ledger[sensor_id]' (the helpers of
+	a helped sensor), like the plain dict it replaces.
+	'''
+
+	def __init__(self):
+		self._helpers = {}  # helped sensor_id -> OrderedDict of helper sensor_ids
+		self._serving = {}  # helper sensor_id -> OrderedDict of helped sensor_ids
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		with self._lock:
+			return len(self._helpers)
+
+	def __contains__(self, sensor_id):
+		with self._lock:
+			return sensor_id in self._helpers
+
+	def __getitem__(self, sensor_id):
+		with self._lock:
+			return list(self._helpers[sensor_id])
+
+	def recordFavor(self, helped_id, helper_id):
+		'''Records that helper_id is helping helped_id.
+
+		:return: True if the favor is new.
+		'''
+
+		with self._lock:
+			helpers = self._helpers.setdefault(helped_id, OrderedDict())
+			if helper_id in helpers:
+				return False
+			helpers[helper_id] = None
+			self._serving.setdefault(helper_id, OrderedDict())[helped_id] = None
+
+		return True
+
+	def helpers(self, helped_id):
+		'''Returns the sensors helping helped_id, in the order they started.'''
+
+		with self._lock:
+			return list(self._helpers.get(helped_id, ()))
+
+	def serving(self, helper_id):
+		'''Returns the sensors helper_id is helping, in the order it started.'''
+
+		with self._lock:
+			return list(self._serving.get(helper_id, ()))
+
+	def valveRefCount(self, sensor_id):
+		'''Returns the number of sensors holding sensor_id's valve open: the
+		ones it's serving, plus itself while it's being helped.
+		'''
+
+		with self._lock:
+			return self._refCount(sensor_id)
+
+	def release(self, helped_id):
+		'''Settles every favor done for helped_id.
+
+		:return: (helper_ids, freed_ids): every sensor that was helping, and
+			those of them whose valves nobody holds open any more (so they
+			can close).
+		'''
+
+		with self._lock:
+			helpers = self._helpers.pop(helped_id, ())
+			for helper_id in helpers:
+				self._drop(self._serving, helper_id, helped_id)
+			freed = [helper_id for helper_id in helpers \
+				if self._refCount(helper_id) == 0]
+
+		return list(helpers), freed
+
+	def removeSensor(self, sensor_id):
+		'''Drops every favor done for or by sensor_id.
+
+		:return: IDs of helpers whose valves nobody holds open any more.
+		'''
+
+		helpers, freed = self.release(sensor_id)
+		with self._lock:
+			for helped_id in self._serving.pop(sensor_id, ()):
+				self._drop(self._helpers, helped_id, sensor_id)
+
+		return freed
+
+	def _refCount(self, sensor_id):
+		return len(self._serving.get(sensor_id, ())) + \
+			(1 if sensor_id in self._helpers else 0)
+
+	@staticmethod
+	def _drop(index, key, sensor_id):
+		'''Removes sensor_id from index[key].
+
+		:return: True if index[key] is now empty (and was removed).
+		'''
+
+		entries = index.get(key)
+		if entries is None:
+			return False
+		entries.pop(sensor_id, None)
+		if len(entries) > 0:
+			return False
+		del index[key]
+
+		return True
@@ -0,0 +1,201 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+VALVE_MOVE_COST = 1.0  # Cost of one valve move, in deg C of temp differential
+CANDIDATES_PER_ALERT = 8  # Best helpers considered per alert in each greedy round
+URGENCY_WEIGHT = 0.1  # Score bonus per second an alert's crossing is ahead of the batch's latest
+
+DIRECTION_HOT = 1  # Sensor needs a colder helper
+DIRECTION_COLD = -1  # Sensor needs a hotter helper
+
+ERROR_NUMPY_REQUIRED = "NumPy is required for the heat exchange planner."
+
+
+def _numpy():
+	try:
+		import numpy
+	except ImportError:
+		raise ImportError(ERROR_NUMPY_REQUIRED)
+
+	return numpy
+
+
+def _linearSumAssignment():
+	try:
+		from scipy.optimize import linear_sum_assignment
+	except ImportError:
+		return None
+
+	return linear_sum_assignment
+
+
+class HeatExchangePlanner(object):
+	'''Plans which sensors should exchange heat, for a whole batch of HOT and
+	COLD alerts at once.
+
+	Every alerting sensor is paired with at most one helper, and every sensor
+	takes part in at most one pair. Pairs are scored by their temp
+	differential (bigger means faster equalization), minus VALVE_MOVE_COST
+	for each valve that still has to be opened. Pairing a HOT sensor with a
+	COLD sensor answers two alerts with one pair, so it gets a bonus worth
+	the two valve moves it saves. Alerts whose threshold crossing is sooner
+	get a bonus of URGENCY_WEIGHT per second, so they're served first when
+	helpers are scarce.
+
+	The score matrix is built with NumPy for all alerts against all sensors.
+	Pairs are then picked greedily by score. When SciPy is available, an
+	optimal assignment is solved as well, and the better of the two plans
+	is used.
+	'''
+
+	def __init__(self, valve_move_cost=VALVE_MOVE_COST, \
+		candidates_per_alert=CANDIDATES_PER_ALERT, urgency_weight=URGENCY_WEIGHT):
+		'''Init method for the planner. Raises ImportError if NumPy is missing.
+
+		:param float valve_move_cost: Score penalty per valve that has to open.
+		:param int candidates_per_alert: Helpers considered per alert in each
+			greedy round.
+		:param float urgency_weight: Score bonus per second of lead time an
+			alert has over the least urgent alert in the batch.
+
+		:return: HeatExchangePlanner object
+		'''
+
+		self.np = _numpy()
+		self.valve_move_cost = valve_move_cost
+		self.candidates_per_alert = candidates_per_alert
+		self.urgency_weight = urgency_weight
+
+	def plan(self, alert_ids, alert_directions, sensor_ids, sensor_temps, \
+		valve_open, alert_lead_times=None):
+		'''Plans heat exchange pairs for a batch of alerts.
+
+		:param list alert_ids: sensor_id of each alerting sensor.
+		:param list alert_directions: DIRECTION_HOT or DIRECTION_COLD per alert.
+		:param list sensor_ids: sensor_id of every sensor in the system.
+		:param sensor_temps: Latest temp (deg C) per sensor (NaN if unknown).
+		:param valve_open: Whether each sensor's valve is currently open.
+		:param alert_lead_times: Optional seconds until each alerting sensor
+			passes its threshold (0 if it already has).
+
+		:return: List of (alerting sensor_id, helper sensor_id) pairs.
+		'''
+
+		np = self.np
+		if len(alert_ids) == 0 or len(sensor_ids) == 0:
+			return []
+
+		score, rows = self.scoreMatrix(alert_ids, alert_directions, \
+			sensor_ids, sensor_temps, valve_open)
+		if alert_lead_times is not None and len(alert_lead_times) > 0:
+			lead_times = np.asarray(alert_lead_times, dtype=float)
+			score += self.urgency_weight * \
+				(lead_times.max() - lead_times)[:, None]  # -inf stays -inf
+
+		plan = self._greedy(score, rows, np.zeros(len(sensor_ids), dtype=bool))
+
+		linear_sum_assignment = _linearSumAssignment()
+		if linear_sum_assignment is not None:
+			finite = np.where(np.isfinite(score), score, -1e9)
+			assigned_rows, assigned_cols = linear_sum_assignment(-finite)
+			pair_scores = score[assigned_rows, assigned_cols]
+			order = np.argsort(-pair_scores, kind="stable")
+			order = order[np.isfinite(pair_scores[order])]
+
+			# An alerting sensor can be both assigned a helper and picked as
+			# someone else's helper; keep the better pair, then fill any
+			# alerts left over greedily
+			used = np.zeros(len(sensor_ids), dtype=bool)
+			assigned = self._accept(rows, assigned_rows[order], \
+				assigned_cols[order], used)
+			assigned.extend(self._greedy(score, rows, used))
+			if self._planValue(score, rows, assigned) > \
+				self._planValue(score, rows, plan):
+				plan = assigned
+
+		return [(sensor_ids[rows[a]], sensor_ids[j]) for a, j in plan]
+
+	def scoreMatrix(self, alert_ids, alert_directions, sensor_ids, \
+		sensor_temps, valve_open):
+		'''Builds the alerts x sensors score matrix (-inf where a sensor can't
+		help) and the sensor slot of each alert.
+		'''
+
+		np = self.np
+		slots = dict((sensor_id, slot) for slot, sensor_id in enumerate(sensor_ids))
+		rows = np.array([slots[sensor_id] for sensor_id in alert_ids], dtype=int)
+		directions = np.asarray(alert_directions, dtype=float)
+		temps = np.asarray(sensor_temps, dtype=float)
+		closed = ~np.asarray(valve_open, dtype=bool)
+
+		sensor_directions = np.zeros(len(sensor_ids))
+		sensor_directions[rows] = directions
+
+		# Positive where the helper is on the right side of the alerting sensor
+		differential = directions[:, None] * (temps[rows][:, None] - temps[None, :])
+		feasible = differential > 0  # False for NaN (unpolled) temps too
+		feasible[np.arange(len(rows)), rows] = False
+		# Sensors alerting in the same direction can't help each other
+		feasible &= sensor_directions[None, :] != directions[:, None]
+
+		moves = closed[rows][:, None].astype(float) + closed[None, :]
+		answers_both = sensor_directions[None, :] == -directions[:, None]
+		score = differential - self.valve_move_cost * moves + \
+			2 * self.valve_move_cost * answers_both
+		score[~feasible] = -np.inf
+
+		return score, rows
+
+	def _greedy(self, score, rows, used):
+		'''Picks pairs in descending score order, in rounds: each round only
+		looks at the best few candidates per remaining alert, so the sort
+		stays small even for thousands of sensors.
+		'''
+
+		np = self.np
+		plan = []
+		pending = np.flatnonzero(~used[rows])
+		while len(pending) > 0:
+			candidates = score[pending]  # Fancy indexing makes a copy
+			candidates[:, used] = -np.inf
+			count = min(self.candidates_per_alert, candidates.shape[1])
+			best = np.argpartition(-candidates, count - 1, axis=1)[:, :count]
+			best_scores = np.take_along_axis(candidates, best, axis=1)
+
+			order = np.argsort(-best_scores, axis=None, kind="stable")
+			order = order[np.isfinite(best_scores.ravel()[order])]
+			if len(order) == 0:
+				break
+
+			alert_positions, candidate_positions = np.unravel_index(order, \
+				best_scores.shape)
+			accepted = self._accept(rows, pending[alert_positions], \
+				best[alert_positions, candidate_positions], used)
+			if not accepted:
+				break
+			plan.extend(accepted)
+
+			pending = pending[~used[rows[pending]]]
+
+		return plan
+
+	def _accept(self, rows, alerts, helpers, used):
+		'''Accepts (alert, helper) pairs in the given order, skipping pairs
+		that involve a sensor already in a pair. Updates used in place.
+		'''
+
+		accepted = []
+		for a, j in zip(alerts.tolist(), helpers.tolist()):
+			if used[rows[a]] or used[j]:
+				continue
+			used[rows[a]] = used[j] = True
+			accepted.append((a, j))
+
+		return accepted
+
+	def _planValue(self, score, rows, plan):
+		'''Ranks plans by alerts answered, then by total score.'''
+
+		alert_slots = set(rows.tolist())
+		answered = sum(2 if j in alert_slots else 1 for a, j in plan)
+
+		return answered, sum(score[a, j] for a, j in plan)
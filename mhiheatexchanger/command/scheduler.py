@@ -0,0 +1,226 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+from __future__ import print_function
+
+import heapq, itertools, math, threading, time
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+DEFAULT_POLL_WORKERS = 8  # Threads available for running sensor polls
+
+# Console message strings
+ERROR_POLL_FAILED = "ERROR: Poll for job {0} failed: {1!r}"
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class _PollJob(object):
+	'''Bookkeeping for one periodically-polled task.'''
+
+	__slots__ = ('key', 'task', 'interval', 'due', 'cancelled', 'in_flight', \
+		'runs', 'overruns', 'max_lateness')
+
+	def __init__(self, key, task, interval, due):
+		self.key = key
+		self.task = task
+		self.interval = interval
+		self.due = due
+		self.cancelled = False
+		self.in_flight = False
+		self.runs = 0
+		self.overruns = 0
+		self.max_lateness = 0.0
+
+	def nextInterval(self):
+		if callable(self.interval):
+			return float(self.interval())
+		return float(self.interval)
+
+
+class PollScheduler(object):
+	'''Runs many periodic tasks (typically Sensor.runTempCheck) concurrently,
+	each on its own cadence.
+
+	Due times are kept in a heap that a single dispatcher thread sleeps on;
+	due jobs are handed to a fixed pool of worker threads, so a slow temp read
+	or stepper move only ties up the worker running it. A job is never in
+	flight twice: it goes back into the heap only once its run finishes. Next
+	due times are computed from the previous *due* time rather than from when
+	the run finished, so poll jitter does not accumulate. If a run overruns
+	one or more whole intervals, the missed slots are skipped instead of being
+	run back to back.
+	'''
+
+	def __init__(self, worker_count=DEFAULT_POLL_WORKERS):
+		'''Init method for the scheduler.
+
+		:param int worker_count: Number of worker threads running polls.
+
+		:return: PollScheduler object
+		'''
+
+		self.worker_count = worker_count
+		self._heap = []
+		self._jobs = {}
+		self._seq = itertools.count()
+		self._cond = threading.Condition()
+		self._work = queue.Queue()
+		self._threads = []
+		self._running = False
+
+	def addJob(self, key, task, interval, delay=0):
+		'''Schedules task() to run every interval seconds.
+
+		:param key: Unique, hashable key for the job (e.g. a sensor_id).
+		:param callable task: Function to call on every poll.
+		:param interval: Seconds between polls, or a callable returning the
+			number of seconds to wait before the next poll.
+		:param float delay: Seconds to wait before the first poll.
+
+		:return: True
+		'''
+
+		with self._cond:
+			if key in self._jobs:
+				self._jobs[key].cancelled = True
+			job = _PollJob(key, task, interval, _now() + delay)
+			self._jobs[key] = job
+			heapq.heappush(self._heap, (job.due, next(self._seq), job))
+			self._cond.notify()
+
+		return True
+
+	def removeJob(self, key, wait=False):
+		'''Stops polling the job with the given key. A run already in flight
+		is allowed to finish, but the job is not rescheduled.
+
+		:param bool wait: Whether to wait for a run in flight to finish (don't
+			use from within the job's own task).
+
+		:return: True if the job existed, False otherwise.
+		'''
+
+		with self._cond:
+			job = self._jobs.pop(key, None)
+			if job is None:
+				return False
+			job.cancelled = True
+			while wait and job.in_flight and self._running:
+				self._cond.wait()
+
+		return True
+
+	def start(self):
+		'''Starts the dispatcher and worker threads.'''
+
+		with self._cond:
+			if self._running:
+				return False
+			self._running = True
+
+		self._threads = [threading.Thread(target=self._dispatch, \
+			name="mhi-poll-dispatch")]
+		for i in range(self.worker_count):
+			self._threads.append(threading.Thread(target=self._runWorker, \
+				name="mhi-poll-worker-{0}".format(i)))
+		for thread in self._threads:
+			thread.daemon = True
+			thread.start()
+
+		return True
+
+	def stop(self, timeout=None):
+		'''Stops dispatching polls and waits for in-flight polls to finish.'''
+
+		with self._cond:
+			if not self._running:
+				return False
+			self._running = False
+			self._cond.notify_all()
+
+		for i in range(self.worker_count):
+			self._work.put(None)
+		for thread in self._threads:
+			if thread is not threading.current_thread():
+				thread.join(timeout)
+		self._threads = []
+
+		return True
+
+	def stats(self):
+		'''Returns dict of per-job poll counts, overruns and worst lateness (s).'''
+
+		with self._cond:
+			return dict((job.key, {
+				'runs': job.runs,
+				'overruns': job.overruns,
+				'max_lateness': job.max_lateness
+			}) for job in self._jobs.values())
+
+	def _dispatch(self):
+		with self._cond:
+			while self._running:
+				if not self._heap:
+					self._cond.wait()
+					continue
+
+				due = self._heap[0][0]
+				now = _now()
+				if due > now:
+					self._cond.wait(due - now)
+					continue
+
+				job = heapq.heappop(self._heap)[2]
+				if not job.cancelled:
+					job.max_lateness = max(job.max_lateness, now - job.due)
+					job.in_flight = True
+					self._work.put(job)
+
+	def _runWorker(self):
+		while True:
+			job = self._work.get()
+			if job is None:
+				return
+
+			with self._cond:
+				if job.cancelled:  # Removed while queued; don't run it
+					job.in_flight = False
+					self._cond.notify_all()
+					continue
+
+			try:
+				job.task()
+			except Exception as e:
+				print(ERROR_POLL_FAILED.format(job.key, e))
+
+			try:
+				interval = job.nextInterval()
+			except Exception as e:
+				print(ERROR_POLL_FAILED.format(job.key, e))
+				with self._cond:
+					job.in_flight = False
+					self._cond.notify_all()
+				continue  # Drop a job whose cadence can't be determined
+
+			with self._cond:
+				job.runs += 1
+				job.in_flight = False
+				self._cond.notify_all()  # Wakes up removeJob(wait=True)
+				if job.cancelled or not self._running:
+					continue
+
+				job.due += interval
+				now = _now()
+				if job.due < now:  # Overran: skip the slots already missed
+					missed = int(math.ceil((now - job.due) / interval)) \
+						if interval > 0 else 0
+					job.due += missed * interval
+					job.overruns += 1
+					if job.due < now:
+						job.due = now
+
+				heapq.heappush(self._heap, (job.due, next(self._seq), job))
+				self._cond.notify()
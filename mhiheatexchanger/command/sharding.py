@@ -0,0 +1,335 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import heapq, multiprocessing, threading, time
+from collections import OrderedDict
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+from mhiheatexchanger.command.scheduler import PollScheduler
+from mhiheatexchanger.metrics.registry import getMetrics
+from mhiheatexchanger.sensor.fleetstate import FleetState, FleetStateView
+from mhiheatexchanger.sensor.sensor import Sensor
+
+SHARD_SYNC_INTERVAL = 1.0  # Seconds between temp index syncs from shared memory
+SHARD_STOP_TIMEOUT = 10  # Seconds to wait for a worker process to tear down its sensors
+SHARD_VALVE_ORDER_TIMEOUT = 5.0  # Max seconds a sent valve order stands in for the worker's valve state
+SHARD_METRICS_INTERVAL = 10  # Seconds between metrics snapshots sent by each worker
+SHARD_METRICS_MESSAGE = "metrics"  # In place of a sensor_id on the alert queue
+
+ERROR_SHARD_COMMAND_FAILED = "ERROR: Shard command for sensor {0} failed: {1!r}"
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+def shardRooms(sensor_inventory, shard_count):
+	'''Splits a sensor inventory into shard_count groups, keeping every room
+	in one group (so each room's readings and log files belong to a single
+	process). Rooms are handed out biggest first, each to the group with the
+	fewest sensors so far.
+
+	:return: List of shard_count lists of sensor dicts.
+	'''
+
+	rooms = OrderedDict()
+	for sensor in sensor_inventory:
+		rooms.setdefault(sensor['sensor_room'], []).append(sensor)
+
+	shards = [[] for i in range(shard_count)]
+	loads = [(0, i) for i in range(shard_count)]
+	for room_sensors in sorted(rooms.values(), key=len, reverse=True):
+		load, i = heapq.heappop(loads)
+		shards[i].extend(room_sensors)
+		heapq.heappush(loads, (load + len(room_sensors), i))
+
+	return shards
+
+
+class ShardCommander(object):
+	'''Stands in for MissionControl inside a shard worker process: sensors
+	keep their readings and valve state in the shared fleet state, so only
+	their alerts are sent to the coordinator.
+	'''
+
+	def __init__(self, alert_queue):
+		self.alert_queue = alert_queue
+		self.favor_ledger = {}  # Kept by the coordinator
+
+	@staticmethod
+	def receiveAlertFromSensor(self, alert):
+		sensor = alert['sensor']
+		crossing_in = None
+		if 'crossing_at' in alert:
+			crossing_in = max(0.0, alert['crossing_at'] - _now())
+		self.alert_queue.put((sensor.sensor_id, alert['signal'], crossing_in))
+
+		return True
+
+	def receiveTempFromSensor(self, sensor):
+		return True  # Already in shared memory
+
+
+def _runShard(shard_index, sensor_inventory, fleet_state, alert_queue, \
+	command_queue, virtual_sensor_id):
+	'''Worker process: polls one shard of sensors, and runs the valve
+	commands sent by the coordinator until it's told to stop (None). The
+	worker's metrics (sensor.*, valve.*) are sent to the coordinator every
+	SHARD_METRICS_INTERVAL seconds, and once more on the way out.
+	'''
+
+	commander = ShardCommander(alert_queue)
+	scheduler = PollScheduler()
+	sensors = {}
+	for index, sensor in enumerate(sensor_inventory):
+		shard_sensor = Sensor(commander, sensor['sensor_room'], \
+			sensor['sensor_name'], sensor['sensor_id'], \
+			sensor['temp_sensor_pin'], \
+			temp_sensor_only=sensor['sensor_id'] == virtual_sensor_id, \
+			fleet_state=fleet_state)  # Slots were allocated by the coordinator
+		sensors[shard_sensor.sensor_id] = shard_sensor
+		shard_sensor.startPolling()
+		scheduler.addJob(shard_sensor.sensor_id, shard_sensor.runTempCheck, \
+			shard_sensor.pollInterval, delay=shard_sensor.pollInterval() * \
+			index / float(len(sensor_inventory)))
+	scheduler.start()
+
+	last_metrics = _now()
+	try:
+		while True:
+			try:
+				command = command_queue.get(timeout=SHARD_METRICS_INTERVAL)
+			except queue.Empty:
+				command = ()
+			if command is None:
+				break
+
+			if command:
+				sensor_id, orders = command
+				try:
+					shard_sensor = sensors[sensor_id]
+					shard_sensor.respondToMissionControl(shard_sensor, orders)
+				except Exception as e:
+					print(ERROR_SHARD_COMMAND_FAILED.format(sensor_id, e))
+
+			if _now() - last_metrics >= SHARD_METRICS_INTERVAL:
+				alert_queue.put((SHARD_METRICS_MESSAGE, shard_index, \
+					getMetrics().snapshot()))
+				last_metrics = _now()
+
+	except (KeyboardInterrupt, SystemExit):
+		pass
+
+	scheduler.stop()
+	for shard_sensor in sensors.values():
+		shard_sensor.teardown()
+	alert_queue.put((SHARD_METRICS_MESSAGE, shard_index, getMetrics().snapshot()))
+
+
+class ShardSensorProxy(FleetStateView):
+	'''Stands in for a Sensor running in a shard worker, inside the
+	coordinator's MissionControl. Temps and valve state are read straight
+	from the shared fleet state; valve orders are sent to the worker.
+
+	Only the worker's Sensor writes the valve state, so it changes once the
+	worker has picked up the order. Until then (or SHARD_VALVE_ORDER_TIMEOUT,
+	if the worker turns the order down), the proxy reports the state it
+	last ordered, so the same order isn't sent twice.
+	'''
+
+	__slots__ = ('fleet', 'shard', 'sensor_id', 'sensor_room', \
+		'sensor_name', 'temp_sensor_only', 'ordered_valve', 'ordered_at')
+
+	def __init__(self, fleet, shard, sensor, temp_sensor_only):
+		self.fleet = fleet
+		self.fleet_state = fleet.fleet_state
+		self.slot = self.fleet_state.addSensor(sensor['sensor_id'])
+		self.shard = shard
+		self.sensor_id = sensor['sensor_id']
+		self.sensor_room = sensor['sensor_room']
+		self.sensor_name = sensor['sensor_name']
+		self.temp_sensor_only = temp_sensor_only
+		self.ordered_valve = None  # Valve state last ordered, until the worker has it
+		self.ordered_at = None
+
+	@property
+	def valve_open(self):
+		valve_open = bool(self.fleet_state.valve_open[self.slot])
+		ordered_valve = self.ordered_valve
+		if ordered_valve is None or ordered_valve == valve_open or \
+			_now() - self.ordered_at > SHARD_VALVE_ORDER_TIMEOUT:
+			self.ordered_valve = None
+			return valve_open
+
+		return ordered_valve
+
+	@staticmethod
+	def respondToMissionControl(self, orders):
+		'''Forwards a command from the coordinator to the shard worker.'''
+
+		if orders == 'open_valve':
+			self.openValve()
+
+		elif orders == 'close_valve':
+			self.closeValve()
+
+		return True
+
+	def openValve(self):
+		if self.valve_open or self.temp_sensor_only:
+			return False
+
+		self.fleet.command_queues[self.shard].put((self.sensor_id, 'open_valve'))
+		self.ordered_valve, self.ordered_at = True, _now()
+
+		return True
+
+	def closeValve(self):
+		if not self.valve_open or self.temp_sensor_only:
+			return False
+
+		self.fleet.command_queues[self.shard].put((self.sensor_id, 'close_valve'))
+		self.ordered_valve, self.ordered_at = False, _now()
+
+		return True
+
+
+class ShardedFleet(object):
+	'''Runs a sensor inventory in a pool of worker processes, one shard of
+	rooms per process, so sensor polling (filtering, logging, LCD updates)
+	isn't bound to the coordinator's GIL.
+
+	Workers write every reading and valve state into a FleetState kept in
+	shared memory (one slot per sensor), which the coordinator reads
+	directly; only alerts
+	(worker -> coordinator) and valve commands (coordinator -> worker) are
+	sent between processes, over queues. The coordinator's MissionControl
+	sees each sensor as a ShardSensorProxy.
+
+	Each worker writes its own temp logs; as rooms are never split between
+	workers, the per-room CSV logs don't clash (the segment log backend is
+	not safe to share between processes). Workers also send their metrics
+	snapshots over the alert queue, which are merged into the coordinator's
+	metrics registry (see MetricsRegistry.mergeRemote()).
+	'''
+
+	def __init__(self, commander, sensor_inventory, shard_count, \
+		virtual_sensor_id=None):
+		'''Init method for the fleet. Nothing runs until start().
+
+		:param MissionControl commander: Coordinator to report to.
+		:param list sensor_inventory: Sensor dicts (as in ACTIVE_SENSORS).
+		:param int shard_count: Number of worker processes.
+		:param int virtual_sensor_id: Optional ID of a temp-sensor-only module.
+
+		:return: ShardedFleet object
+		'''
+
+		self.commander = commander
+		self.shards = [shard for shard in \
+			shardRooms(sensor_inventory, shard_count) if shard]
+		self.virtual_sensor_id = virtual_sensor_id
+		sensor_count = sum(len(shard) for shard in self.shards)
+		self.fleet_state = FleetState(sensor_count, shared=True)
+		self.alert_queue = multiprocessing.Queue()
+		self.command_queues = [multiprocessing.Queue() for shard in self.shards]
+		self.processes = []
+		self._running = False
+		self._synced_temps = [None] * sensor_count
+
+		self.proxies = []
+		for shard_index, shard in enumerate(self.shards):
+			for sensor in shard:
+				self.proxies.append(ShardSensorProxy(self, shard_index, sensor, \
+					sensor['sensor_id'] == virtual_sensor_id))
+		self.proxies_by_id = dict((proxy.sensor_id, proxy) for proxy in self.proxies)
+
+	def start(self):
+		'''Starts a worker process per shard, and the thread forwarding their
+		alerts to the coordinator.
+		'''
+
+		self._running = True
+		for shard_index, shard in enumerate(self.shards):
+			process = multiprocessing.Process(target=_runShard, \
+				args=(shard_index, shard, self.fleet_state, self.alert_queue, \
+					self.command_queues[shard_index], self.virtual_sensor_id), \
+				name="mhi-shard-{0}".format(shard_index))
+			process.daemon = True
+			process.start()
+			self.processes.append(process)
+
+		self._forwarder = threading.Thread(target=self._runForwarder, \
+			name="mhi-shard-alerts")
+		self._forwarder.daemon = True
+		self._forwarder.start()
+
+		return True
+
+	def stop(self):
+		'''Tells every worker to tear down its sensors, and waits for them.
+		Their last metrics snapshots are merged in on the way out.
+		'''
+
+		self._running = False
+		for command_queue in self.command_queues:
+			command_queue.put(None)
+		for process in self.processes:
+			process.join(SHARD_STOP_TIMEOUT)
+			if process.is_alive():
+				process.terminate()
+
+		while True:  # Alerts are no use any more
+			try:
+				message = self.alert_queue.get_nowait()
+			except queue.Empty:
+				break
+			if message[0] == SHARD_METRICS_MESSAGE:
+				getMetrics().mergeRemote(message[1], message[2])
+
+		return True
+
+	def syncTemps(self):
+		'''Copies temps that changed in shared memory into the coordinator's
+		temp index.
+		'''
+
+		for proxy in self.proxies:
+			temp_c = self.fleet_state.temp_c[proxy.slot]
+			if temp_c != self._synced_temps[proxy.slot] and temp_c == temp_c:
+				self._synced_temps[proxy.slot] = temp_c
+				self.commander.receiveTempFromSensor(proxy)
+
+		return True
+
+	def _runForwarder(self):
+		last_sync = _now()
+		while self._running:
+			try:
+				sensor_id, signal, crossing_in = \
+					self.alert_queue.get(timeout=SHARD_SYNC_INTERVAL)
+			except queue.Empty:
+				pass
+			else:
+				if sensor_id == SHARD_METRICS_MESSAGE:  # Shard index and snapshot
+					getMetrics().mergeRemote(signal, crossing_in)
+				else:
+					self._forwardAlert(sensor_id, signal, crossing_in)
+
+			if _now() - last_sync >= SHARD_SYNC_INTERVAL:
+				self.syncTemps()
+				last_sync = _now()
+
+	def _forwardAlert(self, sensor_id, signal, crossing_in):
+		proxy = self.proxies_by_id[sensor_id]
+		self.commander.receiveTempFromSensor(proxy)
+		alert = {
+			'sensor': proxy,
+			'signal': signal
+		}
+		if crossing_in is not None:
+			alert['crossing_at'] = _now() + crossing_in
+		self.commander.receiveAlertFromSensor(self.commander, alert)
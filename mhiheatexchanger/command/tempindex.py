@@ -0,0 +1,112 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import heapq, itertools, threading
+
+COMPACT_MIN_ENTRIES = 64  # Don't bother compacting heaps smaller than this
+
+
+class TempIndex(object):
+	'''Ordered index of sensors by their latest temperature reading.
+
+	Keeps a min-heap and a max-heap of (temp, version, sensor_id) entries.
+	An update just pushes new entries (O(log n)); entries superseded by a
+	newer reading are skipped lazily when they reach the top of a heap, and
+	the heaps are rebuilt once stale entries outnumber live ones. Finding
+	the k coldest or hottest sensors is O(k log n) on top of that.
+	'''
+
+	def __init__(self):
+		self._latest = {}  # sensor_id -> (temp_c, version)
+		self._min_heap = []
+		self._max_heap = []
+		self._versions = itertools.count()
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		with self._lock:
+			return len(self._latest)
+
+	def update(self, sensor_id, temp_c):
+		'''Records a sensor's latest temperature reading.'''
+
+		with self._lock:
+			version = next(self._versions)
+			self._latest[sensor_id] = (temp_c, version)
+			heapq.heappush(self._min_heap, (temp_c, version, sensor_id))
+			heapq.heappush(self._max_heap, (-temp_c, version, sensor_id))
+			self._compactIfStale()
+
+		return True
+
+	def remove(self, sensor_id):
+		'''Drops a sensor from the index.'''
+
+		with self._lock:
+			removed = self._latest.pop(sensor_id, None) is not None
+			self._compactIfStale()
+
+		return removed
+
+	def temp(self, sensor_id):
+		'''Returns a sensor's latest indexed temperature (or None).'''
+
+		with self._lock:
+			entry = self._latest.get(sensor_id)
+
+		return entry[0] if entry is not None else None
+
+	def coldest(self, count=1, below=None, exclude=()):
+		'''Returns up to count (sensor_id, temp_c) pairs, coldest first.
+
+		:param int count: Max number of sensors to return.
+		:param float below: Only return sensors colder than this.
+		:param exclude: Collection of sensor_ids to leave out.
+		'''
+
+		with self._lock:
+			return self._top(self._min_heap, 1, count, below, exclude)
+
+	def hottest(self, count=1, above=None, exclude=()):
+		'''Returns up to count (sensor_id, temp_c) pairs, hottest first.
+
+		:param int count: Max number of sensors to return.
+		:param float above: Only return sensors hotter than this.
+		:param exclude: Collection of sensor_ids to leave out.
+		'''
+
+		with self._lock:
+			return self._top(self._max_heap, -1, count, \
+				None if above is None else -above, exclude)
+
+	def _top(self, heap, sign, count, bound, exclude):
+		found = []
+		popped = []  # Live entries to put back afterwards
+		while heap and len(found) < count:
+			key, version, sensor_id = heap[0]
+			if bound is not None and key >= bound:
+				break
+
+			entry = heapq.heappop(heap)
+			latest = self._latest.get(sensor_id)
+			if latest is None or latest[1] != version:
+				continue  # Stale entry; drop it for good
+
+			popped.append(entry)
+			if sensor_id not in exclude:
+				found.append((sensor_id, sign * key))
+
+		for entry in popped:
+			heapq.heappush(heap, entry)
+
+		return found
+
+	def _compactIfStale(self):
+		live = len(self._latest)
+		heap_size = max(len(self._min_heap), len(self._max_heap))
+		if heap_size > max(COMPACT_MIN_ENTRIES, 2 * live):
+			self._min_heap = [(temp_c, version, sensor_id) for sensor_id, \
+				(temp_c, version) in self._latest.items()]
+			self._max_heap = [(-temp_c, version, sensor_id) for temp_c, \
+				version, sensor_id in self._min_heap]
+			heapq.heapify(self._min_heap)
+			heapq.heapify(self._max_heap)
@@ -0,0 +1,58 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import importlib, os, threading
+
+# Driver backend used by sensor modules: "upm" for the real hardware, "sim"
+# for the in-process simulator. Can be overridden with MHI_DRIVER_BACKEND.
+DRIVER_BACKEND = os.environ.get("MHI_DRIVER_BACKEND", "upm")
+
+DRIVER_BACKENDS = {
+    'upm': "mhiheatexchanger.drivers.upmdrivers",
+    'sim': "mhiheatexchanger.drivers.simdrivers",
+}
+
+ERROR_UNKNOWN_BACKEND = "Unknown driver backend: {0!r} (expected one of {1})"
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def getBackend():
+    '''Returns the driver backend module, importing it on first use (so that
+    importing the package never touches the hardware libraries). The module
+    exposes GroveTemp, Jhd1313m1, ULN200XA, ULN200XA_DIR_CW and
+    ULN200XA_DIR_CCW, matching the upm API.
+    '''
+
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = _importBackend(DRIVER_BACKEND)
+
+    return _backend
+
+
+def setBackend(name):
+    '''Switches the driver backend used for sensors created from now on.
+
+    :param str name: "upm" or "sim".
+
+    :return: The backend module.
+    '''
+
+    global _backend
+
+    backend = _importBackend(name)
+    with _backend_lock:
+        _backend = backend
+
+    return backend
+
+
+def _importBackend(name):
+    if name not in DRIVER_BACKENDS:
+        raise ValueError(ERROR_UNKNOWN_BACKEND.format(name, \
+            ", ".join(sorted(DRIVER_BACKENDS))))
+
+    return importlib.import_module(DRIVER_BACKENDS[name])
@@ -0,0 +1,146 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# In-process simulated driver backend. Mirrors the parts of the upm
+# GroveTemp, Jhd1313m1 and ULN200XA APIs that the sensor module uses, so the
+# controller can be run, tested and load-tested without the Edison board.
+
+import random, threading, time
+
+SIM_DEFAULT_TEMP = 22.0  # Deg C read by a sim temp sensor with no reader set
+SIM_TEMP_NOISE = 0.0  # Std dev (deg C) of Gaussian noise added to readings
+SIM_READ_LATENCY = 0.0  # Seconds per temp sensor read
+SIM_STEP_LATENCY = 0.0  # Seconds per stepper motor step
+SIM_I2C_LATENCY = 0.0  # Seconds per LCD I2C transaction
+
+LCD_ROWS = 2
+LCD_COLUMNS = 16
+
+ULN200XA_DIR_CW = 0
+ULN200XA_DIR_CCW = 1
+
+
+def _sleep(seconds):
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+class GroveTemp(object):
+    '''Simulated Grove temperature sensor.
+
+    Reads temp_c, or the result of calling reader() if one is set (e.g. a
+    thermal model of the room), plus optional noise.
+    '''
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.temp_c = SIM_DEFAULT_TEMP
+        self.reader = None
+        self.reads = 0
+
+    def name(self):
+        return "Simulated Temperature Sensor"
+
+    def value(self):
+        _sleep(SIM_READ_LATENCY)
+        self.reads += 1
+        temp_c = self.reader() if self.reader is not None else self.temp_c
+        if SIM_TEMP_NOISE > 0:
+            temp_c += random.gauss(0, SIM_TEMP_NOISE)
+
+        return temp_c
+
+
+class Jhd1313m1(object):
+    '''Simulated Jhd1313m1 16x2 RGB backlit LCD. Keeps the screen contents
+    and counts I2C transactions, so display traffic can be measured.
+    '''
+
+    def __init__(self, bus, lcd_address, rgb_address):
+        self.bus = bus
+        self.lcd_address = lcd_address
+        self.rgb_address = rgb_address
+        self.rows = [" " * LCD_COLUMNS for i in range(LCD_ROWS)]
+        self.cursor = (0, 0)
+        self.color = (255, 255, 255)
+        self.display_on = True
+        self.backlight_on = True
+        self.transactions = 0
+
+    def _transaction(self):
+        _sleep(SIM_I2C_LATENCY)
+        self.transactions += 1
+
+    def setCursor(self, row, column):
+        self._transaction()
+        self.cursor = (row, column)
+
+    def setColor(self, r, g, b):
+        self._transaction()
+        self.color = (r, g, b)
+
+    def write(self, text):
+        self._transaction()
+        row, column = self.cursor
+        if 0 <= row < LCD_ROWS:
+            text = text[:max(0, LCD_COLUMNS - column)]
+            line = self.rows[row]
+            self.rows[row] = line[:column] + text + line[column + len(text):]
+            self.cursor = (row, min(LCD_COLUMNS, column + len(text)))
+
+    def clear(self):
+        self._transaction()
+        self.rows = [" " * LCD_COLUMNS for i in range(LCD_ROWS)]
+        self.cursor = (0, 0)
+
+    def displayOn(self):
+        self._transaction()
+        self.display_on = True
+
+    def displayOff(self):
+        self._transaction()
+        self.display_on = False
+
+    def backlightOn(self):
+        self._transaction()
+        self.backlight_on = True
+
+    def backlightOff(self):
+        self._transaction()
+        self.backlight_on = False
+
+
+class ULN200XA(object):
+    '''Simulated ULN200XA stepper motor driver. Tracks the net position in
+    steps (clockwise positive) and calls any registered step listeners with
+    (motor, steps moved) after every move.
+    '''
+
+    def __init__(self, steps_per_rev, i1, i2, i3, i4):
+        self.steps_per_rev = steps_per_rev
+        self.pins = (i1, i2, i3, i4)
+        self.speed = 0
+        self.direction = ULN200XA_DIR_CW
+        self.position = 0
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def setSpeed(self, speed):
+        self.speed = speed
+
+    def setDirection(self, direction):
+        self.direction = direction
+
+    def stepperSteps(self, steps):
+        _sleep(SIM_STEP_LATENCY * steps)
+        moved = steps if self.direction == ULN200XA_DIR_CW else -steps
+        with self._lock:
+            self.position += moved
+        for listener in self.listeners:
+            listener(self, moved)
+
+        return 0
+
+    def release(self):
+        pass
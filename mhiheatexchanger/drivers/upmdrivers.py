@@ -0,0 +1,14 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Driver backend for the real sensor module hardware (Intel Edison + Grove
+# kit), via Intel's upm libraries. Only imported when this backend is in use.
+
+from upm import pyupm_grove as grove
+from upm import pyupm_jhd1313m1 as lcd
+from upm import pyupm_uln200xa as upmULN200XA
+
+GroveTemp = grove.GroveTemp
+Jhd1313m1 = lcd.Jhd1313m1
+ULN200XA = upmULN200XA.ULN200XA
+ULN200XA_DIR_CW = upmULN200XA.ULN200XA_DIR_CW
+ULN200XA_DIR_CCW = upmULN200XA.ULN200XA_DIR_CCW
@@ -0,0 +1,598 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Bulk analytics over the recorded fleet history. loadHistory() reads every
+# daily log in a directory (CSV, or compressed .tsz from history.codec), and
+# the rollups of days that have been compacted (see history.rollups), into
+# flat NumPy columns (loadSegmentHistory() memory-maps binary segments
+# instead), and the functions below answer fleet-wide questions with array
+# operations rather than per-row Python:
+#
+#   aggregate()            count/mean/variance/min/max per room (or sensor) per period
+#   resample()             mean temp per room (or sensor) on a regular time grid
+#   thresholdExcursions()  time spent past a threshold, and the excursions, per sensor
+#   correlation()          correlation between rooms' (or sensors') resampled temps
+#   valveDutyCycle()       fraction of time each valve was open
+#
+# Valve state isn't part of the temp logs; valve duty cycles are computed
+# from a valve moves CSV (see history.valvelog), as written by sim.replay
+# --output. Summaries from the command line:
+#
+#   python -m mhiheatexchanger.history.analytics [csv_dir] [--period 86400] [--valve-moves moves.csv]
+
+import argparse, os, sys, warnings
+from datetime import datetime
+
+from mhiheatexchanger.history.codec import CODEC_SUFFIX, dailyLogFiles, \
+    readCompressedFile
+from mhiheatexchanger.history.query import SECONDS_PER_DAY
+from mhiheatexchanger.history.rollups import compactedBuckets, rollupSensors
+from mhiheatexchanger.history.segments import csvSortKey, parseCsvRow, \
+    fromEpoch, toEpoch, loadSegments, SensorTable, SEGMENT_OUTPUT_PATH, \
+    SENSOR_TABLE_FILENAME
+from mhiheatexchanger.history.valvelog import VALVE_OPENED, parseValveMove
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH, \
+    TEMP_RECORD_DATE_FORMAT
+from mhiheatexchanger.sensor.thresholds import UTHRESHOLD, LTHRESHOLD, \
+    MAX_POLL_INTERVAL
+
+GROUP_ROOM = "room"
+GROUP_SENSOR = "sensor"
+ANALYTICS_PERIOD = SECONDS_PER_DAY  # Seconds per aggregate() bucket
+RESAMPLE_INTERVAL = 15 * 60  # Seconds per resample()/correlation() bucket
+MAX_READING_GAP = 2 * MAX_POLL_INTERVAL  # Longest a reading is taken to hold for (longer gaps are sensor downtime)
+
+ERROR_NUMPY_REQUIRED = "NumPy is required for history analytics."
+ERROR_UNKNOWN_GROUPING = "Unknown grouping: {0!r} (expected '{1}' or '{2}')"
+LOADED_MSG = "Loaded {0} readings from {1} sensors in {2} rooms ({3} to {4})."
+AGGREGATE_ROW = "{0:<24} {1}  {2:>7}  {3:>7.2f}  {4:>7.3f}  {5:>7.2f}  {6:>7.2f}"
+AGGREGATE_HEADER = "{0:<24} {1:<10}  {2:>7}  {3:>7}  {4:>7}  {5:>7}  {6:>7}".format( \
+    "Room", "Date-UTC", "Count", "Mean C", "Var", "Min C", "Max C")
+EXCURSION_ROW = "{0:<24} {1:>9.1f} h above / {2:>9.1f} h below  ({3} / {4} excursions)"
+DUTY_CYCLE_ROW = "{0:<24} {1:>6.1%} open"
+CORRELATION_ROW = "{0:<24} {1}"
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(ERROR_NUMPY_REQUIRED)
+
+    return numpy
+
+
+class FleetHistory(object):
+    '''Column-wise fleet history, sorted by sensor and then by time. Row i
+    is a reading of sensors[sensor[i]] taken at timestamp[i] (epoch seconds,
+    UTC), with value[i] (temp in deg C, or 1/0 for valve open/closed).
+
+    A row can also stand for a rollup bucket of weight[i] readings starting
+    at timestamp[i], with value[i] their mean and low[i]/high[i] their min
+    and max. A single reading has a weight of 1 and low == high == value.
+    '''
+
+    def __init__(self, timestamp, sensor, value, sensors, weight=None, \
+        low=None, high=None):
+        '''Init method for the fleet history.
+
+        :param timestamp: Array of epoch seconds.
+        :param sensor: Array of indexes into sensors.
+        :param value: Array of readings.
+        :param list sensors: (room, sensor) name of each sensor index.
+        :param weight: Array of readings per row (defaults to all 1).
+        :param low: Array of row minimums (defaults to value).
+        :param high: Array of row maximums (defaults to value).
+
+        :return: FleetHistory object
+        '''
+
+        np = _numpy()
+        order = np.lexsort((timestamp, sensor))
+        self.timestamp = np.asarray(timestamp, dtype=np.float64)[order]
+        self.sensor = np.asarray(sensor, dtype=np.intp)[order]
+        self.value = np.asarray(value, dtype=np.float64)[order]
+        self.weight = np.ones(len(self.value)) if weight is None else \
+            np.asarray(weight, dtype=np.float64)[order]
+        self.low = self.value if low is None else \
+            np.asarray(low, dtype=np.float64)[order]
+        self.high = self.value if high is None else \
+            np.asarray(high, dtype=np.float64)[order]
+        self.sensors = list(sensors)
+        self.rooms = sorted(set(room for room, name in self.sensors))
+        room_index = dict((room, i) for i, room in enumerate(self.rooms))
+        self.sensor_room = np.array([room_index[room] for room, name in \
+            self.sensors], dtype=np.intp)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def temp_c(self):
+        return self.value
+
+    def select(self, start=None, end=None, sensor_room=None):
+        '''Returns the readings in [start, end) (datetimes, or epoch seconds),
+        optionally for one room only, as a new FleetHistory. Sensor indexes
+        are unchanged.
+        '''
+
+        np = _numpy()
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.timestamp >= _epoch(start)
+        if end is not None:
+            mask &= self.timestamp < _epoch(end)
+        if sensor_room is not None:
+            mask &= self.sensor_room[self.sensor] == self.rooms.index(sensor_room)
+
+        return FleetHistory(self.timestamp[mask], self.sensor[mask], \
+            self.value[mask], self.sensors, self.weight[mask], self.low[mask], \
+            self.high[mask])
+
+    def groups(self, by=GROUP_ROOM):
+        '''Returns (group index of each row, group names) for grouping rows by
+        room (names are room names) or by sensor (names are (room, sensor)).
+        '''
+
+        if by == GROUP_ROOM:
+            return self.sensor_room[self.sensor], list(self.rooms)
+        if by == GROUP_SENSOR:
+            return self.sensor, list(self.sensors)
+
+        raise ValueError(ERROR_UNKNOWN_GROUPING.format(by, GROUP_ROOM, GROUP_SENSOR))
+
+    def holdTimes(self, end=None, max_gap=MAX_READING_GAP):
+        '''Returns how long each reading held for: until the sensor's next
+        reading, capped at max_gap. Each sensor's last reading holds until
+        end (epoch seconds, capped at max_gap), or for 0 seconds if end is
+        None.
+        '''
+
+        np = _numpy()
+        hold = np.zeros(len(self))
+        if len(self) == 0:
+            return hold
+
+        same_sensor = self.sensor[1:] == self.sensor[:-1]
+        hold[:-1] = np.where(same_sensor, np.diff(self.timestamp), 0.0)
+        if end is not None:
+            last = np.append(~same_sensor, True)
+            hold[last] = end - self.timestamp[last]
+
+        return np.clip(hold, 0.0, max_gap)
+
+
+def _epoch(value):
+    return toEpoch(value) if isinstance(value, datetime) else float(value)
+
+
+def _loadCsvFile(np, csv_path):
+    '''Parses one daily CSV in bulk. Rows of a daily file share their date,
+    room and sensor, so only the time and temp columns are parsed: the
+    fixed-width times as one NumPy array of digits, the temps in one pass.
+
+    :return: Tuple of (room, sensor, epoch seconds array, temp C array), or
+        None for an empty file.
+    '''
+
+    with open(csv_path, "rb") as f:
+        f.readline()  # Skip header
+        data = f.read()
+    data = data[:data.rfind(b"\n") + 1]  # Drop a partially written last row
+    if not data.strip():
+        return None
+
+    # "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF" rows, as one flat list
+    fields = data.replace(b"\n", b",").split(b",")[:-1]
+    rows = len(fields) // 6
+    times = b"".join(fields[1::6])
+    if len(fields) == rows * 6 and len(times) == rows * 8 and \
+        fields[0::6].count(fields[0]) == rows and \
+        fields[2::6].count(fields[2]) == rows and \
+        fields[3::6].count(fields[3]) == rows:
+        day_start = toEpoch(datetime.strptime(fields[0].decode("ascii"), \
+            TEMP_RECORD_DATE_FORMAT))
+        digits = np.frombuffer(times, dtype=np.uint8).reshape(rows, 8) \
+            .astype(np.int64) - ord("0")  # "HH:MM:SS"
+        secs = day_start + (digits[:, 0] * 10 + digits[:, 1]) * 3600 + \
+            (digits[:, 3] * 10 + digits[:, 4]) * 60 + \
+            digits[:, 6] * 10 + digits[:, 7]
+        temps = np.array(list(map(float, fields[4::6])), dtype=np.float64)
+
+        return fields[2].decode("utf-8"), fields[3].decode("utf-8"), secs, temps
+
+    # Rows that don't share the file's date/names; parse them one by one
+    parsed = []
+    for line in data.decode("utf-8").splitlines():
+        line = line.strip()
+        if line:
+            timestamp, sensor_room, sensor_name, temp_c = parseCsvRow(line)
+            parsed.append((toEpoch(timestamp), temp_c))
+    parsed = np.array(parsed, dtype=np.float64).reshape(-1, 2)
+
+    return sensor_room, sensor_name, parsed[:, 0], parsed[:, 1]
+
+
+def _loadCompressedFile(np, tsz_path):
+    sensor_room, sensor_name, decoder = readCompressedFile(tsz_path)
+    readings = np.array(list(decoder), dtype=np.float64).reshape(-1, 2)
+
+    return sensor_room, sensor_name, readings[:, 0], readings[:, 1]
+
+
+def loadHistory(csv_dir=LOCAL_OUTPUT_PATH, start=None, end=None):
+    '''Loads every daily temp log in csv_dir into a FleetHistory. Where a
+    day has both a CSV and a compressed .tsz file, the CSV is used.
+
+    Days whose logs have been compacted are loaded from their rollups, a row
+    per minute (or hour, for older days) bucket, weighted by its reading
+    count (see FleetHistory). aggregate() counts, means, mins and maxes stay
+    exact for periods made of whole buckets, but spread within a bucket is
+    lost from variances, and holdTimes()/thresholdExcursions() see only each
+    bucket's mean.
+
+    :param str csv_dir: Directory holding the daily logs.
+    :param datetime start: Skip files for days before this (optional).
+    :param datetime end: Skip files for days after this (optional).
+
+    :return: FleetHistory of temps in deg C.
+    '''
+
+    np = _numpy()
+    sensor_ids = {}  # (room, sensor) -> index
+    raw_days = {}  # (room, sensor) -> days loaded from raw logs
+    timestamps, sensors, temps = [], [], []
+    for path in dailyLogFiles(csv_dir):
+        day = csvSortKey(path)[0]
+        if (start is not None and day < datetime(start.year, start.month, start.day)) \
+            or (end is not None and day > end):
+            continue
+
+        if path.endswith(CODEC_SUFFIX):
+            loaded = _loadCompressedFile(np, path)
+        else:
+            loaded = _loadCsvFile(np, path)
+        if loaded is None:
+            continue
+
+        sensor_room, sensor_name, secs, temp_c = loaded
+        sensor_id = sensor_ids.setdefault((sensor_room, sensor_name), len(sensor_ids))
+        raw_days.setdefault((sensor_room, sensor_name), set()).add(day)
+        timestamps.append(secs)
+        sensors.append(np.full(len(secs), sensor_id, dtype=np.intp))
+        temps.append(temp_c)
+
+    weights = [np.ones(len(secs)) for secs in timestamps]
+    lows, highs = list(temps), list(temps)
+    for key, (rollup_start, rollup_end) in sorted(rollupSensors(csv_dir).items()):
+        if start is not None:
+            rollup_start = max(rollup_start, datetime(start.year, start.month, start.day))
+        if end is not None:
+            rollup_end = min(rollup_end, end)
+        buckets = np.array([(toEpoch(bucket_start), count, low, high, total) \
+            for bucket_start, count, low, high, total in compactedBuckets(key[0], \
+            key[1], rollup_start, rollup_end, csv_dir, raw_days.get(key, ()))], \
+            dtype=np.float64).reshape(-1, 5)
+        if not len(buckets):
+            continue
+
+        sensor_id = sensor_ids.setdefault(key, len(sensor_ids))
+        timestamps.append(buckets[:, 0])
+        sensors.append(np.full(len(buckets), sensor_id, dtype=np.intp))
+        temps.append(buckets[:, 4] / buckets[:, 1])
+        weights.append(buckets[:, 1])
+        lows.append(buckets[:, 2])
+        highs.append(buckets[:, 3])
+
+    names = sorted(sensor_ids, key=sensor_ids.get)
+    if not timestamps:
+        return FleetHistory(np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros(0), names)
+
+    history = FleetHistory(np.concatenate(timestamps), np.concatenate(sensors), \
+        np.concatenate(temps), names, np.concatenate(weights), \
+        np.concatenate(lows), np.concatenate(highs))
+    if start is not None or end is not None:
+        history = history.select(start, end)
+
+    return history
+
+
+def loadSegmentHistory(segment_path=SEGMENT_OUTPUT_PATH):
+    '''Loads binary segment files (see history.segments) into a
+    FleetHistory. Segments are memory-mapped rather than parsed, so this is
+    the fastest way in for years of history; import CSVs into segments
+    once with `python -m mhiheatexchanger.history.segments`.
+    '''
+
+    records = loadSegments(segment_path)
+    names = SensorTable(os.path.join(segment_path, SENSOR_TABLE_FILENAME)).names
+
+    return FleetHistory(records['timestamp'], records['sensor'], \
+        records['temp_c'], [names[i] for i in range(len(names))])
+
+
+def loadValveMoves(path):
+    '''Loads a valve moves CSV (see history.valvelog, as written by
+    sim.replay) into a FleetHistory of valve states (1 for open, 0 for
+    closed) from each move on.
+    '''
+
+    np = _numpy()
+    sensor_ids = {}
+    timestamps, sensors, states = [], [], []
+    with open(path) as f:
+        next(f, None)  # Skip header
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            timestamp, sensor_room, sensor_name, move = parseValveMove(line)
+            timestamps.append(toEpoch(timestamp))
+            sensors.append(sensor_ids.setdefault((sensor_room, sensor_name), \
+                len(sensor_ids)))
+            states.append(1.0 if move == VALVE_OPENED else 0.0)
+
+    return FleetHistory(np.array(timestamps, dtype=np.float64), \
+        np.array(sensors, dtype=np.intp), np.array(states, dtype=np.float64), \
+        sorted(sensor_ids, key=sensor_ids.get))
+
+
+def aggregate(history, period=ANALYTICS_PERIOD, by=GROUP_ROOM):
+    '''Summarizes readings per group per period (aligned to the epoch, so
+    the default period gives UTC days).
+
+    :return: Dict of equal-length arrays, one entry per (group, period)
+        with readings: 'group' (name), 'period_start' (epoch seconds),
+        'count', 'mean', 'var', 'min' and 'max'. Rows are weighted by the
+        readings they stand for (see FleetHistory).
+    '''
+
+    np = _numpy()
+    group, names = history.groups(by)
+    if len(history) == 0:
+        empty = np.zeros(0)
+        return {'group': np.array([], dtype=object), 'period_start': empty, \
+            'count': np.zeros(0, dtype=np.intp), 'mean': empty, 'var': empty, \
+            'min': empty, 'max': empty}
+
+    bucket = np.floor_divide(history.timestamp, period).astype(np.int64)
+    first_bucket = bucket.min()
+    bucket_span = bucket.max() - first_bucket + 1
+    keys, inverse, rows = np.unique(group * bucket_span + (bucket - first_bucket), \
+        return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+
+    values, weight = history.value, history.weight
+    counts = np.bincount(inverse, weights=weight)
+    mean = np.bincount(inverse, weights=values * weight) / counts
+    var = np.bincount(inverse, weights=weight * (values - mean[inverse]) ** 2) / counts
+
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(rows)[:-1]))
+    name_array = np.empty(len(names), dtype=object)
+    name_array[:] = names
+
+    return {
+        'group': name_array[keys // bucket_span],
+        'period_start': (keys % bucket_span + first_bucket) * float(period),
+        'count': np.rint(counts).astype(np.intp),
+        'mean': mean,
+        'var': var,
+        'min': np.minimum.reduceat(history.low[order], starts),
+        'max': np.maximum.reduceat(history.high[order], starts)
+    }
+
+
+def resample(history, interval=RESAMPLE_INTERVAL, by=GROUP_SENSOR, \
+    start=None, end=None):
+    '''Averages readings onto a regular time grid.
+
+    :param int interval: Seconds per grid step.
+    :param start: First grid time (datetime or epoch seconds; defaults to
+        the first reading, rounded down to the interval).
+    :param end: Grid end, exclusive (defaults to just after the last reading).
+
+    :return: Tuple of (grid times array, group names, 2D array of mean
+        values with a row per grid time and a column per group; NaN where a
+        group has no readings in a step).
+    '''
+
+    np = _numpy()
+    group, names = history.groups(by)
+    if len(history) == 0 and (start is None or end is None):
+        return np.zeros(0), names, np.zeros((0, len(names)))
+
+    start = np.floor(history.timestamp.min() / interval) * interval \
+        if start is None else _epoch(start)
+    end = history.timestamp.max() + 1 if end is None else _epoch(end)
+    steps = max(0, int(np.ceil((end - start) / interval)))
+
+    step = np.floor((history.timestamp - start) / interval).astype(np.int64)
+    in_grid = (step >= 0) & (step < steps)
+    flat = step[in_grid] * len(names) + group[in_grid]
+    weight = history.weight[in_grid]
+    sums = np.bincount(flat, weights=history.value[in_grid] * weight, \
+        minlength=steps * len(names))
+    counts = np.bincount(flat, weights=weight, minlength=steps * len(names))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    return start + np.arange(steps) * float(interval), names, \
+        means.reshape(steps, len(names))
+
+
+def thresholdExcursions(history, threshold=UTHRESHOLD, above=True, \
+    max_gap=MAX_READING_GAP):
+    '''Finds the time each sensor spent past a threshold. Like the sensors'
+    own checks, a temp at or above UTHRESHOLD (above=True) or below
+    LTHRESHOLD (above=False) counts as past it. Each reading holds until the
+    sensor's next one, for at most max_gap seconds.
+
+    :return: Dict with per-sensor arrays 'seconds' (time past the threshold),
+        'fraction' (of the time covered by readings) and 'count' (number of
+        excursions), the 'sensors' names they're indexed by, and one entry
+        per excursion in 'excursion_sensor', 'excursion_start' and
+        'excursion_end' (epoch seconds).
+    '''
+
+    np = _numpy()
+    sensor_count = len(history.sensors)
+    values, timestamp, sensor = history.value, history.timestamp, history.sensor
+    past = values >= threshold if above else values < threshold
+    hold = history.holdTimes(max_gap=max_gap)
+
+    seconds = np.bincount(sensor, weights=hold * past, minlength=sensor_count)
+    covered = np.bincount(sensor, weights=hold, minlength=sensor_count)
+
+    # An excursion continues from one reading to the next while both are
+    # past the threshold and the gap between them is short enough
+    continues = np.zeros(len(history), dtype=bool)
+    if len(history):
+        continues[1:] = past[:-1] & past[1:] & (sensor[1:] == sensor[:-1]) & \
+            (np.diff(timestamp) <= max_gap)
+    starts = past & ~continues
+    ends = past & ~np.append(continues[1:], False)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = seconds / covered
+
+    return {
+        'sensors': list(history.sensors),
+        'seconds': seconds,
+        'fraction': fraction,
+        'count': np.bincount(sensor[starts], minlength=sensor_count),
+        'excursion_sensor': sensor[starts],
+        'excursion_start': timestamp[starts],
+        'excursion_end': timestamp[ends] + hold[ends]
+    }
+
+
+def correlation(history, interval=RESAMPLE_INTERVAL, by=GROUP_ROOM):
+    '''Correlates groups' temps, resampled to interval. Each pair is
+    correlated over the grid steps where both have readings.
+
+    :return: Tuple of (group names, 2D array of Pearson correlations; NaN
+        where a pair has fewer than two shared steps or no variance).
+    '''
+
+    np = _numpy()
+    times, names, means = resample(history, interval, by)
+
+    valid = ~np.isnan(means)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN columns
+        centred = np.where(valid, means - np.nanmean(means, axis=0), 0.0)
+    present = valid.astype(np.float64)
+
+    # Pairwise sums over the steps where both groups have readings
+    shared = present.T.dot(present)
+    sum_x = centred.T.dot(present)  # [i, j]: sum of group i where j present
+    sum_xx = (centred ** 2).T.dot(present)
+    sum_xy = centred.T.dot(centred)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x, mean_y = sum_x / shared, sum_x.T / shared
+        cov = sum_xy / shared - mean_x * mean_y
+        var_x = sum_xx / shared - mean_x ** 2
+        var_y = sum_xx.T / shared - mean_y ** 2
+        corr = cov / np.sqrt(var_x * var_y)
+    corr[shared < 2] = np.nan
+
+    return names, np.clip(corr, -1.0, 1.0)
+
+
+def valveDutyCycle(valve_history, start=None, end=None):
+    '''Works out the fraction of [start, end) each valve spent open, from a
+    FleetHistory of valve states (see loadValveMoves()). Valves are taken to
+    be closed before their first recorded move.
+
+    :param start: Start of the period (datetime or epoch seconds; defaults to
+        the first move).
+    :param end: End of the period (defaults to the last move).
+
+    :return: Tuple of (sensor names, array of open fractions).
+    '''
+
+    np = _numpy()
+    sensor_count = len(valve_history.sensors)
+    if len(valve_history) == 0:
+        return list(valve_history.sensors), np.zeros(sensor_count)
+
+    start = valve_history.timestamp.min() if start is None else _epoch(start)
+    end = valve_history.timestamp.max() if end is None else _epoch(end)
+    if end <= start:
+        return list(valve_history.sensors), np.zeros(sensor_count)
+
+    # Each state holds until the valve's next move (or the end), with moves
+    # before start counted from start
+    clipped = FleetHistory(np.clip(valve_history.timestamp, start, end), \
+        valve_history.sensor, valve_history.value, valve_history.sensors)
+    hold = clipped.holdTimes(end=end, max_gap=end - start)
+    open_seconds = np.bincount(clipped.sensor, weights=hold * clipped.value, \
+        minlength=sensor_count)
+
+    return list(valve_history.sensors), open_seconds / (end - start)
+
+
+def main(argv=None):
+    '''Prints a fleet history report: per-room means and variances per
+    period, time past the thresholds per sensor, room correlations, and
+    optionally valve duty cycles.
+    '''
+
+    parser = argparse.ArgumentParser(description="Summarize recorded sensor " \
+        "temperature history.")
+    parser.add_argument("csv_dir", nargs="?", default=LOCAL_OUTPUT_PATH)
+    parser.add_argument("--period", type=int, default=ANALYTICS_PERIOD, \
+        help="Seconds per aggregate period.")
+    parser.add_argument("--interval", type=int, default=RESAMPLE_INTERVAL, \
+        help="Seconds per step when correlating rooms.")
+    parser.add_argument("--valve-moves", default=None, \
+        help="Valve moves CSV (from sim.replay --output) for duty cycles.")
+    args = parser.parse_args(argv)
+
+    history = loadHistory(args.csv_dir)
+    if not len(history):
+        print(LOADED_MSG.format(0, 0, 0, None, None))
+        return 0
+    print(LOADED_MSG.format(int(history.weight.sum()), len(history.sensors), \
+        len(history.rooms), fromEpoch(history.timestamp.min()), \
+        fromEpoch(history.timestamp.max())))
+
+    print()
+    print(AGGREGATE_HEADER)
+    summary = aggregate(history, args.period)
+    for i in range(len(summary['count'])):
+        print(AGGREGATE_ROW.format(summary['group'][i], fromEpoch( \
+            summary['period_start'][i]).strftime(TEMP_RECORD_DATE_FORMAT), \
+            summary['count'][i], summary['mean'][i], summary['var'][i], \
+            summary['min'][i], summary['max'][i]))
+
+    print()
+    hot = thresholdExcursions(history, UTHRESHOLD, above=True)
+    cold = thresholdExcursions(history, LTHRESHOLD, above=False)
+    for i, (sensor_room, sensor_name) in enumerate(history.sensors):
+        print(EXCURSION_ROW.format(sensor_room + "/" + sensor_name, \
+            hot['seconds'][i] / 3600.0, cold['seconds'][i] / 3600.0, \
+            hot['count'][i], cold['count'][i]))
+
+    print()
+    rooms, corr = correlation(history, args.interval)
+    for i, room in enumerate(rooms):
+        print(CORRELATION_ROW.format(room, " ".join("{0:>6.2f}".format(c) \
+            for c in corr[i])))
+
+    if args.valve_moves:
+        print()
+        sensors, duty = valveDutyCycle(loadValveMoves(args.valve_moves), \
+            history.timestamp.min(), history.timestamp.max())
+        for (sensor_room, sensor_name), fraction in zip(sensors, duty):
+            print(DUTY_CYCLE_ROW.format(sensor_room + "/" + sensor_name, fraction))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
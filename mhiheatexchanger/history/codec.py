@@ -0,0 +1,574 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Compressed temperature logs. Each file holds one sensor's readings for one
+# UTC day (like the daily CSVs), encoded Gorilla-style as a bit stream:
+#
+#   timestamp: delta-of-delta of epoch seconds
+#   temp:      delta of the temp quantized to TEMP_QUANTUM deg C
+#
+# Both are written as a '0' bit when unchanged, otherwise as a prefix of 1s
+# picking the width of the signed value that follows (TIMESTAMP_WIDTHS and
+# TEMP_WIDTHS). Readings at a steady poll rate in a slowly changing room
+# take 2-10 bits each, versus ~50 bytes per CSV row. The stream's last byte
+# is padded with 1s, which can never decode to a complete reading, so files
+# can be appended to and read while they're being written.
+#
+# Convert existing CSVs (and back) with:
+#
+#   python -m mhiheatexchanger.history.codec [csv_dir] [--output DIR]
+#   python -m mhiheatexchanger.history.codec [tsz_dir] --to-csv [--output DIR]
+
+import argparse, glob, os, struct, sys, threading, time
+
+from mhiheatexchanger.history.segments import csvSortKey, parseCsvRow, \
+    fromEpoch, toEpoch
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH, \
+    LOCAL_OUTPUT_FILENAME, TEMP_RECORD_FILE_HEADER, TEMP_RECORD_DATE_FORMAT, \
+    TEMP_LOG_FLUSH_ROWS, TEMP_LOG_FLUSH_INTERVAL
+
+CSV_SUFFIX = ".csv"
+CODEC_SUFFIX = ".tsz"
+CODEC_FILENAME = os.path.splitext(LOCAL_OUTPUT_FILENAME)[0] + CODEC_SUFFIX
+CODEC_FILE_PATTERN = "*_sensorTemps" + CODEC_SUFFIX
+CSV_FILE_PATTERN = "*_sensorTemps" + CSV_SUFFIX
+
+CODEC_MAGIC = b"MHIZ"
+CODEC_VERSION = 1
+# Magic, version, temp quantum (deg C), length of the "Room,Sensor" name
+CODEC_HEADER_FORMAT = "<4sBdH"
+CODEC_HEADER_SIZE = struct.calcsize(CODEC_HEADER_FORMAT)
+
+TEMP_QUANTUM = 0.01  # Deg C; temps are stored rounded to this
+TIMESTAMP_WIDTHS = (7, 9, 12, 64)  # Bits per delta-of-delta class ('10', '110', '1110', '1111')
+TEMP_WIDTHS = (4, 7, 10, 32)  # Bits per temp delta class
+
+ERROR_NOT_COMPRESSED_LOG = "Not a compressed temp log: {0}"
+ERROR_UNSUPPORTED_VERSION = "Unsupported compressed temp log version {0} in {1}"
+ERROR_VALUE_TOO_LARGE = "Value {0} doesn't fit in {1} bits"
+EMPTY_LOG_SKIPPED_MSG = "{0}: no rows, skipped."
+CONVERTED_MSG = "{0} -> {1}: {2} rows, {3} -> {4} bytes ({5:.1f}x)"
+CONVERTED_TOTAL_MSG = "Converted {0} files: {1} -> {2} bytes ({3:.1f}x)"
+
+
+class BitWriter(object):
+    '''Accumulates a big-endian bit stream. Complete bytes collect in data
+    (drain it as they're written out); the last partial byte stays pending.
+    '''
+
+    __slots__ = ('data', 'bits', 'count')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.bits = 0  # Pending bits, not yet a whole byte
+        self.count = 0  # Number of pending bits
+
+    def write(self, value, width):
+        self.bits = (self.bits << width) | (value & ((1 << width) - 1))
+        self.count += width
+        while self.count >= 8:
+            self.count -= 8
+            self.data.append((self.bits >> self.count) & 0xFF)
+        self.bits &= (1 << self.count) - 1
+
+    def tail(self):
+        '''Returns the pending bits as a byte padded with 1s (or b"").'''
+
+        if not self.count:
+            return b""
+        pad = 8 - self.count
+
+        return struct.pack("B", ((self.bits << pad) | ((1 << pad) - 1)) & 0xFF)
+
+
+class BitReader(object):
+    '''Reads a big-endian bit stream from a bytes-like object.'''
+
+    __slots__ = ('data', 'offset', 'bits', 'count')
+
+    def __init__(self, data):
+        self.data = bytearray(data)
+        self.offset = 0  # Next byte to load
+        self.bits = 0
+        self.count = 0
+
+    @property
+    def position(self):
+        '''Number of bits read so far.'''
+
+        return self.offset * 8 - self.count
+
+    def read(self, width):
+        '''Returns the next width bits as an unsigned int.
+
+        :raises EOFError: If fewer than width bits are left.
+        '''
+
+        while self.count < width:
+            if self.offset >= len(self.data):
+                raise EOFError()
+            self.bits = (self.bits << 8) | self.data[self.offset]
+            self.offset += 1
+            self.count += 8
+        self.count -= width
+        value = self.bits >> self.count
+        self.bits &= (1 << self.count) - 1
+
+        return value
+
+
+def _writeValue(writer, value, widths):
+    if value == 0:
+        writer.write(0, 1)
+        return
+
+    last = len(widths) - 1
+    for i, width in enumerate(widths):
+        limit = 1 << (width - 1)
+        if -limit <= value < limit:
+            if i == last:
+                writer.write((1 << (i + 1)) - 1, i + 1)
+            else:
+                writer.write(((1 << (i + 1)) - 1) << 1, i + 2)
+            writer.write(value, width)
+            return
+
+    raise ValueError(ERROR_VALUE_TOO_LARGE.format(value, widths[-1]))
+
+
+def _readValue(reader, widths):
+    ones = 0
+    while ones < len(widths) and reader.read(1):
+        ones += 1
+    if not ones:
+        return 0
+
+    width = widths[ones - 1]
+    value = reader.read(width)
+    if value >= 1 << (width - 1):
+        value -= 1 << width
+
+    return value
+
+
+class SeriesEncoder(object):
+    '''Streaming Gorilla-style encoder for one sensor's readings. Encoded
+    bits collect in self.bits (a BitWriter).
+    '''
+
+    def __init__(self, quantum=TEMP_QUANTUM):
+        self.quantum = quantum
+        self.bits = BitWriter()
+        self.rows = 0
+        self._prev_secs = 0
+        self._prev_delta = 0
+        self._prev_temp = 0
+
+    def encode(self, secs, temp_c):
+        '''Appends one reading.
+
+        :param int secs: Epoch seconds (UTC) of the reading.
+        :param float temp_c: Reading in degrees C.
+        '''
+
+        secs = int(secs)
+        temp = int(round(temp_c / self.quantum))
+        delta = secs - self._prev_secs
+
+        _writeValue(self.bits, delta - self._prev_delta, TIMESTAMP_WIDTHS)
+        _writeValue(self.bits, temp - self._prev_temp, TEMP_WIDTHS)
+
+        # The first reading's "delta" is its whole timestamp; start from 0
+        self._prev_delta = delta if self.rows else 0
+        self._prev_secs = secs
+        self._prev_temp = temp
+        self.rows += 1
+
+    @classmethod
+    def resume(cls, data, quantum=TEMP_QUANTUM):
+        '''Rebuilds the encoder state at the end of an encoded stream, so
+        that more readings can be appended to it.
+
+        :param bytes data: Stream written by an encoder with this quantum.
+
+        :return: Tuple of (SeriesEncoder, number of bytes of data to keep).
+            The encoder's pending bits are the start of the last kept byte.
+        '''
+
+        encoder = cls(quantum)
+        decoder = SeriesDecoder(data, quantum)
+        for secs, temp_c in decoder:
+            pass
+
+        encoder.rows = decoder.rows
+        encoder._prev_secs = decoder.prev_secs
+        encoder._prev_delta = decoder.prev_delta
+        encoder._prev_temp = decoder.prev_temp
+
+        end = decoder.end  # In bits
+        encoder.bits.count = end % 8
+        if encoder.bits.count:
+            encoder.bits.bits = bytearray(data)[end // 8] >> (8 - encoder.bits.count)
+
+        return encoder, (end + 7) // 8
+
+
+class SeriesDecoder(object):
+    '''Streaming decoder for a SeriesEncoder bit stream. Iterate over it for
+    (epoch seconds, temp C) readings. A truncated last reading (or the 1s
+    padding) ends the stream.
+    '''
+
+    def __init__(self, data, quantum=TEMP_QUANTUM):
+        self.quantum = quantum
+        self.rows = 0
+        self.end = 0  # Bit position after the last complete reading
+        self.prev_secs = 0
+        self.prev_delta = 0
+        self.prev_temp = 0
+        self._reader = BitReader(data)
+
+    def __iter__(self):
+        reader = self._reader
+        quantum = self.quantum
+
+        while True:
+            try:
+                delta = self.prev_delta + _readValue(reader, TIMESTAMP_WIDTHS)
+                temp = self.prev_temp + _readValue(reader, TEMP_WIDTHS)
+            except EOFError:
+                return
+
+            self.prev_secs += delta
+            self.prev_delta = delta if self.rows else 0
+            self.prev_temp = temp
+            self.rows += 1
+            self.end = reader.position
+
+            # Rounding drops the float noise left by the multiply
+            yield self.prev_secs, round(temp * quantum, 6)
+
+
+def _packHeader(sensor_room, sensor_name, quantum):
+    name = u"{0},{1}".format(sensor_room, sensor_name).encode("utf-8")
+
+    return struct.pack(CODEC_HEADER_FORMAT, CODEC_MAGIC, CODEC_VERSION, \
+        quantum, len(name)) + name
+
+
+def _unpackHeader(data, path):
+    if len(data) < CODEC_HEADER_SIZE:
+        raise ValueError(ERROR_NOT_COMPRESSED_LOG.format(path))
+
+    magic, version, quantum, name_size = struct.unpack_from( \
+        CODEC_HEADER_FORMAT, data)
+    if magic != CODEC_MAGIC:
+        raise ValueError(ERROR_NOT_COMPRESSED_LOG.format(path))
+    if version != CODEC_VERSION:
+        raise ValueError(ERROR_UNSUPPORTED_VERSION.format(version, path))
+
+    name_end = CODEC_HEADER_SIZE + name_size
+    sensor_room, sensor_name = data[CODEC_HEADER_SIZE:name_end].decode( \
+        "utf-8").split(",", 1)
+
+    return sensor_room, sensor_name, quantum, name_end
+
+
+def readCompressedFile(path):
+    '''Reads a compressed temp log.
+
+    :return: Tuple of (room, sensor, SeriesDecoder). Iterate over the
+        decoder for (epoch seconds, temp C) readings.
+    '''
+
+    with open(path, "rb") as f:
+        data = f.read()
+    sensor_room, sensor_name, quantum, data_start = _unpackHeader(data, path)
+
+    return sensor_room, sensor_name, SeriesDecoder(data[data_start:], quantum)
+
+
+def iterCompressedFile(path):
+    '''Yields (datetime, room, sensor, temp_c) rows from a compressed temp
+    log, like parseCsvRow() does for CSV rows.
+    '''
+
+    sensor_room, sensor_name, decoder = readCompressedFile(path)
+    for secs, temp_c in decoder:
+        yield fromEpoch(secs), sensor_room, sensor_name, temp_c
+
+
+def dailyLogFiles(log_dir=LOCAL_OUTPUT_PATH):
+    '''Lists the daily temp logs in log_dir, CSV or compressed. Where a
+    sensor's day has both a CSV and a .tsz file (e.g. one converted with
+    this module's main() without --delete), only the CSV is listed.
+
+    :return: List of paths, oldest day first.
+    '''
+
+    paths = {}  # Filename without extension -> path, CSV preferred
+    for pattern in (CODEC_FILE_PATTERN, CSV_FILE_PATTERN):
+        for path in glob.glob(os.path.join(log_dir, pattern)):
+            paths[os.path.splitext(os.path.basename(path))[0]] = path
+
+    return sorted(paths.values(), key=csvSortKey)
+
+
+def iterDailyLog(path):
+    '''Yields (datetime, room, sensor, temp_c) rows from a daily temp log,
+    CSV or compressed (by its suffix).
+    '''
+
+    if path.endswith(CODEC_SUFFIX):
+        for row in iterCompressedFile(path):
+            yield row
+        return
+
+    with open(path) as f:
+        next(f, None)  # Skip header
+        for line in f:
+            line = line.strip()
+            if line:
+                yield parseCsvRow(line)
+
+
+class _SeriesFile(object):
+    '''An open compressed temp log and its encoder.'''
+
+    def __init__(self, path, sensor_room, sensor_name, quantum):
+        self.path = path
+
+        if os.path.isfile(path):
+            self.handle = open(path, "r+b")
+            data = self.handle.read()
+            quantum, data_start = _unpackHeader(data, path)[2:]
+            self.encoder, keep = SeriesEncoder.resume(data[data_start:], quantum)
+            self.handle.truncate(data_start + keep)  # Drops any torn write
+            self.handle.seek(0, os.SEEK_END)
+            self.tail_size = 1 if self.encoder.bits.count else 0
+        else:
+            self.handle = open(path, "w+b")
+            self.handle.write(_packHeader(sensor_room, sensor_name, quantum))
+            self.encoder = SeriesEncoder(quantum)
+            self.tail_size = 0
+
+    def flush(self):
+        bits = self.encoder.bits
+        if self.tail_size:
+            self.handle.seek(-self.tail_size, os.SEEK_END)  # Rewrite last byte
+        tail = bits.tail()
+        self.handle.write(bytes(bits.data) + tail)
+        self.handle.flush()
+        del bits.data[:]
+        self.tail_size = len(tail)
+
+
+class CodecWriter(object):
+    '''Writer for compressed daily temperature logs.
+
+    Drop-in alternative to TempLogWriter (same write/flush/close methods),
+    keeping one .tsz file per (date, room, sensor) instead of one CSV.
+    Readings are encoded as they're written, so the write buffer is itself
+    compressed; it is written out once flush_rows readings are pending or
+    flush_interval seconds have passed. Existing files for the day are
+    appended to. temp_f is derived data and is not stored.
+    '''
+
+    def __init__(self, output_path=LOCAL_OUTPUT_PATH, \
+        flush_rows=TEMP_LOG_FLUSH_ROWS, flush_interval=TEMP_LOG_FLUSH_INTERVAL, \
+        quantum=TEMP_QUANTUM):
+        '''Init method for the compressed log writer.
+
+        :param str output_path: Directory the daily .tsz files are written to.
+        :param int flush_rows: Pending readings that trigger a flush.
+        :param float flush_interval: Max seconds between flushes.
+        :param float quantum: Resolution temps are stored at, in deg C.
+
+        :return: CodecWriter object
+        '''
+
+        self.output_path = output_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.quantum = quantum
+
+        self._lock = threading.RLock()
+        self._files = {}  # (date_utc, room, sensor) -> _SeriesFile
+        self._dirty = set()
+        self._current_day = None
+        self._current_date_utc = None
+        self._pending_rows = 0
+        self._last_flush = time.time()
+
+    def write(self, timestamp, sensor_room, sensor_name, temp_c, temp_f=None):
+        '''Encodes one temperature reading.
+
+        :param datetime timestamp: UTC time of the reading.
+
+        :return: True
+        '''
+
+        with self._lock:
+            day = (timestamp.year, timestamp.month, timestamp.day)
+            if day != self._current_day:
+                self.close()
+                self._current_day = day
+                self._current_date_utc = timestamp.strftime(TEMP_RECORD_DATE_FORMAT)
+
+            key = (self._current_date_utc, sensor_room, sensor_name)
+            series = self._files.get(key)
+            if series is None:
+                series = self._files[key] = self._openFile(key)
+            series.encoder.encode(toEpoch(timestamp), temp_c)
+            self._dirty.add(series)
+            self._pending_rows += 1
+
+            if self._pending_rows >= self.flush_rows or \
+                time.time() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+        return True
+
+    def flush(self):
+        '''Writes all encoded readings out to their files.'''
+
+        with self._lock:
+            for series in self._dirty:
+                series.flush()
+            self._dirty = set()
+            self._pending_rows = 0
+            self._last_flush = time.time()
+
+        return True
+
+    def close(self):
+        '''Flushes encoded readings and closes all open files.'''
+
+        with self._lock:
+            self.flush()
+            for series in self._files.values():
+                series.handle.close()
+            self._files = {}
+            self._dirty = set()
+
+        return True
+
+    def _openFile(self, key):
+        if not os.path.isdir(self.output_path):
+            os.makedirs(self.output_path)
+
+        return _SeriesFile(os.path.join(self.output_path, \
+            CODEC_FILENAME.format(*key)), key[1], key[2], self.quantum)
+
+
+def compressCsvFile(csv_path, output_path, quantum=TEMP_QUANTUM):
+    '''Encodes one daily *_sensorTemps.csv file as a .tsz file. A log with
+    no rows is skipped: a .tsz file needs the room and sensor names, and
+    they can't be told apart in the filename (either can hold "_").
+
+    :return: Tuple of (path written, rows encoded), or (None, 0) if the
+        log was skipped.
+    '''
+
+    encoder = SeriesEncoder(quantum)
+    sensor_room = sensor_name = None
+    with open(csv_path) as f:
+        next(f, None)  # Skip header
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            timestamp, sensor_room, sensor_name, temp_c = parseCsvRow(line)
+            encoder.encode(toEpoch(timestamp), temp_c)
+
+    if sensor_room is None:
+        return None, 0
+
+    tsz_path = os.path.join(output_path, \
+        os.path.splitext(os.path.basename(csv_path))[0] + CODEC_SUFFIX)
+    tmp_path = tsz_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_packHeader(sensor_room, sensor_name, quantum))
+        f.write(bytes(encoder.bits.data) + encoder.bits.tail())
+    os.rename(tmp_path, tsz_path)
+
+    return tsz_path, encoder.rows
+
+
+def decompressFile(tsz_path, output_path):
+    '''Decodes one .tsz file back into a daily *_sensorTemps.csv file.
+
+    :return: Tuple of (path written, rows decoded).
+    '''
+
+    rows = 0
+    csv_path = os.path.join(output_path, \
+        os.path.splitext(os.path.basename(tsz_path))[0] + CSV_SUFFIX)
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(TEMP_RECORD_FILE_HEADER)
+        for timestamp, sensor_room, sensor_name, temp_c in \
+            iterCompressedFile(tsz_path):
+            f.write("{0},{1},{2},{3},{4},{5}\n".format( \
+                timestamp.strftime(TEMP_RECORD_DATE_FORMAT), \
+                timestamp.strftime("%H:%M:%S"), sensor_room, sensor_name, \
+                temp_c, temp_c * 9.0/5.0 + 32.0))
+            rows += 1
+    os.rename(tmp_path, csv_path)
+
+    return csv_path, rows
+
+
+def main(argv=None):
+    '''Command line converter between daily CSV logs and compressed logs.'''
+
+    parser = argparse.ArgumentParser(description="Compress sensor temperature " \
+        "CSV files (or decompress .tsz files back into CSVs).")
+    parser.add_argument("input_dir", nargs="?", default=LOCAL_OUTPUT_PATH)
+    parser.add_argument("--output", help="Directory to write to (defaults " \
+        "to the input directory).")
+    parser.add_argument("--to-csv", action="store_true", help="Decompress " \
+        ".tsz files instead.")
+    parser.add_argument("--quantum", type=float, default=TEMP_QUANTUM, \
+        help="Resolution temps are stored at, in deg C.")
+    parser.add_argument("--delete", action="store_true", help="Delete each " \
+        "input file once it's converted.")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or args.input_dir
+    if not os.path.isdir(output_path):
+        os.makedirs(output_path)
+
+    pattern = CODEC_FILE_PATTERN if args.to_csv else CSV_FILE_PATTERN
+    input_paths = sorted(glob.glob(os.path.join(args.input_dir, pattern)), \
+        key=csvSortKey)
+
+    converted, total_in, total_out = 0, 0, 0
+    for input_path in input_paths:
+        if args.to_csv:
+            output_file, rows = decompressFile(input_path, output_path)
+        else:
+            output_file, rows = compressCsvFile(input_path, output_path, \
+                args.quantum)
+            if output_file is None:
+                print(EMPTY_LOG_SKIPPED_MSG.format(input_path))
+                continue
+        size_in = os.path.getsize(input_path)
+        size_out = os.path.getsize(output_file)
+        converted += 1
+        total_in += size_in
+        total_out += size_out
+        print(CONVERTED_MSG.format(input_path, output_file, rows, size_in, \
+            size_out, float(max(size_in, size_out)) / max(1, min(size_in, size_out))))
+        if args.delete:
+            os.remove(input_path)
+
+    print(CONVERTED_TOTAL_MSG.format(converted, total_in, total_out, \
+        float(max(total_in, total_out)) / max(1, min(total_in, total_out))))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
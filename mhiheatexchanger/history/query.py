@@ -0,0 +1,455 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import bisect, os, struct, threading
+from datetime import datetime, timedelta
+
+from mhiheatexchanger.history.codec import CODEC_FILENAME, CODEC_SUFFIX, \
+    readCompressedFile
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH, \
+    LOCAL_OUTPUT_FILENAME, TEMP_RECORD_DATE_FORMAT
+
+INDEX_DIRNAME = "index"  # Sidecar index files go in this dir next to the CSVs
+INDEX_FILENAME_SUFFIX = ".idx"
+INDEX_BLOCK_ROWS = 64  # Rows covered by each sparse index entry
+
+# Index file layout: header, then one fixed-width entry per block of rows
+INDEX_MAGIC = b"MHIX"
+INDEX_HEADER_FORMAT = "<4sIQ"  # Magic, rows per block, bytes of CSV indexed
+INDEX_BLOCK_FORMAT = "<IIQIddd"  # First/last secs of day, offset, rows, min, max, sum
+
+# Positions of the fields in an index block
+BLOCK_FIRST, BLOCK_LAST, BLOCK_OFFSET, BLOCK_ROWS, BLOCK_MIN, BLOCK_MAX, \
+    BLOCK_SUM = range(7)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _parseRow(line):
+    '''Returns (seconds of day, temp C) for one raw CSV row (as bytes).'''
+
+    fields = line.split(b",", 5)
+    time_utc = fields[1]
+    secs = int(time_utc[0:2]) * 3600 + int(time_utc[3:5]) * 60 + \
+        int(time_utc[6:8])
+
+    return secs, float(fields[4])
+
+
+class FileIndex(object):
+    '''Sparse index over one daily CSV file written by Sensor.recordTemp.
+
+    Every INDEX_BLOCK_ROWS rows get one entry holding the byte offset of the
+    block's first row, its first/last time of day and the min/max/sum of
+    its temperatures. Rows within a daily file are in time order, so time
+    lookups are a bisect over the entries, and aggregates only need to read
+    the (at most two) blocks at the edges of a range. The index is extended
+    incrementally as the CSV file grows and is saved to a sidecar file.
+    '''
+
+    def __init__(self, csv_path, index_path=None, block_rows=INDEX_BLOCK_ROWS):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.block_rows = block_rows
+        self.blocks = []
+        self.block_lasts = []  # Last secs of day per block, for bisecting
+        self.indexed_size = 0
+
+        if self.index_path and os.path.isfile(self.index_path):
+            self._load()
+
+    def refresh(self):
+        '''Indexes any rows appended to the CSV file since the last refresh.
+
+        :return: True if the index changed.
+        '''
+
+        try:
+            size = os.path.getsize(self.csv_path)
+        except OSError:
+            size = 0
+
+        if size < self.indexed_size:  # File was replaced; start over
+            self.blocks, self.block_lasts, self.indexed_size = [], [], 0
+        if size == self.indexed_size:
+            return False
+
+        with open(self.csv_path, "rb") as f:
+            f.seek(self.indexed_size)
+            data = f.read(size - self.indexed_size)
+
+        end = data.rfind(b"\n") + 1  # Only index complete lines
+        offset = self.indexed_size
+        for line in data[:end].splitlines(True):
+            if offset == 0 or not line[:1].isdigit():  # Header
+                offset += len(line)
+                continue
+
+            secs, temp_c = _parseRow(line)
+            self._addRow(secs, temp_c, offset)
+            offset += len(line)
+
+        changed = offset != self.indexed_size
+        self.indexed_size = offset
+        if changed and self.index_path:
+            self._save()
+
+        return changed
+
+    def rowCount(self):
+        return sum(block[BLOCK_ROWS] for block in self.blocks)
+
+    def firstBlockAfter(self, secs):
+        '''Returns position of the first block that may hold rows at or after
+        secs (seconds of day).
+        '''
+
+        return bisect.bisect_left(self.block_lasts, secs)
+
+    def blockEnd(self, position):
+        '''Returns byte offset just past the last row of a block.'''
+
+        if position + 1 < len(self.blocks):
+            return self.blocks[position + 1][BLOCK_OFFSET]
+
+        return self.indexed_size
+
+    def scan(self, offset, start_secs=0, end_secs=SECONDS_PER_DAY, \
+        end_offset=None):
+        '''Reads rows from a byte offset, returning (secs, temp C) pairs with
+        start_secs <= secs <= end_secs. Stops at end_secs, or at end_offset
+        (defaults to the indexed end of the file).
+        '''
+
+        if end_offset is None:
+            end_offset = self.indexed_size
+
+        rows = []
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                position += len(line)
+                if position > end_offset:
+                    break
+                secs, temp_c = _parseRow(line)
+                if secs > end_secs:
+                    break
+                if secs >= start_secs:
+                    rows.append((secs, temp_c))
+
+        return rows
+
+    def _addRow(self, secs, temp_c, offset):
+        block = self.blocks[-1] if self.blocks else None
+        if block is None or block[BLOCK_ROWS] >= self.block_rows:
+            self.blocks.append([secs, secs, offset, 1, temp_c, temp_c, temp_c])
+            self.block_lasts.append(secs)
+        else:
+            block[BLOCK_LAST] = secs
+            block[BLOCK_ROWS] += 1
+            block[BLOCK_SUM] += temp_c
+            if temp_c < block[BLOCK_MIN]: block[BLOCK_MIN] = temp_c
+            if temp_c > block[BLOCK_MAX]: block[BLOCK_MAX] = temp_c
+            self.block_lasts[-1] = secs
+
+    def _load(self):
+        header_size = struct.calcsize(INDEX_HEADER_FORMAT)
+        block_struct = struct.Struct(INDEX_BLOCK_FORMAT)
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+
+        if len(data) < header_size:
+            return
+        magic, block_rows, indexed_size = \
+            struct.unpack_from(INDEX_HEADER_FORMAT, data)
+        if magic != INDEX_MAGIC or block_rows != self.block_rows:
+            return  # Stale or foreign index; rebuild from scratch
+
+        blocks = []
+        for offset in range(header_size, len(data) - block_struct.size + 1, \
+            block_struct.size):
+            blocks.append(list(block_struct.unpack_from(data, offset)))
+
+        self.blocks = blocks
+        self.block_lasts = [block[BLOCK_LAST] for block in blocks]
+        self.indexed_size = indexed_size
+
+    def _save(self):
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir and not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+
+        block_struct = struct.Struct(INDEX_BLOCK_FORMAT)
+        parts = [struct.pack(INDEX_HEADER_FORMAT, INDEX_MAGIC, self.block_rows, \
+            self.indexed_size)]
+        parts.extend(block_struct.pack(*block) for block in self.blocks)
+
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.rename(temp_path, self.index_path)  # Never leave a half-written index
+
+
+class CompressedFileIndex(FileIndex):
+    '''FileIndex over one compressed daily log (.tsz, see history.codec).
+    A bit stream can't be read from the middle, so the file is decoded
+    into memory, again each time it has grown, and block offsets are row
+    numbers. The index is only kept in memory.
+    '''
+
+    def __init__(self, tsz_path, block_rows=INDEX_BLOCK_ROWS):
+        self.tsz_path = tsz_path
+        self.block_rows = block_rows
+        self.blocks = []
+        self.block_lasts = []
+        self.indexed_size = 0  # Rows indexed
+        self.rows = []  # (secs of day, temp C)
+        self._file_size = 0
+
+    def refresh(self):
+        '''Decodes the file again if it has changed since the last refresh.
+
+        :return: True if the index changed.
+        '''
+
+        try:
+            size = os.path.getsize(self.tsz_path)
+        except OSError:
+            size = 0
+        if size == self._file_size:
+            return False
+
+        try:
+            decoder = readCompressedFile(self.tsz_path)[2]
+            rows = [(secs % SECONDS_PER_DAY, temp_c) for secs, temp_c in decoder]
+        except ValueError:  # Header not written out yet
+            rows = []
+
+        self.blocks, self.block_lasts = [], []
+        for offset, (secs, temp_c) in enumerate(rows):
+            self._addRow(secs, temp_c, offset)
+        self.rows = rows
+        self.indexed_size = len(rows)
+        self._file_size = size
+
+        return True
+
+    def scan(self, offset, start_secs=0, end_secs=SECONDS_PER_DAY, \
+        end_offset=None):
+        '''Returns the (secs, temp C) rows from row number offset on with
+        start_secs <= secs <= end_secs, stopping at end_secs or end_offset.
+        '''
+
+        rows = []
+        for secs, temp_c in self.rows[offset:end_offset]:
+            if secs > end_secs:
+                break
+            if secs >= start_secs:
+                rows.append((secs, temp_c))
+
+        return rows
+
+
+class TempHistory(object):
+    '''Time-range queries over the daily logs written by Sensor.recordTemp:
+    CSV files, or compressed .tsz files (see history.codec) for days
+    without a CSV.
+
+    Only the files for the days a query covers are opened, and within each
+    file the sparse FileIndex is used to seek straight to the rows needed.
+    Indexes are cached in memory and saved in INDEX_DIRNAME, so repeated
+    queries over a growing file only index the new rows. Compressed files
+    are decoded whole (see CompressedFileIndex).
+    '''
+
+    def __init__(self, output_path=LOCAL_OUTPUT_PATH, index_path=None, \
+        block_rows=INDEX_BLOCK_ROWS):
+        '''Init method for the history query object.
+
+        :param str output_path: Directory holding the daily CSV files.
+        :param str index_path: Directory for the sidecar index files
+            (defaults to INDEX_DIRNAME inside output_path).
+        :param int block_rows: Rows covered by each index entry.
+
+        :return: TempHistory object
+        '''
+
+        self.output_path = output_path
+        self.index_path = index_path or os.path.join(output_path, INDEX_DIRNAME)
+        self.block_rows = block_rows
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def readings(self, sensor_room, sensor_name, start, end):
+        '''Returns all readings taken between start and end (inclusive).
+
+        :param str sensor_room: Room name where the sensor is located.
+        :param str sensor_name: Name of the sensor in the room.
+        :param datetime start: Start of the range (UTC).
+        :param datetime end: End of the range (UTC).
+
+        :return: List of (datetime, temp C) tuples, oldest first.
+        '''
+
+        readings = []
+        for day, index, start_secs, end_secs in \
+            self._daysInRange(sensor_room, sensor_name, start, end):
+            position = index.firstBlockAfter(start_secs)
+            if position == len(index.blocks):
+                continue
+            rows = index.scan(index.blocks[position][BLOCK_OFFSET], \
+                start_secs, end_secs)
+            readings.extend((day + timedelta(seconds=secs), temp_c) \
+                for secs, temp_c in rows)
+
+        return readings
+
+    def latest(self, sensor_room, sensor_name, count=1):
+        '''Returns the most recent readings for a sensor.
+
+        :param int count: Number of readings to return.
+
+        :return: List of up to count (datetime, temp C) tuples, oldest first.
+        '''
+
+        readings = []
+        for day, log_path in reversed(self._sensorFiles(sensor_room, sensor_name)):
+            index = self._index(log_path)
+            needed = count - len(readings)
+
+            # Walk back from the last block until enough rows are covered
+            position, covered = len(index.blocks), 0
+            while position > 0 and covered < needed:
+                position -= 1
+                covered += index.blocks[position][BLOCK_ROWS]
+            if position == len(index.blocks):
+                continue
+
+            rows = index.scan(index.blocks[position][BLOCK_OFFSET])[-needed:]
+            readings[:0] = [(day + timedelta(seconds=secs), temp_c) \
+                for secs, temp_c in rows]
+            if len(readings) >= count:
+                break
+
+        return readings
+
+    def summary(self, sensor_room, sensor_name, start, end):
+        '''Returns min/max/mean temp for a sensor between start and end.
+        Blocks entirely inside the range are answered from the index; only
+        the blocks at the edges of each day are read from disk. Days whose
+        CSVs have been compacted are answered from their rollups (see
+        history.rollups), to the minute (or hour, for older days).
+
+        :return: Dict with 'count', 'min', 'max' and 'mean' keys, or None if
+            there are no readings in the range.
+        '''
+
+        count, total = 0, 0.0
+        low, high = None, None
+        raw_days = set()
+
+        for day, index, start_secs, end_secs in \
+            self._daysInRange(sensor_room, sensor_name, start, end):
+            raw_days.add(day)
+            first = index.firstBlockAfter(start_secs)
+            for position in range(first, len(index.blocks)):
+                block = index.blocks[position]
+                if block[BLOCK_FIRST] > end_secs:
+                    break
+
+                if block[BLOCK_FIRST] >= start_secs and \
+                    block[BLOCK_LAST] <= end_secs:
+                    block_count, block_sum = block[BLOCK_ROWS], block[BLOCK_SUM]
+                    block_min, block_max = block[BLOCK_MIN], block[BLOCK_MAX]
+                else:  # Edge block: read just the rows inside the range
+                    temps = [temp_c for secs, temp_c in index.scan(\
+                        block[BLOCK_OFFSET], start_secs, end_secs, \
+                        index.blockEnd(position))]
+                    if not temps:
+                        continue
+                    block_count, block_sum = len(temps), sum(temps)
+                    block_min, block_max = min(temps), max(temps)
+
+                count += block_count
+                total += block_sum
+                low = block_min if low is None else min(low, block_min)
+                high = block_max if high is None else max(high, block_max)
+
+        # Imported here, as the rollups module imports this one
+        from mhiheatexchanger.history.rollups import compactedBuckets
+        for bucket_start, bucket_count, bucket_min, bucket_max, bucket_sum in \
+            compactedBuckets(sensor_room, sensor_name, start, end, \
+                self.output_path, raw_days):
+            count += bucket_count
+            total += bucket_sum
+            low = bucket_min if low is None else min(low, bucket_min)
+            high = bucket_max if high is None else max(high, bucket_max)
+
+        if count == 0:
+            return None
+
+        return {'count': count, 'min': low, 'max': high, 'mean': total / count}
+
+    def _logPath(self, day, sensor_room, sensor_name):
+        '''Returns the path of a sensor's log for a day (the CSV unless
+        there's only a compressed one), or None if there's neither.
+        '''
+
+        date_utc = day.strftime(TEMP_RECORD_DATE_FORMAT)
+        for filename in (LOCAL_OUTPUT_FILENAME, CODEC_FILENAME):
+            path = os.path.join(self.output_path, \
+                filename.format(date_utc, sensor_room, sensor_name))
+            if os.path.isfile(path):
+                return path
+
+        return None
+
+    def _index(self, log_path):
+        with self._lock:
+            index = self._indexes.get(log_path)
+            if index is None:
+                if log_path.endswith(CODEC_SUFFIX):
+                    index = CompressedFileIndex(log_path, self.block_rows)
+                else:
+                    index = FileIndex(log_path, os.path.join(self.index_path, \
+                        os.path.basename(log_path) + INDEX_FILENAME_SUFFIX), \
+                        self.block_rows)
+                self._indexes[log_path] = index
+            index.refresh()
+
+        return index
+
+    def _daysInRange(self, sensor_room, sensor_name, start, end):
+        '''Yields (day, index, start secs, end secs) for each daily file that
+        exists between start and end.
+        '''
+
+        day = datetime(start.year, start.month, start.day)
+        while day <= end:
+            log_path = self._logPath(day, sensor_room, sensor_name)
+            if log_path is not None:
+                start_secs = max(0, int((start - day).total_seconds()))
+                end_secs = min(SECONDS_PER_DAY, int((end - day).total_seconds()))
+                yield day, self._index(log_path), start_secs, end_secs
+            day += timedelta(days=1)
+
+    def _sensorFiles(self, sensor_room, sensor_name):
+        '''Returns (day, path) for every daily log of a sensor, oldest first
+        (the CSV, for days that also have a compressed log).
+        '''
+
+        files = {}
+        for filename_format in (CODEC_FILENAME, LOCAL_OUTPUT_FILENAME):
+            suffix = filename_format.format("", sensor_room, sensor_name)
+            for filename in os.listdir(self.output_path):
+                date_utc = filename[:-len(suffix)]
+                if filename.endswith(suffix) and "_" not in date_utc:
+                    try:
+                        day = datetime.strptime(date_utc, TEMP_RECORD_DATE_FORMAT)
+                    except ValueError:
+                        continue
+                    files[day] = os.path.join(self.output_path, filename)
+
+        return sorted(files.items())
@@ -0,0 +1,433 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Retention compaction for the daily *_sensorTemps.csv files (or the .tsz
+# files history.codec compresses them to). Raw files older than
+# RAW_RETENTION_DAYS are rolled up into per-minute files (one per sensor per
+# day) and per-hour files (one per sensor per month), and then deleted;
+# rollups are deleted in turn once they're past their own retention.
+# Rollup files are gzipped CSV, with rows:
+#
+#   Date-UTC,Time-UTC,Room,Sensor,Count,MinC,MaxC,MeanC
+#
+# Run once by hand with:
+#
+#   python -m mhiheatexchanger.history.rollups [csv_dir]
+
+import argparse, glob, gzip, os, sys, threading
+from datetime import datetime, timedelta
+
+from mhiheatexchanger.history.codec import CODEC_SUFFIX, CSV_SUFFIX, \
+    dailyLogFiles, iterDailyLog
+from mhiheatexchanger.history.query import INDEX_DIRNAME, INDEX_FILENAME_SUFFIX
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH, \
+    TEMP_RECORD_DATE_FORMAT
+
+ROLLUP_DIRNAME = "rollups"  # Rollup files go in this dir next to the CSVs
+RESOLUTION_MINUTE = "minute"
+RESOLUTION_HOUR = "hour"
+RESOLUTION_SECONDS = {RESOLUTION_MINUTE: 60, RESOLUTION_HOUR: 3600}
+ROLLUP_FILENAME = "{0}_{1}_{2}_{3}.csv.gz"  # Period, room, sensor, resolution
+ROLLUP_MONTH_FORMAT = "%Y-%m"  # Period of hour rollup files
+ROLLUP_FILE_HEADER = "Date-UTC,Time-UTC,Room,Sensor,Count,MinC,MaxC,MeanC\n"
+ROLLUP_ROW = "{0},{1},{2},{3},{4},{5!r},{6!r},{7!r}\n"
+
+RAW_RETENTION_DAYS = 7  # Days of per-reading CSVs kept before rolling up
+MINUTE_RETENTION_DAYS = 90  # Days of per-minute rollups kept (None keeps them all)
+HOUR_RETENTION_DAYS = 5 * 365  # Days of per-hour rollups kept (None keeps them all)
+COMPACTION_INTERVAL = 6 * 3600  # Seconds between background compaction runs
+
+COMPACTED_MSG = "Compacted temp logs: {0} raw files rolled up, {1} rollup files expired."
+ERROR_COMPACTION_FAILED = "ERROR: Temp log compaction failed: {0!r}"
+
+
+def rollUp(readings, bucket_seconds):
+    '''Streams (datetime, temp_c) readings (in time order) into fixed-width
+    time buckets. Only the current bucket is held in memory.
+
+    :return: Generator of (bucket start datetime, count, min, max, sum).
+    '''
+
+    bucket = None
+    for timestamp, temp_c in readings:
+        start = _bucketStart(timestamp, bucket_seconds)
+        if bucket is not None and bucket[0] == start:
+            bucket[1] += 1
+            bucket[2] = min(bucket[2], temp_c)
+            bucket[3] = max(bucket[3], temp_c)
+            bucket[4] += temp_c
+            continue
+
+        if bucket is not None:
+            yield tuple(bucket)
+        bucket = [start, 1, temp_c, temp_c, temp_c]
+
+    if bucket is not None:
+        yield tuple(bucket)
+
+
+def mergeBuckets(buckets, bucket_seconds):
+    '''Streams finer (start, count, min, max, sum) buckets (in time order)
+    into coarser ones, e.g. minutes into hours.
+
+    :return: Generator of (bucket start datetime, count, min, max, sum).
+    '''
+
+    bucket = None
+    for start, count, low, high, total in buckets:
+        start = _bucketStart(start, bucket_seconds)
+        if bucket is not None and bucket[0] == start:
+            bucket[1] += count
+            bucket[2] = min(bucket[2], low)
+            bucket[3] = max(bucket[3], high)
+            bucket[4] += total
+            continue
+
+        if bucket is not None:
+            yield tuple(bucket)
+        bucket = [start, count, low, high, total]
+
+    if bucket is not None:
+        yield tuple(bucket)
+
+
+def readRollup(path):
+    '''Streams the buckets in a rollup file.
+
+    :return: Generator of (bucket start datetime, count, min, max, sum).
+    '''
+
+    if not os.path.isfile(path):
+        return
+
+    with gzip.open(path, "rb") as f:
+        next(f, None)  # Skip header
+        while True:
+            try:
+                line = next(f, None)
+            except (EOFError, IOError, OSError):
+                return  # Cut short by a crash mid-write
+            if line is None:
+                return
+
+            fields = line.decode("utf-8").rstrip("\n").split(",")
+            if len(fields) < 8:
+                continue
+            start = datetime.strptime(fields[0] + " " + fields[1], \
+                TEMP_RECORD_DATE_FORMAT + " %H:%M:%S")
+            count, mean = int(fields[4]), float(fields[7])
+            yield start, count, float(fields[5]), float(fields[6]), mean * count
+
+
+def writeRollup(path, sensor_room, sensor_name, buckets, append=False):
+    '''Writes buckets to a gzipped rollup file. A new file is written under
+    a temporary name and renamed into place; appending adds a gzip member
+    to the end of the file.
+
+    :return: Number of buckets written.
+    '''
+
+    rollup_dir = os.path.dirname(path)
+    if not os.path.isdir(rollup_dir):
+        os.makedirs(rollup_dir)
+
+    append = append and os.path.isfile(path)
+    target = path if append else path + ".tmp"
+    written = 0
+    with gzip.open(target, "ab" if append else "wb") as f:
+        if not append:
+            f.write(ROLLUP_FILE_HEADER.encode("utf-8"))
+        for start, count, low, high, total in buckets:
+            f.write(ROLLUP_ROW.format(start.strftime(TEMP_RECORD_DATE_FORMAT), \
+                start.strftime("%H:%M:%S"), sensor_room, sensor_name, count, \
+                low, high, total / count).encode("utf-8"))
+            written += 1
+
+    if not append:
+        os.rename(target, path)
+
+    return written
+
+
+def rollupPath(rollup_path, resolution, period, sensor_room, sensor_name):
+    '''Returns the rollup file holding a sensor's buckets for a period (a
+    day for minute rollups, a month for hour rollups).
+    '''
+
+    period_format = TEMP_RECORD_DATE_FORMAT if resolution == RESOLUTION_MINUTE \
+        else ROLLUP_MONTH_FORMAT
+
+    return os.path.join(rollup_path, resolution, ROLLUP_FILENAME.format(\
+        period.strftime(period_format), sensor_room, sensor_name, resolution))
+
+
+def _bucketStart(timestamp, bucket_seconds):
+    day = datetime(timestamp.year, timestamp.month, timestamp.day)
+    secs = int((timestamp - day).total_seconds())
+
+    return day + timedelta(seconds=secs - secs % bucket_seconds)
+
+
+def compactedBuckets(sensor_room, sensor_name, start, end, \
+    output_path=LOCAL_OUTPUT_PATH, skip_days=()):
+    '''Streams a sensor's rollup buckets that start between start and end
+    (inclusive): minute buckets for days that still have a minute rollup,
+    hour buckets for older days. Only the rollup files for the days and
+    months in the range are opened, each once.
+
+    :param skip_days: Collection of days (midnight datetimes) to leave out,
+        e.g. days whose raw CSVs haven't been compacted yet.
+
+    :return: Generator of (bucket start datetime, count, min, max, sum), in
+        no particular order.
+    '''
+
+    rollup_path = os.path.join(output_path, ROLLUP_DIRNAME)
+    hour_days = set()  # Days only left in the hour rollups
+    day = datetime(start.year, start.month, start.day)
+    while day <= end:
+        if day not in skip_days:
+            minute_path = rollupPath(rollup_path, RESOLUTION_MINUTE, day, \
+                sensor_room, sensor_name)
+            if os.path.isfile(minute_path):
+                for bucket in readRollup(minute_path):
+                    if start <= bucket[0] <= end:
+                        yield bucket
+            else:
+                hour_days.add(day)
+        day += timedelta(days=1)
+
+    months = sorted(set(datetime(day.year, day.month, 1) for day in hour_days))
+    for month in months:
+        hour_path = rollupPath(rollup_path, RESOLUTION_HOUR, month, \
+            sensor_room, sensor_name)
+        for bucket in readRollup(hour_path):
+            bucket_day = datetime(bucket[0].year, bucket[0].month, bucket[0].day)
+            if bucket_day in hour_days and start <= bucket[0] <= end:
+                yield bucket
+
+
+def rollupSensors(output_path=LOCAL_OUTPUT_PATH):
+    '''Finds the sensors that have rollups, and the time they cover (room
+    and sensor names can hold "_", so they're read from each file's first
+    row rather than its name).
+
+    :return: Dict of (room, sensor) -> (start, end) datetimes, spanning
+        every day (or month, for hour rollups) a rollup file covers.
+    '''
+
+    sensors = {}
+    for resolution, period_format in ((RESOLUTION_MINUTE, TEMP_RECORD_DATE_FORMAT), \
+        (RESOLUTION_HOUR, ROLLUP_MONTH_FORMAT)):
+        for path in glob.glob(os.path.join(output_path, ROLLUP_DIRNAME, \
+            resolution, "*.csv.gz")):
+            start = _fileDate(path, period_format)
+            key = _rollupSensor(path)
+            if start is None or key is None:
+                continue
+            if resolution == RESOLUTION_MINUTE:
+                end = start + timedelta(days=1)
+            else:
+                end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+            end -= timedelta(seconds=1)
+
+            if key in sensors:
+                start = min(start, sensors[key][0])
+                end = max(end, sensors[key][1])
+            sensors[key] = (start, end)
+
+    return sensors
+
+
+def _rollupSensor(path):
+    try:
+        with gzip.open(path, "rb") as f:
+            next(f, None)  # Skip header
+            fields = next(f, b"").decode("utf-8").split(",")
+    except (EOFError, IOError, OSError):
+        return None
+
+    return (fields[2], fields[3]) if len(fields) >= 8 else None
+
+
+def _fileDate(path, period_format):
+    try:
+        return datetime.strptime(os.path.basename(path).split("_", 1)[0], \
+            period_format)
+    except ValueError:
+        return None
+
+
+class Compactor(object):
+    '''Rolls up and expires temp log files in a CSV output directory (see
+    the module comment). Every step streams one file at a time, and a file
+    is only deleted once what replaces it is on disk, so a run can be cut
+    short at any point and picked up by the next one.
+    '''
+
+    def __init__(self, output_path=LOCAL_OUTPUT_PATH, \
+        raw_days=RAW_RETENTION_DAYS, minute_days=MINUTE_RETENTION_DAYS, \
+        hour_days=HOUR_RETENTION_DAYS):
+        '''Init method for the compactor.
+
+        :param str output_path: Directory holding the daily CSV files.
+        :param int raw_days: Days of raw CSVs to keep (at least 1, so the
+            file being written today is never touched).
+        :param int minute_days: Days of minute rollups to keep (None for all).
+        :param int hour_days: Days of hour rollups to keep (None for all).
+
+        :return: Compactor object
+        '''
+
+        self.output_path = output_path
+        self.rollup_path = os.path.join(output_path, ROLLUP_DIRNAME)
+        self.raw_days = max(1, raw_days)
+        self.minute_days = minute_days
+        self.hour_days = hour_days
+        self._lock = threading.Lock()
+
+    def compact(self, now=None):
+        '''Runs one compaction pass.
+
+        :param datetime now: Current UTC time (defaults to utcnow()).
+
+        :return: Tuple of (raw files rolled up, rollup files expired).
+        '''
+
+        now = now or datetime.utcnow()
+        today = datetime(now.year, now.month, now.day)
+
+        with self._lock:
+            rolled_up = 0
+            raw_cutoff = today - timedelta(days=self.raw_days - 1)
+            for log_path in dailyLogFiles(self.output_path):
+                day = _fileDate(log_path, TEMP_RECORD_DATE_FORMAT)
+                if day is not None and day < raw_cutoff:
+                    rolled_up += self.rollUpFile(log_path, day)
+
+            expired = self._expire(RESOLUTION_MINUTE, TEMP_RECORD_DATE_FORMAT, \
+                self.minute_days, today, timedelta(days=1))
+            expired += self._expire(RESOLUTION_HOUR, ROLLUP_MONTH_FORMAT, \
+                self.hour_days, today, timedelta(days=31))
+
+        return rolled_up, expired
+
+    def rollUpFile(self, log_path, day):
+        '''Rolls one raw daily log (CSV or .tsz) up into its minute and hour
+        rollups, then deletes it, its query index, and any copy of the same
+        day in the other format.
+
+        :return: 1 if the file was rolled up, 0 if it was empty.
+        '''
+
+        first = next(iterDailyLog(log_path), None)
+        if first is not None:
+            timestamp, sensor_room, sensor_name, temp_c = first
+            minute_path = rollupPath(self.rollup_path, RESOLUTION_MINUTE, day, \
+                sensor_room, sensor_name)
+            hour_path = rollupPath(self.rollup_path, RESOLUTION_HOUR, day, \
+                sensor_room, sensor_name)
+
+            readings = ((timestamp, temp_c) for timestamp, room, sensor, temp_c \
+                in iterDailyLog(log_path))
+            writeRollup(minute_path, sensor_room, sensor_name, \
+                rollUp(readings, RESOLUTION_SECONDS[RESOLUTION_MINUTE]))
+
+            # Hour files are appended to a day at a time; skip hours that a
+            # run cut short before the raw file was deleted already added
+            last_hour = None
+            for bucket in readRollup(hour_path):
+                last_hour = bucket[0]
+            hours = mergeBuckets(readRollup(minute_path), \
+                RESOLUTION_SECONDS[RESOLUTION_HOUR])
+            writeRollup(hour_path, sensor_room, sensor_name, (bucket \
+                for bucket in hours if last_hour is None or bucket[0] > last_hour), \
+                append=True)
+
+        stem = os.path.splitext(log_path)[0]
+        csv_path = stem + CSV_SUFFIX
+        index_path = os.path.join(self.output_path, INDEX_DIRNAME, \
+            os.path.basename(csv_path) + INDEX_FILENAME_SUFFIX)
+        for path in (log_path, stem + CODEC_SUFFIX, csv_path, index_path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+        return 1 if first is not None else 0
+
+    def _expire(self, resolution, period_format, retention_days, today, \
+        period_length):
+        if retention_days is None:
+            return 0
+
+        expired = 0
+        cutoff = today - timedelta(days=retention_days)
+        for path in glob.glob(os.path.join(self.rollup_path, resolution, \
+            "*.csv.gz")):
+            period = _fileDate(path, period_format)
+            # Only once the whole period is past the cutoff
+            if period is not None and period + period_length <= cutoff:
+                os.remove(path)
+                expired += 1
+
+        return expired
+
+
+class CompactionJob(object):
+    '''Runs a Compactor every interval seconds in a background thread.'''
+
+    def __init__(self, compactor=None, interval=COMPACTION_INTERVAL):
+        self.compactor = compactor or Compactor()
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, \
+            name="mhi-templog-compaction")
+        self._thread.daemon = True
+        self._thread.start()
+
+        return True
+
+    def stop(self):
+        '''Stops the job, waiting for a compaction pass in progress.'''
+
+        self._stopped.set()
+        if self._thread is not None and \
+            self._thread is not threading.current_thread():
+            self._thread.join()
+
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                print(COMPACTED_MSG.format(*self.compactor.compact()))
+            except Exception as e:
+                print(ERROR_COMPACTION_FAILED.format(e))
+            if self._stopped.wait(self.interval):
+                return
+
+
+def main(argv=None):
+    '''Runs one compaction pass over a CSV output directory.'''
+
+    parser = argparse.ArgumentParser(description="Roll up and expire " \
+        "sensor temperature logs.")
+    parser.add_argument("csv_dir", nargs="?", default=LOCAL_OUTPUT_PATH)
+    parser.add_argument("--raw-days", type=int, default=RAW_RETENTION_DAYS)
+    parser.add_argument("--minute-days", type=int, default=MINUTE_RETENTION_DAYS)
+    parser.add_argument("--hour-days", type=int, default=HOUR_RETENTION_DAYS)
+    args = parser.parse_args(argv)
+
+    compactor = Compactor(args.csv_dir, args.raw_days, args.minute_days, \
+        args.hour_days)
+    print(COMPACTED_MSG.format(*compactor.compact()))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,337 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import argparse, calendar, glob, os, struct, sys, threading, time
+from datetime import datetime
+
+try:
+    from datetime import timezone
+    _UTC = timezone.utc
+except ImportError:  # Python 2
+    _UTC = None
+
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH, \
+    TEMP_RECORD_DATE_FORMAT, TEMP_LOG_FLUSH_ROWS, TEMP_LOG_FLUSH_INTERVAL
+
+SEGMENT_OUTPUT_PATH = os.path.join(LOCAL_OUTPUT_PATH, "segments")
+SEGMENT_FILENAME = "segment_{0:08d}.bin"
+SEGMENT_GLOB = "segment_*.bin"
+SENSOR_TABLE_FILENAME = "sensors.csv"  # Interned sensor ids: "Id,Room,Sensor"
+SEGMENT_MAX_RECORDS = 1 << 20  # Records per segment file (16 MiB)
+
+# Fixed-width record: epoch seconds (UTC), interned sensor id, temp in deg C
+RECORD_FORMAT = "<dIf"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = [('timestamp', '<f8'), ('sensor', '<u4'), ('temp_c', '<f4')]
+
+ERROR_NUMPY_REQUIRED = "NumPy is required for reading segment files as arrays."
+IMPORT_PROGRESS_MSG = "Imported {0} rows from {1}"
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(ERROR_NUMPY_REQUIRED)
+
+    return numpy
+
+
+def toEpoch(timestamp):
+    '''Converts a naive UTC datetime to epoch seconds.'''
+
+    return calendar.timegm(timestamp.utctimetuple()) + \
+        timestamp.microsecond / 1e6
+
+
+def fromEpoch(secs):
+    '''Converts epoch seconds to a naive UTC datetime (the inverse of
+    toEpoch()).
+    '''
+
+    if _UTC is None:
+        return datetime.utcfromtimestamp(secs)
+
+    return datetime.fromtimestamp(secs, _UTC).replace(tzinfo=None)
+
+
+class SensorTable(object):
+    '''Interns (room, sensor) name pairs as small integer ids, so that each
+    record only has to store a 4-byte id. The table is kept in a small
+    append-only CSV file next to the segments.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = {}  # (room, sensor) -> id
+        self.names = {}  # id -> (room, sensor)
+
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                next(f)  # Skip header
+                for line in f:
+                    sensor_id, room, sensor = line.rstrip("\n").split(",", 2)
+                    self.ids[(room, sensor)] = int(sensor_id)
+                    self.names[int(sensor_id)] = (room, sensor)
+
+    def intern(self, sensor_room, sensor_name):
+        '''Returns the id for a (room, sensor) pair, assigning one if needed.'''
+
+        key = (sensor_room, sensor_name)
+        sensor_id = self.ids.get(key)
+        if sensor_id is None:
+            sensor_id = len(self.ids)
+            is_new_file = not os.path.isfile(self.path)
+            with open(self.path, "a") as f:
+                if is_new_file:
+                    f.write("Id,Room,Sensor\n")
+                f.write("{0},{1},{2}\n".format(sensor_id, sensor_room, sensor_name))
+            self.ids[key] = sensor_id
+            self.names[sensor_id] = key
+
+        return sensor_id
+
+
+class SegmentWriter(object):
+    '''Append-only writer for fixed-width binary temperature records.
+
+    Drop-in alternative to TempLogWriter (same write/flush/close methods).
+    Each record is RECORD_SIZE bytes, so segment files can be memory-mapped
+    and read back as NumPy structured arrays (RECORD_DTYPE) without any
+    parsing. A new segment file is started every SEGMENT_MAX_RECORDS
+    records. Records are in append order, which is time order for live data.
+    '''
+
+    def __init__(self, output_path=SEGMENT_OUTPUT_PATH, \
+        flush_rows=TEMP_LOG_FLUSH_ROWS, flush_interval=TEMP_LOG_FLUSH_INTERVAL, \
+        max_records=SEGMENT_MAX_RECORDS):
+        '''Init method for the segment writer.
+
+        :param str output_path: Directory holding the segment files.
+        :param int flush_rows: Pending records that trigger a flush.
+        :param float flush_interval: Max seconds between flushes.
+        :param int max_records: Records per segment file.
+
+        :return: SegmentWriter object
+        '''
+
+        self.output_path = output_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_records = max_records
+
+        if not os.path.isdir(self.output_path):
+            os.makedirs(self.output_path)
+
+        self.sensors = SensorTable(os.path.join(self.output_path, \
+            SENSOR_TABLE_FILENAME))
+
+        self._lock = threading.RLock()
+        self._pack = struct.Struct(RECORD_FORMAT).pack
+        self._pending = bytearray()
+        self._pending_rows = 0
+        self._last_flush = time.time()
+        self._handle = None
+        self._segment_records = 0
+
+        # Carry on appending to the newest existing segment
+        existing = listSegments(self.output_path)
+        self._segment_number = 0
+        if existing:
+            newest = existing[-1]
+            self._segment_number = _segmentNumber(newest)
+            self._segment_records = os.path.getsize(newest) // RECORD_SIZE
+
+    def write(self, timestamp, sensor_room, sensor_name, temp_c, temp_f=None):
+        '''Buffers one temperature reading (temp_f is derived data and is
+        not stored).
+
+        :return: True
+        '''
+
+        with self._lock:
+            self._pending += self._pack(toEpoch(timestamp), \
+                self.sensors.intern(sensor_room, sensor_name), temp_c)
+            self._pending_rows += 1
+
+            if self._pending_rows >= self.flush_rows or \
+                time.time() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+        return True
+
+    def flush(self):
+        '''Appends all buffered records to the segment files.'''
+
+        with self._lock:
+            offset = 0
+            while offset < len(self._pending):
+                if self._handle is None or \
+                    self._segment_records >= self.max_records:
+                    self._nextSegment()
+
+                room_left = (self.max_records - self._segment_records) * \
+                    RECORD_SIZE
+                chunk = self._pending[offset:offset + room_left]
+                self._handle.write(chunk)
+                self._segment_records += len(chunk) // RECORD_SIZE
+                offset += len(chunk)
+
+            if self._handle is not None:
+                self._handle.flush()
+            self._pending = bytearray()
+            self._pending_rows = 0
+            self._last_flush = time.time()
+
+        return True
+
+    def close(self):
+        '''Flushes buffered records and closes the current segment.'''
+
+        with self._lock:
+            self.flush()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+        return True
+
+    def _nextSegment(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._segment_number += 1
+            self._segment_records = 0
+        elif self._segment_records >= self.max_records:
+            self._segment_number += 1
+            self._segment_records = 0
+
+        self._handle = open(os.path.join(self.output_path, \
+            SEGMENT_FILENAME.format(self._segment_number)), "ab")
+
+
+def _segmentNumber(path):
+    return int(os.path.basename(path)[len("segment_"):-len(".bin")])
+
+
+def listSegments(segment_path=SEGMENT_OUTPUT_PATH):
+    '''Returns paths of all segment files, oldest first.'''
+
+    return sorted(glob.glob(os.path.join(segment_path, SEGMENT_GLOB)), \
+        key=_segmentNumber)
+
+
+def loadSegment(path):
+    '''Memory-maps one segment file as a read-only NumPy structured array with
+    RECORD_DTYPE fields. A partially written trailing record is ignored.
+    '''
+
+    np = _numpy()
+    record_count = os.path.getsize(path) // RECORD_SIZE
+    if record_count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(record_count,))
+
+
+def loadSegments(segment_path=SEGMENT_OUTPUT_PATH):
+    '''Loads every segment in a directory into one structured array.'''
+
+    np = _numpy()
+    arrays = [loadSegment(path) for path in listSegments(segment_path)]
+    if not arrays:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    return np.concatenate(arrays)
+
+
+def iterSegment(path):
+    '''Yields (timestamp, sensor_id, temp_c) tuples from a segment file
+    without needing NumPy.
+    '''
+
+    unpack = struct.Struct(RECORD_FORMAT).unpack_from
+    with open(path, "rb") as f:
+        data = f.read()
+
+    for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        yield unpack(data, offset)
+
+
+def csvSortKey(path):
+    '''Sort key that orders daily CSV files by date (the date format in the
+    filenames doesn't sort chronologically as a string).
+    '''
+
+    filename = os.path.basename(path)
+    date_utc = filename.split("_", 1)[0]
+
+    return datetime.strptime(date_utc, TEMP_RECORD_DATE_FORMAT), filename
+
+
+def parseCsvRow(line):
+    '''Parses one "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF" row.
+
+    :return: Tuple of (datetime, room, sensor, temp_c).
+    '''
+
+    date_utc, time_utc, room, sensor, temp_c = line.split(",")[:5]
+    timestamp = datetime.strptime(date_utc + " " + time_utc, \
+        TEMP_RECORD_DATE_FORMAT + " %H:%M:%S")
+
+    return timestamp, room, sensor, float(temp_c)
+
+
+def importCsvFiles(csv_paths, writer):
+    '''Imports existing *_sensorTemps.csv files into a segment writer.
+
+    :param list csv_paths: Paths of CSV files to import (in the order given).
+    :param SegmentWriter writer: Writer to append the records to.
+
+    :return: Number of rows imported.
+    '''
+
+    imported = 0
+    for csv_path in csv_paths:
+        file_rows = 0
+        with open(csv_path) as f:
+            next(f, None)  # Skip header
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                timestamp, room, sensor, temp_c = parseCsvRow(line)
+                writer.write(timestamp, room, sensor, temp_c)
+                file_rows += 1
+        print(IMPORT_PROGRESS_MSG.format(file_rows, csv_path))
+        imported += file_rows
+
+    writer.flush()
+
+    return imported
+
+
+def main(argv=None):
+    '''Command line converter: imports *_sensorTemps.csv files from a
+    directory into binary segment files.
+    '''
+
+    parser = argparse.ArgumentParser(description="Import sensor temperature " \
+        "CSV files into binary segment files.")
+    parser.add_argument("csv_dir", nargs="?", default=LOCAL_OUTPUT_PATH)
+    parser.add_argument("segment_dir", nargs="?", default=SEGMENT_OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    csv_paths = sorted(glob.glob(os.path.join(args.csv_dir, \
+        "*_sensorTemps.csv")), key=csvSortKey)
+    writer = SegmentWriter(args.segment_dir)
+    try:
+        importCsvFiles(csv_paths, writer)
+    finally:
+        writer.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
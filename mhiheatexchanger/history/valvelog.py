@@ -0,0 +1,37 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Valve moves CSV, as written by sim.replay --output and read by
+# history.analytics for valve duty cycles. Rows are:
+#
+#   Date-UTC,Time-UTC,Room,Sensor,Valve
+#
+# where Valve is VALVE_OPENED or VALVE_CLOSED.
+
+from datetime import datetime
+
+from mhiheatexchanger.sensor.templog import TEMP_RECORD_DATE_FORMAT
+
+VALVE_MOVES_HEADER = "Date-UTC,Time-UTC,Room,Sensor,Valve\n"
+VALVE_MOVE_ROW = "{0},{1},{2},{3},{4}\n"
+VALVE_OPENED = "open"
+VALVE_CLOSED = "close"
+
+
+def formatValveMove(timestamp, sensor_room, sensor_name, move):
+    '''Formats one valve move as a CSV row (with its newline).'''
+
+    return VALVE_MOVE_ROW.format(timestamp.strftime(TEMP_RECORD_DATE_FORMAT), \
+        timestamp.strftime("%H:%M:%S"), sensor_room, sensor_name, move)
+
+
+def parseValveMove(line):
+    '''Parses one "Date-UTC,Time-UTC,Room,Sensor,Valve" row.
+
+    :return: Tuple of (datetime, room, sensor, VALVE_OPENED/VALVE_CLOSED).
+    '''
+
+    date_utc, time_utc, sensor_room, sensor_name, move = line.split(",")
+    timestamp = datetime.strptime(date_utc + " " + time_utc, \
+        TEMP_RECORD_DATE_FORMAT + " %H:%M:%S")
+
+    return timestamp, sensor_room, sensor_name, move
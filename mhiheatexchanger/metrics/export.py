@@ -0,0 +1,173 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Exports the metrics registry, either as a JSON snapshot file rewritten
+# every METRICS_SNAPSHOT_INTERVAL seconds, or over a local HTTP endpoint:
+#
+#   curl http://127.0.0.1:9107/metrics
+
+import json, os, socket, threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from mhiheatexchanger.metrics.registry import getMetrics
+
+METRICS_SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), "mhiMetrics.json")
+METRICS_SNAPSHOT_INTERVAL = 60  # Seconds between snapshot file writes
+METRICS_HOST = "127.0.0.1"  # Local only
+METRICS_PORT = 9107
+METRICS_URL_PATH = "/metrics"
+
+ERROR_SNAPSHOT_FAILED = "ERROR: Could not write metrics snapshot: {0!r}"
+ERROR_SERVER_FAILED = "ERROR: Could not serve metrics on port {0}: {1!r}"
+METRICS_SERVING_MSG = "Serving metrics on http://{0}:{1}{2}"
+
+
+def writeSnapshot(path=METRICS_SNAPSHOT_PATH, registry=None):
+    '''Writes a snapshot of the metrics to a JSON file. The file is replaced
+    in one go, so readers never see a partial snapshot.
+    '''
+
+    registry = registry or getMetrics()
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as snapshot_file:
+        json.dump(registry.snapshot(), snapshot_file, sort_keys=True)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)  # rename() won't replace a file on Windows
+    os.rename(temp_path, path)
+
+    return True
+
+
+class SnapshotWriter(object):
+    '''Writes a metrics snapshot file every interval seconds, from a
+    background thread (and once more when stopped).
+    '''
+
+    def __init__(self, path=METRICS_SNAPSHOT_PATH, \
+        interval=METRICS_SNAPSHOT_INTERVAL, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or getMetrics()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, \
+            name="mhi-metrics-snapshot")
+        self._thread.daemon = True
+        self._thread.start()
+
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._write()
+
+        return True
+
+    def _write(self):
+        try:
+            writeSnapshot(self.path, self.registry)
+        except (IOError, OSError) as e:
+            print(ERROR_SNAPSHOT_FAILED.format(e))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._write()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != METRICS_URL_PATH:
+            self.send_error(404)
+            return
+
+        body = json.dumps(self.server.registry.snapshot(), sort_keys=True)
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Pulls would flood the console
+
+
+class MetricsServer(object):
+    '''Serves metrics snapshots as JSON at METRICS_URL_PATH, over HTTP, from
+    a background thread. Binds to the local interface by default.
+    '''
+
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT, registry=None):
+        '''Init method for the server. Nothing is served until start().
+
+        :param str host: Interface to listen on.
+        :param int port: Port to listen on (0 picks a free port).
+        :param MetricsRegistry registry: Optional registry to serve
+            (defaults to the one shared by the process).
+
+        :return: MetricsServer object
+        '''
+
+        self.host = host
+        self.port = port
+        self.registry = registry or getMetrics()
+        self.address = None  # (host, port) actually bound, once started
+        self._server = None
+
+    def start(self):
+        '''Starts serving. Raises socket.error if the port can't be bound.
+
+        :return: The (host, port) bound.
+        '''
+
+        self._server = HTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.registry = self.registry
+        self.address = self._server.server_address
+        thread = threading.Thread(target=self._server.serve_forever, \
+            name="mhi-metrics-server")
+        thread.daemon = True
+        thread.start()
+
+        return self.address
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+        return True
+
+
+def startExport(snapshot_path=METRICS_SNAPSHOT_PATH, port=METRICS_PORT):
+    '''Starts the snapshot file writer and the local HTTP endpoint (either
+    can be skipped by passing None). A port that can't be bound is reported
+    and skipped.
+
+    :return: List of the started exporters (to stop() on shutdown).
+    '''
+
+    exporters = []
+    if snapshot_path is not None:
+        exporters.append(SnapshotWriter(snapshot_path))
+        exporters[-1].start()
+
+    if port is not None:
+        server = MetricsServer(port=port)
+        try:
+            host, port = server.start()
+            print(METRICS_SERVING_MSG.format(host, port, METRICS_URL_PATH))
+            exporters.append(server)
+        except (socket.error, OSError) as e:
+            print(ERROR_SERVER_FAILED.format(port, e))
+
+    return exporters
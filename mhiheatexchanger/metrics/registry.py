@@ -0,0 +1,227 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import bisect, os, threading, time
+
+# Metrics are on unless MHI_METRICS is set to "0"
+METRICS_ENABLED = os.environ.get("MHI_METRICS", "1") != "0"
+
+# Upper bounds (s) of the latency histogram buckets; one more bucket
+# catches everything slower
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, \
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class Counter(object):
+    '''Count of events (e.g. polls, alerts, valve moves).'''
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, count=1):
+        with self._lock:
+            self.value += count
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(object):
+    '''Latest value of something (e.g. alert queue depth).'''
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram(object):
+    '''Latency histogram with fixed buckets. Recording a value is a bisect
+    and two additions under a lock (the count is the sum of the buckets),
+    so it's cheap enough to leave on in the hot path.
+    '''
+
+    __slots__ = ('bounds', 'counts', 'total', '_lock')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        '''Records one value (in seconds).'''
+
+        bucket = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.total += seconds
+
+    def since(self, start):
+        '''Records the time since start (a _now() timestamp).'''
+
+        self.observe(_now() - start)
+
+    def snapshot(self):
+        '''Returns a dict with the count, sum and the cumulative count per
+        bucket upper bound ('+Inf' for the last one).
+        '''
+
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+
+        buckets = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + ('+Inf',), counts):
+            cumulative += bucket_count
+            buckets.append([bound, cumulative])
+
+        return {
+            'count': cumulative,
+            'sum': total,
+            'buckets': buckets
+        }
+
+
+class _NullMetric(object):
+    '''Stands in for every metric type when metrics are disabled.'''
+
+    __slots__ = ()
+
+    def inc(self, count=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, seconds):
+        pass
+
+    def since(self, start):
+        pass
+
+    def snapshot(self):
+        return None
+
+
+_NULL_METRIC = _NullMetric()
+
+
+class MetricsRegistry(object):
+    '''Named counters, gauges and histograms. Metrics are created on first
+    use, and are meant to be looked up once (e.g. at import time) and kept,
+    so the hot path only pays for updating them.
+
+    Metrics recorded in other processes (e.g. shard workers) can be handed
+    in with mergeRemote(), and are added into every snapshot.
+    '''
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        '''Init method for the registry.
+
+        :param bool enabled: Whether to record anything (if not, every
+            metric is a no-op).
+
+        :return: MetricsRegistry object
+        '''
+
+        self.enabled = enabled
+        self.started = time.time()
+        self._metrics = {}  # name -> metric
+        self._remote = {}  # source -> metrics from that process's latest snapshot
+        self._lock = threading.Lock()
+
+    def counter(self, name):
+        return self._metric(name, Counter)
+
+    def gauge(self, name):
+        return self._metric(name, Gauge)
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS):
+        return self._metric(name, lambda: Histogram(bounds))
+
+    def mergeRemote(self, source, snapshot):
+        '''Keeps the latest snapshot() of another process's registry, to be
+        added into this registry's snapshots. Counters, gauges and histograms
+        (which have to use the same buckets) are summed across processes.
+
+        :param source: Hashable key for the other process (e.g. its shard).
+        :param dict snapshot: The other registry's snapshot().
+        '''
+
+        with self._lock:
+            self._remote[source] = snapshot['metrics']
+
+    def snapshot(self):
+        '''Returns a dict of every metric's current value, plus 'timestamp'
+        and 'started' (UNIX time).
+        '''
+
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+            remote = list(self._remote.values())
+
+        values = dict((name, metric.snapshot()) for name, metric in metrics)
+        for remote_values in remote:
+            for name, value in remote_values.items():
+                values[name] = _mergeValues(values.get(name), value)
+
+        return {
+            'timestamp': time.time(),
+            'started': self.started,
+            'metrics': values
+        }
+
+    def _metric(self, name, factory):
+        if not self.enabled:
+            return _NULL_METRIC
+
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+
+        return metric
+
+
+def _mergeValues(value, other):
+    if value is None:
+        return other
+    if other is None:
+        return value
+    if not isinstance(value, dict):
+        return value + other
+
+    return {  # Histogram snapshots
+        'count': value['count'] + other['count'],
+        'sum': value['sum'] + other['sum'],
+        'buckets': [[bound, count + other_count] for (bound, count), \
+            (other_bound, other_count) in zip(value['buckets'], other['buckets'])]
+    }
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def getMetrics():
+    '''Returns the metrics registry shared by everything in this process.'''
+
+    global _default_registry
+
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry()
+
+    return _default_registry
@@ -0,0 +1,166 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import bisect
+from collections import deque
+
+TEMP_OVERSAMPLE = 4  # ADC reads averaged into each temp reading
+# Streaming filters applied to the (oversampled) readings, in order. Each is
+# (name, param): ('average', window), ('median', window) or ('ewma', alpha)
+TEMP_FILTERS = [('median', 3), ('ewma', 0.5)]
+TEMP_HYSTERESIS = 0.5  # Deg C a temp must come back past a threshold to clear it
+TEMP_RESOLUTION = 0.1  # Deg C; finest step an oversampled reading resolves (logged to this)
+
+ERROR_UNKNOWN_FILTER = "Unknown temp filter: {0!r} (expected one of {1})"
+
+
+class MovingAverageFilter(object):
+    '''Mean of the last window readings.'''
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._values = deque(maxlen=self.window)
+        self._total = 0.0
+
+    def update(self, value):
+        if len(self._values) == self.window:
+            self._total -= self._values[0]
+        self._values.append(value)
+        self._total += value
+
+        return self._total / len(self._values)
+
+
+class MedianFilter(object):
+    '''Median of the last window readings (drops single-sample spikes).'''
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._values = deque(maxlen=self.window)
+        self._sorted = []
+
+    def update(self, value):
+        if len(self._values) == self.window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._values[0])]
+        self._values.append(value)
+        bisect.insort(self._sorted, value)
+
+        middle = len(self._sorted) // 2
+        if len(self._sorted) % 2:
+            return self._sorted[middle]
+
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2.0
+
+
+class EwmaFilter(object):
+    '''Exponentially weighted moving average (alpha is the weight of the
+    newest reading).
+    '''
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def update(self, value):
+        if self._value is None:
+            self._value = float(value)
+        else:
+            self._value += self.alpha * (value - self._value)
+
+        return self._value
+
+
+TEMP_FILTER_TYPES = {
+    'average': MovingAverageFilter,
+    'median': MedianFilter,
+    'ewma': EwmaFilter,
+}
+
+
+def makeFilters(filter_specs):
+    '''Builds a filter chain from a list of (name, param) pairs.'''
+
+    filters = []
+    for name, param in filter_specs:
+        if name not in TEMP_FILTER_TYPES:
+            raise ValueError(ERROR_UNKNOWN_FILTER.format(name, \
+                ", ".join(sorted(TEMP_FILTER_TYPES))))
+        filters.append(TEMP_FILTER_TYPES[name](param))
+
+    return filters
+
+
+class TempAcquisition(object):
+    '''Turns raw temp sensor reads into a filtered reading: each reading is
+    the mean of several back-to-back ADC reads, run through a chain of
+    streaming filters. Every filter keeps a fixed amount of state, so memory
+    per sensor is constant.
+    '''
+
+    def __init__(self, oversample=TEMP_OVERSAMPLE, filter_specs=None, \
+        resolution=TEMP_RESOLUTION):
+        '''Init method for the acquisition stage.
+
+        :param int oversample: ADC reads averaged into each reading.
+        :param list filter_specs: Optional (name, param) filter chain to use
+            instead of TEMP_FILTERS.
+        :param float resolution: Deg C step readings are rounded to by
+            quantize().
+
+        :return: TempAcquisition object
+        '''
+
+        self.oversample = max(1, oversample)
+        self.resolution = resolution
+        self.filters = makeFilters(TEMP_FILTERS if filter_specs is None \
+            else filter_specs)
+        self.latest_raw_c = None  # Latest oversampled reading, before filtering
+
+    def read(self, temp):
+        '''Takes a filtered reading.
+
+        :param temp: GroveTemp object to read from.
+
+        :return: Filtered temp (deg C).
+        '''
+
+        total = 0.0
+        for i in range(self.oversample):
+            total += temp.value()
+        value = self.latest_raw_c = total / self.oversample
+
+        for temp_filter in self.filters:
+            value = temp_filter.update(value)
+
+        return value
+
+    def quantize(self, temp):
+        '''Rounds a temp to the sensor's resolution. Filtered readings carry
+        more digits than the sensor can actually resolve.
+
+        :param float temp: Temp to round (None is passed through).
+
+        :return: Rounded temp.
+        '''
+
+        if temp is None:
+            return None
+
+        # The second round() drops float noise from the multiply
+        return round(round(temp / self.resolution) * self.resolution, 6)
+
+    def reset(self):
+        '''Forgets filter history (e.g. after the sensor was moved).'''
+
+        for temp_filter in self.filters:
+            temp_filter.reset()
+
+        return True
@@ -0,0 +1,153 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading, time
+
+LCD_ROWS = 2
+LCD_COLUMNS = 16
+DISPLAY_REFRESH_INTERVAL = 1.0  # Min seconds between LCD refreshes
+DISPLAY_MERGE_GAP = 1  # Unchanged chars written over to join two changed runs
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class LcdDisplay(object):
+    '''Shadow framebuffer for a Jhd1313m1 16x2 RGB backlit LCD.
+
+    Text and color changes are made to the framebuffer, and refresh() sends
+    only what differs from what's already on the screen: a setColor() if the
+    backlight color changed, and one setCursor() + write() per run of
+    changed characters. Every one of those is an I2C transaction (every
+    character, for write()), so repainting the same reading costs nothing.
+
+    Refreshes are rate-limited to one per refresh_interval seconds; changes
+    made in between are sent with the next refresh.
+    '''
+
+    def __init__(self, lcd, refresh_interval=DISPLAY_REFRESH_INTERVAL):
+        '''Init method for the display.
+
+        :param lcd: Jhd1313m1 LCD object.
+        :param float refresh_interval: Min seconds between refreshes.
+
+        :return: LcdDisplay object
+        '''
+
+        self.lcd = lcd
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._screen = [" " * LCD_COLUMNS] * LCD_ROWS  # What the LCD shows
+        self._frame = list(self._screen)  # What it should show
+        self._screen_color = None  # Unknown until it's first set
+        self._frame_color = None
+        self._last_refresh = None
+        self.transactions = 0  # I2C transactions sent (approximate)
+
+    def start(self, label, color):
+        '''Clears the screen and turns it on, then shows label on the top
+        line, with the given backlight color.
+        '''
+
+        with self._lock:
+            self.lcd.clear()
+            self.lcd.displayOn()
+            self.lcd.backlightOn()
+            self.transactions += 3
+            self._resetShadow()
+            self._setLine(0, label)
+            self._frame_color = tuple(color)
+            self._refresh()
+
+        return True
+
+    def stop(self):
+        '''Clears the screen and puts it into low-power mode.'''
+
+        with self._lock:
+            self.lcd.clear()
+            self.lcd.displayOff()
+            self.lcd.backlightOff()
+            self.transactions += 3
+            self._resetShadow()
+
+        return True
+
+    def setLine(self, row, text):
+        '''Sets the text of one line (padded or cut to the screen width).'''
+
+        with self._lock:
+            self._setLine(row, text)
+
+        return True
+
+    def setColor(self, r, g, b):
+        '''Sets the backlight color.'''
+
+        with self._lock:
+            self._frame_color = (r, g, b)
+
+        return True
+
+    def refresh(self, force=False):
+        '''Sends pending changes to the LCD, unless the last refresh was less
+        than refresh_interval seconds ago (and force isn't set).
+
+        :return: True if the LCD was refreshed, False if it was rate-limited.
+        '''
+
+        with self._lock:
+            if not force and self._last_refresh is not None and \
+                _now() - self._last_refresh < self.refresh_interval:
+                return False
+
+            self._refresh()
+
+        return True
+
+    def _resetShadow(self):
+        # The LCD has just been cleared, and its backlight color is unknown
+        self._screen = [" " * LCD_COLUMNS] * LCD_ROWS
+        self._frame = list(self._screen)
+        self._screen_color = None
+        self._frame_color = None
+        self._last_refresh = None
+
+    def _setLine(self, row, text):
+        self._frame[row] = text[:LCD_COLUMNS].ljust(LCD_COLUMNS)
+
+    def _refresh(self):
+        self._last_refresh = _now()
+
+        if self._frame_color is not None and \
+            self._frame_color != self._screen_color:
+            self.lcd.setColor(*self._frame_color)
+            self.transactions += 1
+            self._screen_color = self._frame_color
+
+        for row in range(LCD_ROWS):
+            frame, screen = self._frame[row], self._screen[row]
+            if frame == screen:
+                continue
+
+            for start, end in _changedRuns(frame, screen):
+                self.lcd.setCursor(row, start)
+                self.lcd.write(frame[start:end])
+                self.transactions += 1 + end - start
+            self._screen[row] = frame
+
+
+def _changedRuns(new, old):
+    '''Returns (start, end) column spans where new differs from old. Runs
+    separated by DISPLAY_MERGE_GAP or fewer unchanged chars are joined, as
+    rewriting those is no more expensive than moving the cursor.
+    '''
+
+    runs = []
+    for column in range(len(new)):
+        if new[column] == old[column]:
+            continue
+        if runs and column - runs[-1][1] <= DISPLAY_MERGE_GAP:
+            runs[-1][1] = column + 1
+        else:
+            runs.append([column, column + 1])
+
+    return runs
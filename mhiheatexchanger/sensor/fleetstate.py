@@ -0,0 +1,229 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import array, multiprocessing, threading
+
+FLEET_STATE_CAPACITY = 64  # Initial number of sensor slots (grows as needed)
+FREE_SLOT_ID = -1  # sensor_id column value for an unused slot
+
+ERROR_FLEET_STATE_FULL = "Fleet state is full ({0} slots) and can't grow in shared memory."
+ERROR_NUMPY_REQUIRED = "NumPy is required for fleet state queries."
+
+# Column name -> array typecode
+FLEET_STATE_COLUMNS = (
+    ('sensor_id', 'i'),
+    ('temp_c', 'd'),  # NaN until the first reading
+    ('valve_open', 'b'),
+    ('passed_threshold', 'b'),
+)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(ERROR_NUMPY_REQUIRED)
+
+    return numpy
+
+
+class FleetState(object):
+    '''State of every sensor in the fleet, kept column-wise in parallel
+    arrays (one slot per sensor) rather than in per-Sensor attributes.
+
+    Sensors read and write their own slot through FleetStateView properties;
+    fleet-wide questions ("all sensors above 24 C", "all open valves") are
+    answered with NumPy over the whole columns. Slots are reused once a
+    sensor is removed.
+
+    With shared=True the columns live in shared memory, so the state can be
+    read and written by sensors in other processes (see ShardedFleet); the
+    capacity is then fixed.
+    '''
+
+    def __init__(self, capacity=FLEET_STATE_CAPACITY, shared=False):
+        '''Init method for the fleet state.
+
+        :param int capacity: Initial number of slots (fixed if shared).
+        :param bool shared: Whether to keep the columns in shared memory.
+
+        :return: FleetState object
+        '''
+
+        self.shared = shared
+        self.capacity = 0
+        self.slots = {}  # sensor_id -> slot
+        self._free = []  # Unused slots
+        self._lock = threading.Lock()
+        for name, typecode in FLEET_STATE_COLUMNS:
+            if shared:
+                setattr(self, name, multiprocessing.RawArray(typecode, capacity))
+            else:
+                setattr(self, name, array.array(typecode))
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getstate__(self):
+        # Locks can't be pickled (e.g. when handed to a spawned worker process)
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def addSensor(self, sensor_id):
+        '''Returns the slot for a sensor, allocating one if it has none yet.'''
+
+        with self._lock:
+            slot = self.slots.get(sensor_id)
+            if slot is not None:
+                return slot
+
+            if not self._free:
+                if self.shared:
+                    raise MemoryError(ERROR_FLEET_STATE_FULL.format(self.capacity))
+                self._grow(max(FLEET_STATE_CAPACITY, self.capacity))
+
+            slot = self._free.pop()
+            self.sensor_id[slot] = sensor_id
+            self.slots[sensor_id] = slot
+
+        return slot
+
+    def removeSensor(self, sensor_id):
+        '''Frees a sensor's slot.
+
+        :return: True if the sensor had a slot.
+        '''
+
+        with self._lock:
+            slot = self.slots.pop(sensor_id, None)
+            if slot is None:
+                return False
+            self._clearSlot(slot)
+            self._free.append(slot)
+
+        return True
+
+    def slot(self, sensor_id):
+        '''Returns a sensor's slot, or None.'''
+
+        return self.slots.get(sensor_id)
+
+    def snapshot(self):
+        '''Returns (sensor_ids, temps, valve_open) NumPy arrays with one entry
+        per sensor, in slot order (temps are NaN for unpolled sensors).
+        '''
+
+        np = _numpy()
+        sensor_ids = self._column(np, 'sensor_id')
+        live = sensor_ids != FREE_SLOT_ID
+
+        return sensor_ids[live], self._column(np, 'temp_c')[live], \
+            self._column(np, 'valve_open')[live].astype(bool)
+
+    def sensorsAbove(self, temp_c):
+        '''Returns IDs of sensors whose latest temp is >= temp_c.'''
+
+        sensor_ids, temps, valve_open = self.snapshot()
+
+        return sensor_ids[temps >= temp_c].tolist()
+
+    def sensorsBelow(self, temp_c):
+        '''Returns IDs of sensors whose latest temp is < temp_c.'''
+
+        sensor_ids, temps, valve_open = self.snapshot()
+
+        return sensor_ids[temps < temp_c].tolist()
+
+    def openValves(self):
+        '''Returns IDs of sensors whose valve is open.'''
+
+        sensor_ids, temps, valve_open = self.snapshot()
+
+        return sensor_ids[valve_open].tolist()
+
+    def _column(self, np, name):
+        # Copied, so no buffer stays exported (array.array can't grow while
+        # one is)
+        with self._lock:
+            typecode = dict(FLEET_STATE_COLUMNS)[name]
+            return np.array(np.frombuffer(getattr(self, name), \
+                dtype=np.dtype(typecode))[:self.capacity])
+
+    def _grow(self, count):
+        start = self.capacity
+        if not self.shared:
+            for name, typecode in FLEET_STATE_COLUMNS:
+                getattr(self, name).extend([0] * count)
+        self.capacity += count
+        for slot in range(start, self.capacity):
+            self._clearSlot(slot)
+        self._free.extend(reversed(range(start, self.capacity)))
+
+    def _clearSlot(self, slot):
+        self.sensor_id[slot] = FREE_SLOT_ID
+        self.temp_c[slot] = float('nan')
+        self.valve_open[slot] = 0
+        self.passed_threshold[slot] = 0
+
+
+class FleetStateView(object):
+    '''Base for objects (sensors, and their stand-ins in the central module)
+    whose latest temp, valve state and threshold flag live in a FleetState
+    slot. Subclasses set self.fleet_state and self.slot.
+    '''
+
+    __slots__ = ('fleet_state', 'slot')
+
+    @property
+    def latest_temp_c(self):
+        temp_c = self.fleet_state.temp_c[self.slot]
+        return None if temp_c != temp_c else temp_c  # NaN until first reading
+
+    @latest_temp_c.setter
+    def latest_temp_c(self, temp_c):
+        self.fleet_state.temp_c[self.slot] = float('nan') if temp_c is None \
+            else temp_c
+
+    @property
+    def latest_temp_f(self):
+        temp_c = self.latest_temp_c
+        return None if temp_c is None else temp_c * 9.0/5.0 + 32.0
+
+    @property
+    def valve_open(self):
+        return bool(self.fleet_state.valve_open[self.slot])
+
+    @valve_open.setter
+    def valve_open(self, valve_open):
+        self.fleet_state.valve_open[self.slot] = 1 if valve_open else 0
+
+    @property
+    def has_passed_threshold(self):
+        return bool(self.fleet_state.passed_threshold[self.slot])
+
+    @has_passed_threshold.setter
+    def has_passed_threshold(self, passed):
+        self.fleet_state.passed_threshold[self.slot] = 1 if passed else 0
+
+
+_default_fleet_state = None
+_default_fleet_state_lock = threading.Lock()
+
+
+def getFleetState():
+    '''Returns the fleet state shared by all sensors in this process that
+    weren't given one.
+    '''
+
+    global _default_fleet_state
+
+    with _default_fleet_state_lock:
+        if _default_fleet_state is None:
+            _default_fleet_state = FleetState()
+
+    return _default_fleet_state
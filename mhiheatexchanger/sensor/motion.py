@@ -0,0 +1,230 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading
+from collections import deque
+
+DEFAULT_MOTION_WORKERS = 4  # Max stepper motors moving at the same time
+
+ERROR_MOTION_FAILED = "ERROR: Valve move for motor {0} failed: {1!r}"
+ERROR_CALLBACK_FAILED = "ERROR: Valve move callback failed: {0!r}"
+
+
+class MotionFuture(object):
+    '''Handle for a queued valve move. Resolves to True once the move has run
+    (or was cancelled out by an opposite move, leaving the valve where it
+    started), or raises the exception the stepper driver raised.
+    '''
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._result = None
+        self._exception = None
+        self._cancelled = False
+
+    def done(self):
+        return self._event.is_set()
+
+    def cancelled(self):
+        return self._cancelled
+
+    def result(self, timeout=None):
+        '''Blocks until the move finishes, then returns its result.'''
+
+        if not self._event.wait(timeout):
+            raise RuntimeError("Timed out waiting for valve move.")
+        if self._exception is not None:
+            raise self._exception
+
+        return self._result
+
+    def addDoneCallback(self, callback):
+        '''Calls callback(future) once the move finishes (right away if it
+        already has).
+        '''
+
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return True
+
+        self._runCallback(callback)
+
+        return True
+
+    def _finish(self, result=None, exception=None, cancelled=False):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._cancelled = cancelled
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            self._runCallback(callback)
+
+    def _runCallback(self, callback):
+        try:
+            callback(self)
+        except Exception as e:
+            print(ERROR_CALLBACK_FAILED.format(e))
+
+
+class _Move(object):
+    __slots__ = ('stepper', 'direction', 'steps', 'future')
+
+    def __init__(self, stepper, direction, steps, future):
+        self.stepper = stepper
+        self.direction = direction
+        self.steps = steps
+        self.future = future
+
+
+class MotionExecutor(object):
+    '''Runs valve moves off the polling path.
+
+    Moves are queued per motor and run in order, one at a time per motor,
+    on a small pool of worker threads (so different valves move in
+    parallel). A move that is queued right behind a not-yet-started move in
+    the opposite direction cancels it out: neither runs, and both futures
+    resolve immediately.
+
+    With worker_count=0, moves run synchronously inside submit() instead
+    (useful when driving sensors in simulated time).
+    '''
+
+    def __init__(self, worker_count=DEFAULT_MOTION_WORKERS):
+        '''Init method for the motion executor.
+
+        :param int worker_count: Number of motors that can move at once (0 to
+            run moves synchronously in the caller's thread).
+
+        :return: MotionExecutor object
+        '''
+
+        self.worker_count = worker_count
+        self._cond = threading.Condition()
+        self._pending = {}  # Motor key -> deque of queued _Move objects
+        self._ready = deque()  # Motor keys with queued moves and no worker
+        self._busy = set()  # Motor keys queued in _ready or being moved
+        self._threads = []
+        self._running = True
+
+        for i in range(self.worker_count):
+            thread = threading.Thread(target=self._runWorker, \
+                name="mhi-motion-worker-{0}".format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, motor_key, stepper, direction, steps):
+        '''Queues a valve move.
+
+        :param motor_key: Hashable key identifying the motor (e.g. sensor_id).
+        :param stepper: ULN200XA stepper motor object.
+        :param int direction: ULN200XA_DIR_CW or ULN200XA_DIR_CCW.
+        :param int steps: Number of steps to move.
+
+        :return: MotionFuture for the move.
+        '''
+
+        future = MotionFuture()
+
+        if self.worker_count == 0:
+            self._runMove(motor_key, _Move(stepper, direction, steps, future))
+            return future
+
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Motion executor has been shut down.")
+
+            queued = self._pending.setdefault(motor_key, deque())
+            if queued and queued[-1].direction != direction and \
+                queued[-1].steps == steps:
+                cancelled = queued.pop()  # Opposite moves cancel out
+            else:
+                cancelled = None
+                queued.append(_Move(stepper, direction, steps, future))
+                if motor_key not in self._busy:
+                    self._busy.add(motor_key)
+                    self._ready.append(motor_key)
+                    self._cond.notify()
+
+        if cancelled is not None:
+            cancelled.future._finish(result=True, cancelled=True)
+            future._finish(result=True, cancelled=True)
+
+        return future
+
+    def pendingMoves(self, motor_key):
+        '''Returns number of queued (not yet started) moves for a motor.'''
+
+        with self._cond:
+            return len(self._pending.get(motor_key, ()))
+
+    def shutdown(self, wait=True):
+        '''Stops accepting moves. Queued moves still run to completion.'''
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+        return True
+
+    def _runWorker(self):
+        while True:
+            with self._cond:
+                while not self._ready and self._running:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                motor_key = self._ready.popleft()
+                queued = self._pending[motor_key]
+                if not queued:  # Everything queued was cancelled out
+                    del self._pending[motor_key]
+                    self._busy.discard(motor_key)
+                    continue
+                move = queued.popleft()
+
+            self._runMove(motor_key, move)
+
+            with self._cond:
+                if self._pending[motor_key]:
+                    self._ready.append(motor_key)
+                    self._cond.notify()
+                else:
+                    del self._pending[motor_key]
+                    self._busy.discard(motor_key)
+
+    def _runMove(self, motor_key, move):
+        try:
+            move.stepper.setDirection(move.direction)
+            move.stepper.stepperSteps(move.steps)
+        except Exception as e:
+            print(ERROR_MOTION_FAILED.format(motor_key, e))
+            move.future._finish(exception=e)
+        else:
+            move.future._finish(result=True)
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def getMotionExecutor():
+    '''Returns the motion executor shared by all sensors in this process.'''
+
+    global _default_executor
+
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = MotionExecutor()
+
+    return _default_executor
@@ -0,0 +1,83 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+from collections import deque
+
+PREDICT_WINDOW = 5  # Recent readings the temp trend is fitted over
+
+
+class TrendPredictor(object):
+    '''Fits a straight line (least squares) through a sensor's last few
+    readings, to project when the temp will cross a threshold. Only the
+    last window readings are kept, so memory per sensor is constant.
+    '''
+
+    def __init__(self, window=PREDICT_WINDOW):
+        '''Init method for the predictor.
+
+        :param int window: Number of recent readings to fit over (min 2).
+
+        :return: TrendPredictor object
+        '''
+
+        self.window = max(2, window)
+        self._readings = deque(maxlen=self.window)
+
+    def reset(self):
+        '''Forgets all readings.'''
+
+        self._readings.clear()
+
+        return True
+
+    def update(self, timestamp, temp_c):
+        '''Adds a reading.
+
+        :param float timestamp: Time of the reading (seconds).
+        :param float temp_c: Temp reading (deg C).
+        '''
+
+        self._readings.append((timestamp, temp_c))
+
+        return True
+
+    def trend(self):
+        '''Returns (fitted temp at the latest reading, slope in deg C/s), or
+        None until there are two readings at different times.
+        '''
+
+        count = len(self._readings)
+        if count < 2:
+            return None
+
+        # Times relative to the latest reading, so the fit stays well
+        # conditioned however long the sensor has been running
+        latest_t = self._readings[-1][0]
+        mean_t = sum(t - latest_t for t, v in self._readings) / float(count)
+        mean_v = sum(v for t, v in self._readings) / float(count)
+        variance = sum((t - latest_t - mean_t) ** 2 for t, v in self._readings)
+        if variance <= 0:
+            return None
+
+        slope = sum((t - latest_t - mean_t) * (v - mean_v) \
+            for t, v in self._readings) / variance
+
+        return mean_v - slope * mean_t, slope
+
+    def crossingTime(self, threshold):
+        '''Returns seconds after the latest reading until the trend line
+        reaches threshold, or None if it's not heading that way.
+        '''
+
+        trend = self.trend()
+        if trend is None:
+            return None
+
+        temp_c, slope = trend
+        if slope == 0:
+            return None
+
+        seconds = (threshold - temp_c) / slope
+        if seconds < 0:
+            return None
+
+        return seconds
@@ -28,25 +28,36 @@ from __future__ import print_function
     # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
     # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import atexit, os, sys, signal, time
+import atexit, os, sys, signal, threading, time
 sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
 from datetime import datetime
 
-from upm import pyupm_grove as grove
-from upm import pyupm_jhd1313m1 as lcd
-from upm import pyupm_uln200xa as upmULN200XA
+from mhiheatexchanger.drivers.hal import getBackend
+from mhiheatexchanger.metrics.registry import getMetrics
+from mhiheatexchanger.sensor.acquisition import TempAcquisition, TEMP_HYSTERESIS
+from mhiheatexchanger.sensor.display import LcdDisplay
+from mhiheatexchanger.sensor.fleetstate import FleetStateView, getFleetState
+from mhiheatexchanger.sensor.motion import getMotionExecutor
+from mhiheatexchanger.sensor.predictor import TrendPredictor
+from mhiheatexchanger.sensor.templog import getTempLogWriter, \
+    LOCAL_OUTPUT_PATH, LOCAL_OUTPUT_FILENAME, TEMP_RECORD_FILE_HEADER
+from mhiheatexchanger.sensor.thresholds import UTHRESHOLD, LTHRESHOLD, \
+    POLL_INTERVAL, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL
 
-UTHRESHOLD = 24  # Deg C
-LTHRESHOLD = 20  # Deg C
 TEMP_LABEL_STRING = "Current temp:"
 TEMP_STRING = "{0} C / {1} F"
 
 STEPPER_SPEED = 8  # RPMs
 STEPPER_STEPS = 4096
+VALVE_ACTUATION_TIME = 60.0 / STEPPER_SPEED  # Seconds per valve move (STEPPER_STEPS is one revolution)
 
-POLL_INTERVAL = 10  # Seconds
+ADAPTIVE_POLLING = True  # Vary poll interval with temp trend (POLL_INTERVAL otherwise)
+POLL_READS_PER_MARGIN = 4  # Min polls before temp could reach a threshold at current rate
+POLL_CALM_MARGIN = 2.0  # Deg C from nearest threshold where polls start speeding up
+POLL_INTERVAL_GROWTH = 2.0  # Max factor adaptive interval grows by per poll
 TEST_RUN_LENGTH = 120  # Seconds; if running code for finite time for testing
 DEBUG = False  # For running sensor in test mode (i.e. for finite period of time)
+PREDICTIVE_ALERTS = True  # Alert early when the temp trend will pass a threshold before a valve could open
 
 CENTRAL_CMD_MESSAGE_COLD = "lower_threshold_passed"
 CENTRAL_CMD_MESSAGE_HOT = "upper_threshold_passed"
@@ -54,21 +65,50 @@ CENTRAL_CMD_MESSAGE_HAPPY = "no_longer_past_threshold"
 
 ERROR_VALVE_OPEN = "ERROR: Valve already open."
 ERROR_VALVE_CLOSED = "ERROR: Valve already closed."
-HAPPY_SENSOR_MSG = "Sensor {0} temp is now normalized. Closing valve..."
-
-LOCAL_OUTPUT_PATH = os.path.join(os.path.expanduser("~"),"sensorTemps")
-LOCAL_OUTPUT_FILENAME = "{0}_{1}_{2}_sensorTemps.csv"
-TEMP_RECORD_FILE_HEADER = "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF\n"
-
-
-class Sensor(object):
+HAPPY_SENSOR_MSG = "Sensor {0} temp is now normalized. Releasing helpers..."
+PREDICTED_ALERT_MSG = "Sensor {0} predicted to pass threshold in {1:.1f} s."
+
+_now = getattr(time, 'monotonic', time.time)
+
+# Hot path metrics (see mhiheatexchanger.metrics)
+_metrics = getMetrics()
+_POLL_TIME = _metrics.histogram('sensor.poll_seconds')  # Whole runTempCheck() (count is polls)
+_READ_TIME = _metrics.histogram('sensor.read_seconds')  # Oversampled temp read
+_LCD_TIME = _metrics.histogram('sensor.lcd_seconds')  # LCD refresh (I2C writes)
+_RECORD_TIME = _metrics.histogram('sensor.record_seconds')  # recordTemp()
+_ALERTS = _metrics.counter('sensor.alerts')
+_ALERT_TIME = _metrics.histogram('sensor.alert_seconds')  # Handing an alert to MissionControl
+_VALVE_OPENS = _metrics.counter('valve.opens')
+_VALVE_CLOSES = _metrics.counter('valve.closes')
+_VALVE_SUBMIT_TIME = _metrics.histogram('valve.submit_seconds')  # Queueing a move
+_VALVE_MOVE_TIME = _metrics.histogram('valve.move_seconds')  # Queued until done
+
+# Sensors whose exitHandler() runs at exit. The atexit and SIGINT handlers
+# are installed once per process (see registerExitHandlers())
+_exit_sensors = []
+_exit_lock = threading.Lock()
+_atexit_registered = False
+_sigint_installed = False
+_previous_sigint = None  # Handler to put back once no sensor needs ours
+
+
+class Sensor(FleetStateView):
     '''Sensor module object. Exposes attributes/properties for accessing the
     sensor module's temperature sensor, LCD, stepper motor, and most recent temp 
     reading (in degrees C and F).
+
+    The latest temp reading, valve state and threshold flag are kept in the
+    sensor's slot of a FleetState (see FleetStateView).
     '''
 
+    __slots__ = ('commander', 'sensor_room', 'sensor_name', 'sensor_id', \
+        'temp_sensor_pin', 'temp_sensor_only', 'threshold_passed', \
+        'poll_interval', 'reading_time', 'predictor', 'motion', 'temp_log', \
+        'acquisition', 'drivers', 'temp', 'stepperMotor', 'lcd', 'display')
+
     def __init__(self, commander, sensor_room, sensor_name, sensor_id, \
-        temp_sensor_pin, temp_sensor_only=False):
+        temp_sensor_pin, temp_sensor_only=False, motion_executor=None, \
+        temp_log=None, acquisition=None, fleet_state=None):
         '''Init method for Sensor object.
 
         Note: 'has_passed_threshold' is a flag for tracking when sensor has passed 
@@ -82,6 +122,14 @@ class Sensor(object):
         :param int temp_sensor_pin: AIO pin that temp sensor is on (typically 0).
         :param bool temp_sensor_only: Optional param to indicate that the module only
             has a temperature sensor (typically for demo purposes).
+        :param MotionExecutor motion_executor: Optional executor for running valve
+            moves (defaults to the executor shared by all sensors).
+        :param TempLogWriter temp_log: Optional writer for temperature readings
+            (defaults to the writer shared by all sensors).
+        :param TempAcquisition acquisition: Optional oversampling/filtering
+            stage for temp readings (defaults to TEMP_OVERSAMPLE/TEMP_FILTERS).
+        :param FleetState fleet_state: Optional store for the sensor's state
+            (defaults to the store shared by all sensors in this process).
 
         :return: Sensor object
         '''
@@ -92,60 +140,56 @@ class Sensor(object):
         self.sensor_id = sensor_id
         self.temp_sensor_pin = temp_sensor_pin
         self.temp_sensor_only = temp_sensor_only
-        self.latest_temp_c = None
-        self.latest_temp_f = None
-        self.has_passed_threshold = False
-        self.valve_open = False
-
-        self.temp = grove.GroveTemp(self.temp_sensor_pin)  # Create temp sensor obj
+        self.threshold_passed = None  # Signal for the threshold last passed, if any
+        self.poll_interval = POLL_INTERVAL  # Seconds until the next temp check
+        self.reading_time = None  # Sensor time (s) of the latest reading
+        self.predictor = TrendPredictor()  # Trend of recent readings
+        self.motion = motion_executor or getMotionExecutor()
+        self.temp_log = temp_log or getTempLogWriter()
+        self.acquisition = acquisition or TempAcquisition()
+
+        # Hardware drivers (upm on the board, or the simulator)
+        self.drivers = getBackend()
+        self.temp = self.drivers.GroveTemp(self.temp_sensor_pin)  # Create temp sensor obj
 
         if not self.temp_sensor_only:
             # Instantiate a Stepper motor on a ULN200XA Darlington Motor Driver
             # This was tested with the Grove Geared Step Motor with Driver
             # Instantiate a ULN2003XA stepper object
             # Note: The other numbers are pins it's connected to on the board
-            self.stepperMotor = upmULN200XA.ULN200XA(STEPPER_STEPS, 8, 9, 10, 11)
-            atexit.register(self.exitHandler)  # Register exit handlers
-            signal.signal(signal.SIGINT, self.SIGINTHandler)
+            self.stepperMotor = self.drivers.ULN200XA(STEPPER_STEPS, 8, 9, 10, 11)
             self.stepperMotor.setSpeed(STEPPER_SPEED)
 
             # Set up the LCD
-            self.lcd = lcd.Jhd1313m1(0, 0x3E, 0x62)
+            self.lcd = self.drivers.Jhd1313m1(0, 0x3E, 0x62)
+            self.display = LcdDisplay(self.lcd)  # Only sends what changed
+
+        # Only take a fleet state slot once the hardware is set up, so a
+        # sensor that fails to come up doesn't leak one
+        fleet_state = fleet_state if fleet_state is not None \
+            else getFleetState()  # An empty FleetState is falsy
+        self.slot = fleet_state.addSensor(sensor_id)
+        self.fleet_state = fleet_state
+        self.latest_temp_c = None  # latest_temp_f follows from it
+        self.has_passed_threshold = False
+        self.valve_open = False  # Commanded valve state (move may still be queued)
+
+        if not self.temp_sensor_only:
+            registerExitHandlers(self)
 
     def recordTemp(self):
-        '''Helper method to write temperature readings to file.
+        '''Helper method to write temperature readings to file. Readings are
+        buffered by the shared TempLogWriter, which writes them out in batches.
         TODO: Write hsitorical readings to DB (ideally via ORM)
 
-        :return: File handle to output file.
+        :return: True
         '''
 
-        # Info needed for writing file + recording temps
-        current_timestamp = datetime.utcnow()
-        current_date_utc = current_timestamp.strftime("%Y-%d-%m")
-        current_time_utc = current_timestamp.strftime("%H:%M:%S")
-
-        # Prep string to write to file
-        # "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF"
-        tempRecord = "{0},{1},{2},{3},{4},{5}\n".\
-            format(current_date_utc, current_time_utc, self.sensor_room, \
-                self.sensor_name, self.latest_temp_c, self.latest_temp_f)
-
-        # Double-check that path for output exists
-        if not os.path.isdir(LOCAL_OUTPUT_PATH):
-            os.mkdir(LOCAL_OUTPUT_PATH)
-
-        # Prep name of file to write data to
-        output_filename = LOCAL_OUTPUT_FILENAME.\
-            format(current_date_utc, self.sensor_room, self.sensor_name)
-        output_full_path = os.path.join(LOCAL_OUTPUT_PATH, output_filename)
-
-        # If output file doesn't already exist, create it
-        if not os.path.isfile(output_full_path):
-            with open(output_full_path, "w") as f:
-                f.write(TEMP_RECORD_FILE_HEADER + tempRecord)
-        else:
-            with open(output_full_path, "a") as f:
-                f.write(tempRecord)
+        # Logged to the sensor's resolution, not the filters' float digits
+        quantize = self.acquisition.quantize
+        self.temp_log.write(datetime.utcnow(), self.sensor_room, \
+            self.sensor_name, quantize(self.latest_temp_c), \
+            quantize(self.latest_temp_f))
 
         return True
 
@@ -153,49 +197,49 @@ class Sensor(object):
         '''Function for clearing and turning the screen on/off.'''
 
         if command == 'start':
-            # Initialize Jhd1313m1 at 0x3E (LCD_ADDRESS) and 0x62 (RGB_ADDRESS)
-            self.lcd.clear()        
-            self.lcd.displayOn()
-            self.lcd.backlightOn()
-
-            # Write initial message to LCD
-            self.lcd.setCursor(0,0)  # Set LCD cursory to write out the top line
-            self.lcd.setColor(0, 0, 0)  # By default, set LCD color to white
-            self.lcd.write(TEMP_LABEL_STRING)  # Write out label for temperature
+            # Clear and turn on the LCD, then write out label for temperature
+            # on the top line. By default, set LCD color to white
+            self.display.start(TEMP_LABEL_STRING, (0, 0, 0))
 
             return True
 
         elif command == 'stop':  # Turn off the display
             # Clear messages from LCD and put into lower-power mode
-            self.lcd.clear()
-            self.lcd.displayOff()
-            self.lcd.backlightOff()
+            self.display.stop()
 
             return True
 
-    def handleUpperThresholdPassed(self):
-        '''Handles case where runTempCheck() determines upper temp threshold passed.'''
+    def handleUpperThresholdPassed(self, crossing_in=0.0):
+        '''Handles case where runTempCheck() determines upper temp threshold
+        passed (or will be passed in crossing_in seconds).
+        '''
 
         self.has_passed_threshold = True
+        self.threshold_passed = CENTRAL_CMD_MESSAGE_HOT
 
         if not self.temp_sensor_only:
-            self.lcd.setColor(255, 0, 0)
-            self.lcd.write(TEMP_STRING.format(self.latest_temp_c, self.latest_temp_f))
+            self.display.setColor(255, 0, 0)
+            self.display.setLine(1, \
+                TEMP_STRING.format(self.latest_temp_c, self.latest_temp_f))
         
-        self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_HOT)
+        self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_HOT, crossing_in)
 
         return True
 
-    def handleLowerThresholdPassed(self):
-        '''Handles case where runTempCheck() determines lower temp threshold passed.'''
+    def handleLowerThresholdPassed(self, crossing_in=0.0):
+        '''Handles case where runTempCheck() determines lower temp threshold
+        passed (or will be passed in crossing_in seconds).
+        '''
 
         self.has_passed_threshold = True
+        self.threshold_passed = CENTRAL_CMD_MESSAGE_COLD
 
         if not self.temp_sensor_only:
-            self.lcd.setColor(0, 0, 255)
-            self.lcd.write(TEMP_STRING.format(self.latest_temp_c, self.latest_temp_f))
+            self.display.setColor(0, 0, 255)
+            self.display.setLine(1, \
+                TEMP_STRING.format(self.latest_temp_c, self.latest_temp_f))
         
-        self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_COLD)
+        self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_COLD, crossing_in)
 
         return True
 
@@ -204,7 +248,7 @@ class Sensor(object):
         actively helping it.
         '''
 
-        if self.sensor_id in self.commander.favor_ledger.keys():
+        if self.sensor_id in self.commander.favor_ledger:
             return self.commander.favor_ledger[self.sensor_id]
         else:
             return False
@@ -212,45 +256,78 @@ class Sensor(object):
     def runTempCheck(self):
         '''Runs iteration of checking temperature sensor for current reading.'''
 
-        self.latest_temp_c = self.temp.value()
-        self.latest_temp_f = self.latest_temp_c * 9.0/5.0 + 32.0
-
-        if not self.temp_sensor_only: self.lcd.setCursor(1,0)
-
-        # Check whether temp has passed upper or lower threshold
-        if self.latest_temp_c >= UTHRESHOLD:
+        poll_start = _now()
+
+        # Oversampled and filtered, so a single noisy read can't trip an alert
+        previous_temp_c = self.latest_temp_c
+        self.latest_temp_c = self.acquisition.read(self.temp)
+        _READ_TIME.since(poll_start)
+
+        # Readings are timed by the poll schedule, so the trend also works
+        # when sensors are run in simulated time
+        self.reading_time = 0.0 if self.reading_time is None \
+            else self.reading_time + self.pollInterval()
+        self.predictor.update(self.reading_time, self.latest_temp_c)
+
+        if ADAPTIVE_POLLING:
+            self.updatePollInterval(previous_temp_c)
+        self.commander.receiveTempFromSensor(self)
+
+        # Check whether temp has passed upper or lower threshold. Once passed,
+        # a threshold only clears after the temp comes back TEMP_HYSTERESIS
+        # past it, so a temp hovering at the threshold doesn't flap
+        upper_threshold, lower_threshold = UTHRESHOLD, LTHRESHOLD
+        if self.threshold_passed == CENTRAL_CMD_MESSAGE_HOT:
+            upper_threshold -= TEMP_HYSTERESIS
+        elif self.threshold_passed == CENTRAL_CMD_MESSAGE_COLD:
+            lower_threshold += TEMP_HYSTERESIS
+
+        if self.latest_temp_c >= upper_threshold:
             self.handleUpperThresholdPassed()
-        elif self.latest_temp_c < LTHRESHOLD:
+        elif self.latest_temp_c < lower_threshold:
             self.handleLowerThresholdPassed()
+        elif PREDICTIVE_ALERTS and self.checkPredictedCrossing():
+            pass  # Early alert already sent
         else:
-            if not self.temp_sensor_only:
-                if self.has_passed_threshold and self.valve_open:
-                    self.has_passed_threshold = False  # Reset the flag
-                    print(HAPPY_SENSOR_MSG.format(self.sensor_id))
-                    self.closeValve()  # Now that temp has stabilized, close valve
+            self.threshold_passed = None
+            if self.has_passed_threshold:
+                self.has_passed_threshold = False  # Reset the flag
+                print(HAPPY_SENSOR_MSG.format(self.sensor_id))
 
-                    # Also tell mission control that temp is now good, so that
-                    # mission control can square up the sensor's ledger
-                    self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_HAPPY)
+                # Tell mission control that temp is now good, so that it
+                # can square up the sensor's ledger. It closes the valve
+                # once no other sensor is relying on it. Also sent when no
+                # helper was found, to withdraw the alert
+                self.sendSignalToMissionControl(CENTRAL_CMD_MESSAGE_HAPPY)
 
-                self.lcd.setColor(0, 255, 0)
-                self.lcd.write(TEMP_STRING.\
+            if not self.temp_sensor_only:
+                self.display.setColor(0, 255, 0)
+                self.display.setLine(1, TEMP_STRING.\
                     format(self.latest_temp_c, self.latest_temp_f))
 
-            else:  # Just reset the flag for the temp_sensor_only case
-                self.has_passed_threshold = False
+        # Send the new reading to the LCD (only the characters that changed)
+        if not self.temp_sensor_only:
+            lcd_start = _now()
+            self.display.refresh()
+            _LCD_TIME.since(lcd_start)
 
+        record_start = _now()
         self.recordTemp()  # Write output to local file (for historical readings)
+        _RECORD_TIME.since(record_start)
+
+        _POLL_TIME.since(poll_start)
 
         return True
 
-    def SIGINTHandler(self, signum, frame):
+    @staticmethod
+    def SIGINTHandler(signum, frame):
         '''This stops Python from printing a stacktrace when you hit control-C.'''
         raise SystemExit
 
     def exitHandler(self):
         '''This lets you run code on exit, including functions from myUln200xa.'''
         print("Exiting")
+        self.temp_log.flush()  # Don't lose buffered readings
         sys.exit(0)
 
     @staticmethod
@@ -265,73 +342,190 @@ class Sensor(object):
 
         return True
 
-    def sendSignalToMissionControl(self, signal):
-        '''Sends message to central command indicating that threshold passed.'''
+    def checkPredictedCrossing(self):
+        '''Sends an early HOT/COLD alert if the temp trend will pass a
+        threshold before a valve opened at the next poll could finish moving
+        (i.e. within the poll interval plus VALVE_ACTUATION_TIME). A sensor
+        still recovering from one threshold isn't alerted early for the
+        other one, as its rising (or falling) trend is the recovery itself.
 
+        :return: True if an early alert was sent.
+        '''
+
+        horizon = self.pollInterval() + VALVE_ACTUATION_TIME
+
+        crossing_in = self.predictor.crossingTime(UTHRESHOLD) \
+            if self.threshold_passed != CENTRAL_CMD_MESSAGE_COLD else None
+        if crossing_in is not None and crossing_in <= horizon:
+            print(PREDICTED_ALERT_MSG.format(self.sensor_id, crossing_in))
+            self.handleUpperThresholdPassed(crossing_in)
+            return True
+
+        crossing_in = self.predictor.crossingTime(LTHRESHOLD) \
+            if self.threshold_passed != CENTRAL_CMD_MESSAGE_HOT else None
+        if crossing_in is not None and crossing_in <= horizon:
+            print(PREDICTED_ALERT_MSG.format(self.sensor_id, crossing_in))
+            self.handleLowerThresholdPassed(crossing_in)
+            return True
+
+        return False
+
+    def sendSignalToMissionControl(self, signal, crossing_in=None):
+        '''Sends message to central command indicating that threshold passed.
+
+        :param str signal: CENTRAL_CMD_MESSAGE_* signal.
+        :param float crossing_in: For HOT/COLD signals, seconds until the
+            threshold is passed (0 if it already has been). Sent as
+            'crossing_at', a monotonic clock timestamp.
+        '''
+
+        alert_start = _now()
         request = {
             'sensor': self,
             'signal': signal
         }
+        if crossing_in is not None:
+            request['crossing_at'] = alert_start + crossing_in
 
         self.commander.receiveAlertFromSensor(self.commander, request)
+        _ALERTS.inc()
+        _ALERT_TIME.since(alert_start)
 
         return True
 
     def openValve(self):
-        '''Activates stepper motor in order to open valve for heat transfer.'''
+        '''Queues stepper motor move in order to open valve for heat transfer.
+
+        :return: MotionFuture for the move, or False if the valve is already open.
+        '''
 
         if not self.valve_open and not self.temp_sensor_only:
-            self.stepperMotor.setDirection(upmULN200XA.ULN200XA_DIR_CW)
-            self.stepperMotor.stepperSteps(STEPPER_STEPS)
             self.valve_open = True
-            return True
+            _VALVE_OPENS.inc()
+            return self.submitValveMove(self.drivers.ULN200XA_DIR_CW)
         else:
             print(ERROR_VALVE_OPEN)
             return False
 
     def closeValve(self):
-        '''Activates stepper motor in order to close valve after heat transfer.'''
+        '''Queues stepper motor move in order to close valve after heat transfer.
+
+        :return: MotionFuture for the move, or False if the valve is already closed.
+        '''
 
         if self.valve_open and not self.temp_sensor_only:
-            self.stepperMotor.setDirection(upmULN200XA.ULN200XA_DIR_CCW)
-            self.stepperMotor.stepperSteps(STEPPER_STEPS)
             self.valve_open = False
-            return True
+            _VALVE_CLOSES.inc()
+            return self.submitValveMove(self.drivers.ULN200XA_DIR_CCW)
         else:
             print(ERROR_VALVE_CLOSED)
             return False
 
+    def submitValveMove(self, direction):
+        '''Queues a full valve move in the given direction on the motion
+        executor, timing it until it's done.
+
+        :return: MotionFuture for the move.
+        '''
+
+        submit_start = _now()
+        move = self.motion.submit(self.sensor_id, self.stepperMotor, \
+            direction, STEPPER_STEPS)
+        _VALVE_SUBMIT_TIME.since(submit_start)
+        move.addDoneCallback(lambda move: _VALVE_MOVE_TIME.since(submit_start))
+
+        return move
+
     def testMotor(self):
         '''Test function for trying out the sensor module's motor.'''
 
         print("Done with temp check cycle.")
         print("Opening valve...")
-        self.openValve()
+        move = self.openValve()
+        if move: move.result()
         print("Changing directions...")
         time.sleep(5)
-        self.closeValve()
+        move = self.closeValve()
+        if move: move.result()
         print("Done.")
 
         return True
 
+    def pollInterval(self):
+        '''Returns the number of seconds to wait before the next temp check.'''
+
+        return self.poll_interval if ADAPTIVE_POLLING else POLL_INTERVAL
+
+    def updatePollInterval(self, previous_temp_c):
+        '''Adapts the poll interval to the latest reading. Polls speed up as
+        the temp nears a threshold, or moves fast enough that it could reach
+        one within POLL_READS_PER_MARGIN polls; they slow down (by at most
+        POLL_INTERVAL_GROWTH per poll) while the room is steady and far from
+        both thresholds. Stays within MIN_POLL_INTERVAL (POLL_INTERVAL while
+        a threshold is passed) and MAX_POLL_INTERVAL.
+
+        :param previous_temp_c: Reading before the latest one (None if none).
+
+        :return: The new poll interval.
+        '''
+
+        if previous_temp_c is None:
+            return self.poll_interval
+
+        # Deg C to the nearest threshold (either side of it)
+        margin = min(abs(UTHRESHOLD - self.latest_temp_c), \
+            abs(self.latest_temp_c - LTHRESHOLD))
+        rate = abs(self.latest_temp_c - previous_temp_c) / self.poll_interval
+
+        interval = MAX_POLL_INTERVAL * min(1.0, margin / POLL_CALM_MARGIN)
+        if rate > 0:
+            interval = min(interval, margin / rate / POLL_READS_PER_MARGIN)
+        interval = min(interval, self.poll_interval * POLL_INTERVAL_GROWTH)
+
+        # Once past a threshold the alert is already out; polling faster would
+        # only repeat it, and cycle the valve faster on the way back
+        min_interval = MIN_POLL_INTERVAL if self.threshold_passed is None \
+            else POLL_INTERVAL
+
+        self.poll_interval = max(min_interval, min(MAX_POLL_INTERVAL, interval))
+
+        return self.poll_interval
+
+    def startPolling(self):
+        '''Prepares the sensor module for having runTempCheck() called on a
+        schedule (e.g. by MissionControl's poll scheduler).
+        '''
+
+        if not self.temp_sensor_only:
+            self.prepScreen("start")
+
+        return True
+
+    def teardown(self):
+        '''Releases the temp sensor, closes the valve and turns off the display.'''
+
+        del self.temp  # Delete the temperature sensor object
+        if not self.temp_sensor_only:  # Close valve, turn off display
+            if self.valve_open: self.closeValve().result()
+            self.prepScreen("stop")
+            unregisterExitHandlers(self)  # No exit handler for a removed sensor
+        self.temp_log.flush()
+
+        return True
+
     def startSensor(self):
         '''Main loop for checking temperature. Runs indefinitely.'''
 
         try:
             # Read temperature, waiting POLL_INTERVAL seconds between readings
             if not DEBUG:  # In standard operating mode, run indefinitely
-                if not self.temp_sensor_only:
-                    self.prepScreen("start")    
+                self.startPolling()
                 while True:
                     self.runTempCheck()
-                    time.sleep(POLL_INTERVAL)
+                    time.sleep(self.pollInterval())
 
         except KeyboardInterrupt:
-            # Teardown/cleanup
-            del self.temp  # Delete the temperature sensor object
-            if not self.temp_sensor_only:  # Close valve, turn off display
-                if self.valve_open: self.closeValve()
-                self.prepScreen("stop")
+            self.teardown()
 
         return True        
 
@@ -340,7 +534,7 @@ class Sensor(object):
 
         if DEBUG:
             print("Starting temp check cycle...")
-            for i in range(0, TEST_RUN_LENGTH / POLL_INTERVAL):
+            for i in range(0, TEST_RUN_LENGTH // POLL_INTERVAL):
                 self.runTempCheck()
                 print("Sleeping till next temp check...")
                 time.sleep(POLL_INTERVAL)
@@ -353,5 +547,67 @@ class Sensor(object):
         if not self.temp_sensor_only:
             self.prepScreen("stop")  # Turn off the display
             self.testMotor()  # FOR DEMO - Run motor test
+        self.temp_log.flush()
+
+        return True
+
+
+def registerExitHandlers(sensor):
+    '''Runs sensor.exitHandler() when the interpreter exits, and stops
+    control-C from printing a stacktrace.
+
+    The atexit and SIGINT handlers are installed once per process. Signal
+    handlers can only be installed from the main thread, so a sensor set up
+    on another thread (e.g. by the inventory watcher) relies on one that
+    was installed earlier, or goes without.
+    '''
+
+    global _atexit_registered, _sigint_installed, _previous_sigint
+
+    with _exit_lock:
+        if sensor not in _exit_sensors:
+            _exit_sensors.append(sensor)
+        if not _atexit_registered:
+            atexit.register(_runExitHandlers)
+            _atexit_registered = True
+        if not _sigint_installed:
+            try:
+                _previous_sigint = signal.signal(signal.SIGINT, Sensor.SIGINTHandler)
+                _sigint_installed = True
+            except ValueError:  # Not on the main thread
+                pass
 
-        return True       
+    return True
+
+
+def unregisterExitHandlers(sensor):
+    '''Drops sensor's exit handler. Once no sensor is left, the SIGINT
+    handler that was there before the first sensor is put back.
+    '''
+
+    global _sigint_installed
+
+    with _exit_lock:
+        if sensor in _exit_sensors:
+            _exit_sensors.remove(sensor)
+        if not _exit_sensors and _sigint_installed:
+            try:
+                # None if it wasn't installed from Python, so use the default
+                signal.signal(signal.SIGINT, _previous_sigint \
+                    if _previous_sigint is not None else signal.default_int_handler)
+                _sigint_installed = False
+            except ValueError:  # Not on the main thread; leave ours in place
+                pass
+
+    return True
+
+
+def _runExitHandlers():
+    with _exit_lock:
+        sensors = list(_exit_sensors)
+
+    for sensor in sensors:
+        try:
+            sensor.exitHandler()
+        except SystemExit:  # Let every sensor's handler run
+            pass
@@ -0,0 +1,193 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import atexit, os, threading, time
+
+LOCAL_OUTPUT_PATH = os.path.join(os.path.expanduser("~"),"sensorTemps")
+LOCAL_OUTPUT_FILENAME = "{0}_{1}_{2}_sensorTemps.csv"
+TEMP_RECORD_FILE_HEADER = "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF\n"
+TEMP_RECORD_DATE_FORMAT = "%Y-%d-%m"  # Date format used in rows and filenames
+
+# Storage for recorded temps. history.query, rollups, analytics and
+# sim.replay all read "csv" and "compressed" logs (a day with both is read
+# from the CSV), but a .tsz file is decoded whole every time it's queried,
+# with no saved index. "segments" files are only read by history.segments
+# and analytics.loadSegmentHistory.
+TEMP_RECORD_BACKEND = "csv"  # "csv" (daily CSV files), "segments" (binary) or "compressed" (daily .tsz files)
+TEMP_LOG_FLUSH_ROWS = 256  # Buffered rows (across all files) that trigger a flush
+TEMP_LOG_FLUSH_INTERVAL = 30  # Max seconds a row sits in the buffer
+
+ERROR_FLUSH_FAILED = "ERROR: Could not flush temp log: {0!r}"
+
+
+class TempLogWriter(object):
+    '''Shared writer for the daily temperature CSV files.
+
+    Keeps one open file handle per (date, room, sensor) and buffers rows in
+    memory, writing them out once TEMP_LOG_FLUSH_ROWS rows are pending or the
+    oldest pending row is TEMP_LOG_FLUSH_INTERVAL seconds old. When the UTC
+    date changes, the previous day's files are flushed and closed. Call
+    close() on shutdown so that no buffered readings are lost.
+    '''
+
+    def __init__(self, output_path=LOCAL_OUTPUT_PATH, \
+        flush_rows=TEMP_LOG_FLUSH_ROWS, flush_interval=TEMP_LOG_FLUSH_INTERVAL):
+        '''Init method for the temp log writer.
+
+        :param str output_path: Directory the daily CSV files are written to.
+        :param int flush_rows: Pending rows that trigger a flush.
+        :param float flush_interval: Max seconds between flushes (0 to only
+            flush on size or on demand).
+
+        :return: TempLogWriter object
+        '''
+
+        self.output_path = output_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._pending = {}  # (date, room, sensor) -> list of row strings
+        self._pending_rows = 0
+        self._handles = {}  # (date, room, sensor) -> open file object
+        self._current_day = None  # (year, month, day) of the newest row
+        self._current_date_utc = None
+        self._last_flush = time.time()
+        self._flusher = None
+        self._closed = False
+
+    def write(self, timestamp, sensor_room, sensor_name, temp_c, temp_f):
+        '''Buffers one temperature reading.
+
+        :param datetime timestamp: UTC time of the reading.
+        :param str sensor_room: Room name where the sensor is located.
+        :param str sensor_name: Name of the sensor in the room.
+        :param float temp_c: Reading in degrees C.
+        :param float temp_f: Reading in degrees F.
+
+        :return: True
+        '''
+
+        with self._lock:
+            self._closed = False
+            day = (timestamp.year, timestamp.month, timestamp.day)
+            if day != self._current_day:
+                self._rollOver(day, timestamp)
+
+            # "Date-UTC,Time-UTC,Room,Sensor,TempC,TempF"
+            row = "{0},{1:02d}:{2:02d}:{3:02d},{4},{5},{6},{7}\n".format(\
+                self._current_date_utc, timestamp.hour, timestamp.minute, \
+                timestamp.second, sensor_room, sensor_name, temp_c, temp_f)
+
+            key = (self._current_date_utc, sensor_room, sensor_name)
+            rows = self._pending.get(key)
+            if rows is None:
+                rows = self._pending[key] = []
+            rows.append(row)
+            self._pending_rows += 1
+
+            if self._pending_rows >= self.flush_rows:
+                self.flush()
+            elif self._flusher is None and self.flush_interval > 0:
+                self._startFlusher()
+
+        return True
+
+    def flush(self):
+        '''Writes all buffered rows out to their files.'''
+
+        with self._lock:
+            if self._pending_rows:
+                if not os.path.isdir(self.output_path):
+                    os.makedirs(self.output_path)
+
+                for key, rows in self._pending.items():
+                    handle = self._handles.get(key)
+                    if handle is None:
+                        handle = self._handles[key] = self._openFile(key)
+                    handle.write("".join(rows))
+                    handle.flush()
+
+                self._pending = {}
+                self._pending_rows = 0
+
+            self._last_flush = time.time()
+
+        return True
+
+    def close(self):
+        '''Flushes buffered rows and closes all open files.'''
+
+        with self._lock:
+            self.flush()
+            for handle in self._handles.values():
+                handle.close()
+            self._handles = {}
+            self._closed = True
+
+        return True
+
+    def _openFile(self, key):
+        output_filename = LOCAL_OUTPUT_FILENAME.format(*key)
+        handle = open(os.path.join(self.output_path, output_filename), "a")
+        if handle.tell() == 0:  # New file, so start it off with the header
+            handle.write(TEMP_RECORD_FILE_HEADER)
+
+        return handle
+
+    def _rollOver(self, day, timestamp):
+        if self._current_day is not None:
+            self.flush()
+            for handle in self._handles.values():
+                handle.close()
+            self._handles = {}
+
+        self._current_day = day
+        self._current_date_utc = timestamp.strftime(TEMP_RECORD_DATE_FORMAT)
+
+    def _startFlusher(self):
+        self._flusher = threading.Thread(target=self._runFlusher, \
+            name="mhi-templog-flusher")
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _runFlusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                if self._closed:
+                    self._flusher = None
+                    return
+                if time.time() - self._last_flush >= self.flush_interval:
+                    try:
+                        self.flush()
+                    except (IOError, OSError) as e:
+                        print(ERROR_FLUSH_FAILED.format(e))
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def getTempLogWriter():
+    '''Returns the temp log writer shared by all sensors in this process,
+    for the storage backend picked by TEMP_RECORD_BACKEND. It is flushed
+    automatically when the interpreter exits.
+    '''
+
+    global _default_writer
+
+    with _default_writer_lock:
+        if _default_writer is None:
+            if TEMP_RECORD_BACKEND == "segments":
+                from mhiheatexchanger.history.segments import SegmentWriter
+                _default_writer = SegmentWriter()
+            elif TEMP_RECORD_BACKEND == "compressed":
+                from mhiheatexchanger.history.codec import CodecWriter
+                _default_writer = CodecWriter()
+            else:
+                _default_writer = TempLogWriter()
+            atexit.register(_default_writer.close)
+
+    return _default_writer
@@ -0,0 +1,12 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Temp thresholds and poll interval limits of the sensor modules. Kept apart
+# from sensor.sensor so that code reading the recorded history can use them
+# without importing the sensor module (and its drivers and metrics).
+
+UTHRESHOLD = 24  # Deg C
+LTHRESHOLD = 20  # Deg C
+
+POLL_INTERVAL = 10  # Seconds
+MIN_POLL_INTERVAL = 2  # Seconds; fastest adaptive poll rate
+MAX_POLL_INTERVAL = 60  # Seconds; slowest adaptive poll rate
@@ -0,0 +1,218 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Fleet benchmark for MissionControl. Runs a fleet of simulated sensor
+# modules against the thermal model, in simulated time, through the normal
+# Sensor.runTempCheck -> sendSignalToMissionControl -> processAlertQueue
+# path. Usage:
+#
+#   python -m mhiheatexchanger.sim.benchmark --sensors 10 100 1000 --hours 1
+
+import argparse, heapq, os, random, sys, time
+sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
+
+from mhiheatexchanger.drivers.hal import setBackend
+from mhiheatexchanger.sensor.motion import MotionExecutor
+from mhiheatexchanger.sensor.sensor import UTHRESHOLD, LTHRESHOLD, \
+    unregisterExitHandlers
+from mhiheatexchanger.sim.thermal import ThermalModel
+
+BENCHMARK_SENSOR_COUNTS = [10, 100, 1000]
+BENCHMARK_HOURS = 1.0  # Sim hours per run
+BENCHMARK_TICK = 1.0  # Sim seconds per thermal model step
+BENCHMARK_FIRST_SENSOR_ID = 1000  # Clear of the demo's virtual sensor ID
+BENCHMARK_START_TEMPS = (14.0, 30.0)  # Range (deg C) of initial room temps
+BENCHMARK_LOAD_TEMPS = (15.0, 29.0)  # Range (deg C) of room heat load temps
+LATENCY_PERCENTILES = (50, 90, 99)
+
+REPORT_HEADER = "{0:>8} {1:>10} {2:>10} {3:>10} {4:>9} {5:>9} {6:>9} {7:>12} {8:>12} {9:>8}"
+REPORT_HEADER_FIELDS = ("Sensors", "Polls", "Alerts", "Alerts/s", "p50 ms", \
+    "p90 ms", "p99 ms", "Moves/hour", "Equilib. s", "Speedup")
+REPORT_ROW = "{0:>8} {1:>10} {2:>10} {3:>10.0f} {4:>9.3f} {5:>9.3f} {6:>9.3f} {7:>12.1f} {8:>12} {9:>7.0f}x"
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class _NullTempLog(object):
+    '''Temp log writer that drops readings (the benchmark measures the
+    controller, not the disk).
+    '''
+
+    def write(self, timestamp, room, sensor, temp_c, temp_f):
+        return True
+
+    def flush(self):
+        return True
+
+    def close(self):
+        return True
+
+
+def makeInventory(sensor_count):
+    '''Returns a sensor inventory (in the ACTIVE_SENSORS format) with one
+    sensor module per room.
+    '''
+
+    return [{
+        'sensor_id': BENCHMARK_FIRST_SENSOR_ID + i,
+        'sensor_room': "Room_{0}".format(i),
+        'sensor_name': "Sensor_1",
+        'temp_sensor_pin': 0
+    } for i in range(sensor_count)]
+
+
+def percentile(sorted_values, percent):
+    '''Nearest-rank percentile of an already sorted list (None if empty).'''
+
+    if len(sorted_values) == 0:
+        return None
+    rank = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+
+    return sorted_values[rank]
+
+
+def runBenchmark(sensor_count, hours=BENCHMARK_HOURS, seed=None, \
+    tick=BENCHMARK_TICK):
+    '''Runs one simulated fleet for the given number of sim hours.
+
+    :param int sensor_count: Number of sensor modules (one per room).
+    :param float hours: Sim hours to run for.
+    :param seed: Optional random seed for the room temps and loads.
+    :param float tick: Sim seconds per thermal model step.
+
+    :return: Dict of results.
+    '''
+
+    # Imported here so the sim backend is selected before sensors are made
+    from mhiheatexchanger.command import commander
+
+    setBackend("sim")
+    rng = random.Random(seed)
+    model = ThermalModel()
+    motion = MotionExecutor(worker_count=0)  # Valve moves run in sim time
+    temp_log = _NullTempLog()
+
+    houston = commander.MissionControl(makeInventory(sensor_count), \
+        start_polling=False, motion_executor=motion, temp_log=temp_log)
+
+    # Stamp alerts on arrival, so the time until the controller has acted on
+    # them can be measured
+    received = []
+    queue_alert = houston.receiveAlertFromSensor
+
+    def receiveAlertFromSensor(self, alert):
+        alert['received_at'] = _now()
+        received.append(alert)
+        return queue_alert(self, alert)
+
+    houston.receiveAlertFromSensor = receiveAlertFromSensor
+
+    polls = []  # Heap of (next poll sim time, index, sensor)
+    for index, sensor in enumerate(houston.connected_sensors):
+        room = model.addRoom(sensor.sensor_room, \
+            rng.uniform(*BENCHMARK_START_TEMPS), rng.uniform(*BENCHMARK_LOAD_TEMPS))
+        sensor.temp.reader = (lambda room: lambda: room.temp_c)(room)
+        if not sensor.temp_sensor_only:
+            sensor.stepperMotor.listeners.append(model.stepperListener(room))
+        unregisterExitHandlers(sensor)  # Skip the sensor module's exit handler
+        polls.append((sensor.pollInterval() * index / float(sensor_count), \
+            index, sensor))
+    heapq.heapify(polls)
+
+    poll_count = 0
+    latencies = []
+    equilibrium_at = None
+    end = hours * 3600.0
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    run_start = _now()
+    try:
+        for sensor in houston.connected_sensors:
+            sensor.startPolling()
+
+        while model.now < end:
+            while polls and polls[0][0] <= model.now:
+                due, index, sensor = heapq.heappop(polls)
+                sensor.runTempCheck()
+                poll_count += 1
+                heapq.heappush(polls, (due + sensor.pollInterval(), index, sensor))
+
+            if len(received) > 0:
+                houston.processAlertQueue()
+                decided_at = _now()
+                latencies.extend(decided_at - alert['received_at'] \
+                    for alert in received)
+                del received[:]
+
+            model.step(tick)
+            if equilibrium_at is None and model.allWithin(LTHRESHOLD, UTHRESHOLD):
+                equilibrium_at = model.now
+
+        valve_moves = sum(room.valve_moves for room in model.rooms)
+        for sensor in houston.connected_sensors:
+            sensor.teardown()
+    finally:
+        run_seconds = _now() - run_start
+        sys.stdout = stdout
+        devnull.close()
+
+    latencies.sort()
+    stats = houston.alert_stats
+    results = {
+        'sensors': sensor_count,
+        'sim_seconds': model.now,
+        'wall_seconds': run_seconds,
+        'polls': poll_count,
+        'alerts': stats['alerts'],
+        'alerts_per_second': stats['alerts'] / stats['seconds'] \
+            if stats['seconds'] > 0 else 0.0,
+        'valve_moves_per_hour': valve_moves / (model.now / 3600.0),
+        'equilibrium_seconds': equilibrium_at,
+    }
+    for percent in LATENCY_PERCENTILES:
+        latency = percentile(latencies, percent)
+        results['latency_p{0}'.format(percent)] = latency
+
+    return results
+
+
+def printReport(results):
+    '''Prints one line per benchmark run.'''
+
+    print(REPORT_HEADER.format(*REPORT_HEADER_FIELDS))
+    for result in results:
+        equilibrium = result['equilibrium_seconds']
+        print(REPORT_ROW.format(result['sensors'], result['polls'], \
+            result['alerts'], \
+            result['alerts_per_second'], \
+            *[1000.0 * (result['latency_p{0}'.format(percent)] or 0.0) \
+                for percent in LATENCY_PERCENTILES] + \
+            [result['valve_moves_per_hour'], \
+                "never" if equilibrium is None else "{0:.0f}".format(equilibrium), \
+                result['sim_seconds'] / result['wall_seconds']]))
+
+    return True
+
+
+def main(argv=None):
+    '''Runs the benchmark for each fleet size and prints a report.'''
+
+    parser = argparse.ArgumentParser(description="MissionControl fleet benchmark.")
+    parser.add_argument("--sensors", type=int, nargs="+", \
+        default=BENCHMARK_SENSOR_COUNTS, help="Fleet sizes to run.")
+    parser.add_argument("--hours", type=float, default=BENCHMARK_HOURS, \
+        help="Sim hours per run.")
+    parser.add_argument("--seed", type=int, default=None, \
+        help="Random seed for room temps and loads.")
+    args = parser.parse_args(argv)
+
+    results = [runBenchmark(sensor_count, args.hours, args.seed) \
+        for sensor_count in args.sensors]
+    printReport(results)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Replays recorded *_sensorTemps.csv history (or the .tsz files
+# history.codec compresses it to) through MissionControl. Every
+# sensor's daily files are streamed row by row, the sensors are merged in
+# timestamp order, and each reading is fed to a simulated sensor module
+# through the normal Sensor.runTempCheck -> processAlertQueue path. The
+# valve moves that result are written out as CSV, so that a controller
+# change can be compared against recorded data. Usage:
+#
+#   python -m mhiheatexchanger.sim.replay [csv_dir] [--speed 3600] [--output moves.csv]
+
+import argparse, heapq, os, sys, time
+sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
+
+from mhiheatexchanger.drivers.hal import setBackend
+from mhiheatexchanger.history.codec import dailyLogFiles, iterDailyLog
+from mhiheatexchanger.history.valvelog import VALVE_MOVES_HEADER, \
+    VALVE_OPENED, VALVE_CLOSED, formatValveMove
+from mhiheatexchanger.sensor.motion import MotionExecutor
+from mhiheatexchanger.sensor.sensor import unregisterExitHandlers
+from mhiheatexchanger.sensor.templog import LOCAL_OUTPUT_PATH
+from mhiheatexchanger.sim.benchmark import _NullTempLog, \
+    BENCHMARK_FIRST_SENSOR_ID
+
+REPLAY_SPEED = 0  # Sim seconds per wall second (0 replays as fast as possible)
+
+REPLAY_SUMMARY_MSG = "Replayed {0} readings from {1} sensors ({2} to {3}) in {4:.1f} s: {5} valve moves."
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+def iterCsvReadings(csv_paths):
+    '''Streams readings from daily logs, CSV or .tsz (in the order given),
+    one row at a time.
+
+    :return: Generator of (datetime, room, sensor, temp_c) tuples.
+    '''
+
+    for csv_path in csv_paths:
+        for row in iterDailyLog(csv_path):
+            yield row
+
+
+def sensorCsvFiles(csv_dir=LOCAL_OUTPUT_PATH):
+    '''Groups the daily logs in csv_dir (CSV, or .tsz for days without a
+    CSV) by sensor.
+
+    :return: List of per-sensor lists of file paths, oldest day first.
+    '''
+
+    sensors = {}
+    for csv_path in dailyLogFiles(csv_dir):  # Already oldest day first
+        # Filenames are "<date>_<room>_<sensor>_sensorTemps.csv" (or .tsz)
+        sensor_key = os.path.splitext(os.path.basename(csv_path))[0].split("_", 1)[1]
+        sensors.setdefault(sensor_key, []).append(csv_path)
+
+    return [csv_paths for sensor_key, csv_paths in sorted(sensors.items())]
+
+
+def mergeReadings(streams):
+    '''Merges per-sensor reading streams (each already in time order) into
+    one stream in time order, with a k-way heap merge. Only one reading per
+    stream is held in memory at a time.
+    '''
+
+    return heapq.merge(*streams)
+
+
+class ValveLog(object):
+    '''Collects the valve moves made during a replay, stamped with the
+    recorded time of the reading that led to them.
+    '''
+
+    def __init__(self):
+        self.moves = []  # (datetime, room, sensor, VALVE_OPENED/VALVE_CLOSED)
+        self.timestamp = None  # Recorded time of the reading being replayed
+        self.recording = True  # Off for the valves closed at teardown
+
+    def listener(self, sensor):
+        '''Returns a sim ULN200XA step listener that logs sensor's moves.'''
+
+        def listener(motor, steps):
+            if not self.recording:
+                return
+            self.moves.append((self.timestamp, sensor.sensor_room, \
+                sensor.sensor_name, VALVE_OPENED if steps > 0 else VALVE_CLOSED))
+
+        return listener
+
+    def write(self, output):
+        '''Writes the moves as CSV (see history.valvelog) to a file object.'''
+
+        output.write(VALVE_MOVES_HEADER)
+        for timestamp, room, sensor, move in self.moves:
+            output.write(formatValveMove(timestamp, room, sensor, move))
+
+        return True
+
+
+def _firstReading(csv_paths):
+    return next(iterCsvReadings(csv_paths), None)
+
+
+def replay(csv_dir=LOCAL_OUTPUT_PATH, speed=REPLAY_SPEED, quiet=True):
+    '''Replays the recorded history in csv_dir through a new MissionControl.
+
+    Each recorded sensor becomes a simulated sensor module (sensor IDs from
+    BENCHMARK_FIRST_SENSOR_ID, clear of the demo's virtual sensor). Readings
+    are fed in recorded time order; each sensor's poll interval is set to
+    the recorded gap since its previous reading, so its trend and adaptive
+    polling see recorded time. Alerts are processed after every reading.
+
+    :param str csv_dir: Directory of *_sensorTemps.csv (or .tsz) files.
+    :param float speed: Recorded seconds replayed per wall second (0 for
+        as fast as possible).
+    :param bool quiet: Whether to hide the controller's console output.
+
+    :return: Tuple of (ValveLog, results dict).
+    '''
+
+    # Imported here so the sim backend is selected before sensors are made
+    from mhiheatexchanger.command import commander
+
+    setBackend("sim")
+    sensor_files = [csv_paths for csv_paths in sensorCsvFiles(csv_dir) \
+        if _firstReading(csv_paths) is not None]
+    inventory = []
+    for index, csv_paths in enumerate(sensor_files):
+        timestamp, room, sensor_name, temp_c = _firstReading(csv_paths)
+        inventory.append({
+            'sensor_id': BENCHMARK_FIRST_SENSOR_ID + index,
+            'sensor_room': room,
+            'sensor_name': sensor_name,
+            'temp_sensor_pin': 0
+        })
+
+    motion = MotionExecutor(worker_count=0)  # Valve moves run in replay time
+    temp_log = _NullTempLog()  # Don't record the recording again
+    readings = 0
+    first = last = None
+    last_reading = {}  # (room, sensor) -> datetime of its previous reading
+    stdout = sys.stdout
+    devnull = open(os.devnull, 'w') if quiet else None
+    run_start = _now()
+    houston = None
+    valve_log = ValveLog()
+    try:
+        if quiet:
+            sys.stdout = devnull
+        houston = commander.MissionControl(inventory, start_polling=False, \
+            motion_executor=motion, temp_log=temp_log)
+        replay_temps = {}  # (room, sensor) -> temp being replayed
+        sensors = {}  # (room, sensor) -> Sensor
+        for sensor in houston.connected_sensors:
+            key = (sensor.sensor_room, sensor.sensor_name)
+            sensors[key] = sensor
+            sensor.temp.reader = (lambda key: lambda: replay_temps[key])(key)
+            if not sensor.temp_sensor_only:
+                sensor.stepperMotor.listeners.append(valve_log.listener(sensor))
+            unregisterExitHandlers(sensor)  # Skip the sensor module's exit handler
+
+        for sensor in houston.connected_sensors:
+            sensor.startPolling()
+
+        streams = [iterCsvReadings(csv_paths) for csv_paths in sensor_files]
+        for timestamp, room, sensor_name, temp_c in mergeReadings(streams):
+            key = (room, sensor_name)
+            sensor = sensors.get(key)
+            if sensor is None:  # Row from another sensor in a renamed file
+                continue
+
+            if first is None:
+                first = timestamp
+            elif speed > 0:
+                wait = (timestamp - first).total_seconds() / speed - \
+                    (_now() - run_start)
+                if wait > 0:
+                    time.sleep(wait)
+
+            previous = last_reading.get(key)
+            if previous is not None:
+                gap = (timestamp - previous).total_seconds()
+                if gap > 0:
+                    sensor.poll_interval = gap
+            last_reading[key] = last = timestamp
+
+            replay_temps[key] = temp_c
+            valve_log.timestamp = timestamp
+            sensor.runTempCheck()
+            readings += 1
+            if len(houston.alert_queue) > 0:
+                houston.checkAlertQueue()
+    finally:
+        valve_log.recording = False  # Closing valves at teardown isn't a move
+        if houston is not None:  # Tears down the sensors, and their valves
+            houston.shutdown()
+        motion.shutdown()
+        sys.stdout = stdout
+        if devnull is not None:
+            devnull.close()
+
+    return valve_log, {
+        'sensors': len(sensors),
+        'readings': readings,
+        'first': first,
+        'last': last,
+        'wall_seconds': _now() - run_start,
+        'valve_moves': len(valve_log.moves),
+    }
+
+
+def main(argv=None):
+    '''Replays a directory of recorded CSV history and writes out the valve
+    moves MissionControl made.
+    '''
+
+    parser = argparse.ArgumentParser(description="Replay recorded sensor " \
+        "temps through MissionControl.")
+    parser.add_argument("csv_dir", nargs="?", default=LOCAL_OUTPUT_PATH)
+    parser.add_argument("--speed", type=float, default=REPLAY_SPEED, \
+        help="Recorded seconds per wall second (0 for as fast as possible).")
+    parser.add_argument("--output", default=None, \
+        help="File to write valve moves to (default: stdout).")
+    parser.add_argument("--verbose", action="store_true", \
+        help="Show the controller's console output.")
+    args = parser.parse_args(argv)
+
+    valve_log, results = replay(args.csv_dir, args.speed, quiet=not args.verbose)
+    if args.output is None:
+        valve_log.write(sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            valve_log.write(output)
+
+    print(REPLAY_SUMMARY_MSG.format(results['readings'], results['sensors'], \
+        results['first'], results['last'], results['wall_seconds'], \
+        results['valve_moves']), file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Lumped-capacitance thermal model of the habitat's rooms, for driving the
+# simulated driver backend in simulated time.
+
+from mhiheatexchanger.sensor.sensor import VALVE_ACTUATION_TIME
+
+ROOM_HEAT_CAPACITY = 2.0e5  # J/K per room (air plus furnishings)
+ROOM_LOAD_CONDUCTANCE = 20.0  # W/K between a room and its heat load
+VALVE_CONDUCTANCE = 60.0  # W/K between a room with an open valve and the duct
+
+
+class Room(object):
+    '''One room: a single temperature node pulled towards its load
+    temperature (sun, equipment, crew or radiative losses), and coupled to
+    the shared heat exchange duct while its valve is open.
+    '''
+
+    __slots__ = ('name', 'temp_c', 'load_temp_c', 'valve_open', \
+        'valve_changes_at', 'valve_target', 'valve_moves')
+
+    def __init__(self, name, temp_c, load_temp_c):
+        self.name = name
+        self.temp_c = temp_c
+        self.load_temp_c = load_temp_c
+        self.valve_open = False
+        self.valve_changes_at = None  # Sim time a pending valve move finishes
+        self.valve_target = False
+        self.valve_moves = 0
+
+
+class ThermalModel(object):
+    '''Simulates room temperatures in fixed time steps.
+
+    All rooms with an open valve share one duct. The duct has no heat
+    capacity of its own: it sits at the mean temp of the connected rooms
+    (they all have the same valve conductance), so heat exchange between
+    rooms conserves energy.
+    Valve moves take VALVE_ACTUATION_TIME seconds to take effect.
+    '''
+
+    def __init__(self, heat_capacity=ROOM_HEAT_CAPACITY, \
+        load_conductance=ROOM_LOAD_CONDUCTANCE, \
+        valve_conductance=VALVE_CONDUCTANCE, \
+        valve_actuation_time=VALVE_ACTUATION_TIME):
+        self.heat_capacity = heat_capacity
+        self.load_conductance = load_conductance
+        self.valve_conductance = valve_conductance
+        self.valve_actuation_time = valve_actuation_time
+        self.rooms = []
+        self.now = 0.0  # Sim time (s)
+
+    def addRoom(self, name, temp_c, load_temp_c):
+        '''Adds a room and returns it.'''
+
+        room = Room(name, temp_c, load_temp_c)
+        self.rooms.append(room)
+
+        return room
+
+    def moveValve(self, room, open_valve):
+        '''Starts moving a room's valve; it takes effect after the actuation time.'''
+
+        room.valve_target = open_valve
+        room.valve_changes_at = self.now + self.valve_actuation_time
+        room.valve_moves += 1
+
+    def stepperListener(self, room):
+        '''Returns a listener for a simulated ULN200XA that moves the room's
+        valve whenever the motor moves (clockwise opens, counter-clockwise
+        closes).
+        '''
+
+        def listener(motor, steps):
+            self.moveValve(room, steps > 0)
+
+        return listener
+
+    def step(self, dt):
+        '''Advances the model by dt seconds (explicit Euler).'''
+
+        self.now += dt
+
+        duct_heat = 0.0
+        duct_rooms = 0
+        for room in self.rooms:
+            if room.valve_changes_at is not None and \
+                room.valve_changes_at <= self.now:
+                room.valve_open = room.valve_target
+                room.valve_changes_at = None
+            if room.valve_open:
+                duct_heat += room.temp_c
+                duct_rooms += 1
+
+        # A duct connecting a single room has nowhere to move heat to
+        duct_temp_c = duct_heat / duct_rooms if duct_rooms > 1 else None
+
+        scale = dt / self.heat_capacity
+        for room in self.rooms:
+            heat_flow = self.load_conductance * (room.load_temp_c - room.temp_c)
+            if room.valve_open and duct_temp_c is not None:
+                heat_flow += self.valve_conductance * (duct_temp_c - room.temp_c)
+            room.temp_c += heat_flow * scale
+
+        return self.now
+
+    def allWithin(self, low, high):
+        '''Returns True if every room's temp is in [low, high).'''
+
+        for room in self.rooms:
+            if not low <= room.temp_c < high:
+                return False
+
+        return True
@@ -0,0 +1,193 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Sensor module side of the network transport. Runs some of the sensors in
+# ACTIVE_SENSORS in this process, talking to the central module over TCP:
+#
+#   python -m mhiheatexchanger.transport.client --host HOST --sensor-ids 0 1
+
+import argparse, os, socket, sys, threading, time
+sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
+
+from mhiheatexchanger.command.commander import ACTIVE_SENSORS, \
+    SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID
+from mhiheatexchanger.command.scheduler import PollScheduler
+from mhiheatexchanger.history.rollups import CompactionJob
+from mhiheatexchanger.sensor.sensor import Sensor
+from mhiheatexchanger.transport.protocol import FramedConnection, \
+    encodeHello, encodeTemp, encodeAlert, TRANSPORT_PORT, MSG_COMMAND
+
+TRANSPORT_RECONNECT_INTERVAL = 2.0  # Seconds between attempts to reach the central module
+TRANSPORT_CONNECT_TIMEOUT = 5.0  # Seconds
+
+CONNECTED_MSG = "Connected to central module at {0}:{1}."
+ERROR_CONNECT_FAILED = "ERROR: Can't reach central module at {0}:{1} ({2}). Retrying..."
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class RemoteCommander(object):
+    '''Stands in for MissionControl inside a sensor module process: used as
+    the commander of local Sensor objects, it sends their readings and
+    alerts to the central module, and runs the valve commands it sends back.
+
+    The connection is persistent and reconnects on its own (saying hello
+    for every registered sensor again). Readings and alerts sent while it's
+    down are dropped; sensors send fresh ones every poll anyway.
+    '''
+
+    def __init__(self, host, port=TRANSPORT_PORT):
+        '''Init method for the remote commander. Connects in the background.
+
+        :param str host: Central module host.
+        :param int port: Central module port.
+
+        :return: RemoteCommander object
+        '''
+
+        self.host = host
+        self.port = port
+        self.favor_ledger = {}  # Kept by the central module
+        self.sensors = {}  # sensor_id -> local Sensor
+        self.connected = threading.Event()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._running = True
+
+        thread = threading.Thread(target=self._runConnector, \
+            name="mhi-transport-connector")
+        thread.daemon = True
+        thread.start()
+
+    def registerSensor(self, sensor):
+        '''Makes a local sensor known to the central module.'''
+
+        with self._lock:
+            self.sensors[sensor.sensor_id] = sensor
+            connection = self._connection
+        if connection is not None:
+            connection.send(self._hello(sensor))
+
+        return True
+
+    @staticmethod
+    def receiveAlertFromSensor(self, alert):
+        '''Sends a sensor's alert to the central module.'''
+
+        sensor = alert['sensor']
+        crossing_in = None
+        if 'crossing_at' in alert:
+            crossing_in = max(0.0, alert['crossing_at'] - _now())
+
+        return self._send(encodeAlert(sensor.sensor_id, alert['signal'], \
+            sensor.latest_temp_c, sensor.valve_open, crossing_in))
+
+    def receiveTempFromSensor(self, sensor):
+        '''Sends a sensor's latest reading to the central module.'''
+
+        return self._send(encodeTemp(sensor.sensor_id, sensor.latest_temp_c, \
+            sensor.valve_open))
+
+    def close(self):
+        '''Closes the connection for good.'''
+
+        self._running = False
+        with self._lock:
+            connection = self._connection
+        if connection is not None:
+            connection.close()
+
+        return True
+
+    def _send(self, message):
+        connection = self._connection
+        if connection is None:
+            return False
+
+        return connection.send(message)
+
+    def _hello(self, sensor):
+        return encodeHello(sensor.sensor_id, sensor.temp_sensor_only, \
+            sensor.sensor_room, sensor.sensor_name)
+
+    def _handleMessage(self, connection, message):
+        if message[0] == MSG_COMMAND:
+            sensor = self.sensors.get(message[1])
+            if sensor is not None:
+                sensor.respondToMissionControl(sensor, message[2])
+
+    def _connectionClosed(self, connection):
+        with self._lock:
+            if self._connection is connection:
+                self._connection = None
+                self.connected.clear()
+
+    def _runConnector(self):
+        while self._running:
+            if self._connection is None:
+                try:
+                    sock = socket.create_connection((self.host, self.port), \
+                        TRANSPORT_CONNECT_TIMEOUT)
+                    sock.settimeout(None)
+                except (socket.error, OSError) as e:
+                    print(ERROR_CONNECT_FAILED.format(self.host, self.port, e))
+                else:
+                    connection = FramedConnection(sock, self._handleMessage, \
+                        on_close=self._connectionClosed)
+                    with self._lock:
+                        self._connection = connection
+                        sensors = list(self.sensors.values())
+                    for sensor in sensors:
+                        connection.send(self._hello(sensor))
+                    self.connected.set()
+                    print(CONNECTED_MSG.format(self.host, self.port))
+
+            time.sleep(TRANSPORT_RECONNECT_INTERVAL)
+
+
+def main(argv=None):
+    '''Runs sensor modules from ACTIVE_SENSORS in this process, reporting to
+    a central module over the network. To quit, just kill the process
+    (ctrl+c).
+    '''
+
+    parser = argparse.ArgumentParser(description="MHI sensor module client.")
+    parser.add_argument("--host", required=True, help="Central module host.")
+    parser.add_argument("--port", type=int, default=TRANSPORT_PORT)
+    parser.add_argument("--sensor-ids", type=int, nargs="+", required=True, \
+        help="IDs of the sensors in ACTIVE_SENSORS to run here.")
+    args = parser.parse_args(argv)
+
+    commander = RemoteCommander(args.host, args.port)
+    scheduler = PollScheduler()
+    sensors = []
+    for sensor in ACTIVE_SENSORS:
+        if sensor['sensor_id'] not in args.sensor_ids:
+            continue
+        local_sensor = Sensor(commander, sensor['sensor_room'], \
+            sensor['sensor_name'], sensor['sensor_id'], sensor['temp_sensor_pin'], \
+            temp_sensor_only=sensor['sensor_id'] == SPACE_APPS_DEMO_VIRTUAL_SENSOR_ID)
+        commander.registerSensor(local_sensor)
+        local_sensor.startPolling()
+        scheduler.addJob(local_sensor.sensor_id, local_sensor.runTempCheck, \
+            local_sensor.pollInterval)
+        sensors.append(local_sensor)
+    scheduler.start()
+    compaction = CompactionJob()
+    compaction.start()
+
+    try:
+        while True:
+            time.sleep(1)
+
+    except (KeyboardInterrupt, SystemExit):
+        compaction.stop()
+        scheduler.stop()
+        commander.close()
+        for local_sensor in sensors:
+            local_sensor.teardown()
+
+
+if __name__ == '__main__':
+    main()
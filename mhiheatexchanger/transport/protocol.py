@@ -0,0 +1,282 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Wire format between sensor modules and the central module. Each TCP
+# connection carries frames: a 4-byte little-endian payload length, then a
+# payload made of one or more back-to-back messages (messages are batched).
+# Every message starts with a 1-byte type, followed by fixed-layout fields:
+#
+#   HELLO    sensor_id, temp_sensor_only, room, name  (strings are a 2-byte
+#            length followed by UTF-8)
+#   TEMP     sensor_id, temp_c, valve_open
+#   ALERT    sensor_id, signal, temp_c, valve_open, crossing_in (NaN if none)
+#   COMMAND  sensor_id, orders
+
+import math, socket, struct, threading, time
+
+from mhiheatexchanger.sensor.sensor import CENTRAL_CMD_MESSAGE_HOT, \
+    CENTRAL_CMD_MESSAGE_COLD, CENTRAL_CMD_MESSAGE_HAPPY
+
+TRANSPORT_HOST = "0.0.0.0"  # Interface the central module listens on
+TRANSPORT_PORT = 5017
+TRANSPORT_FLUSH_INTERVAL = 0.005  # Seconds messages wait to be batched into a frame
+TRANSPORT_BATCH_BYTES = 16384  # Frame payload size that's sent without waiting
+TRANSPORT_MAX_FRAME = 1 << 24  # Bytes; larger frames mean a corrupt stream
+
+MSG_HELLO = 1
+MSG_TEMP = 2
+MSG_ALERT = 3
+MSG_COMMAND = 4
+
+FRAME_HEADER = struct.Struct("<I")
+HELLO_FORMAT = struct.Struct("<BI?")
+STRING_HEADER = struct.Struct("<H")
+TEMP_FORMAT = struct.Struct("<BIf?")
+ALERT_FORMAT = struct.Struct("<BIBf?f")
+COMMAND_FORMAT = struct.Struct("<BIB")
+
+SIGNAL_CODES = {
+    CENTRAL_CMD_MESSAGE_HOT: 0,
+    CENTRAL_CMD_MESSAGE_COLD: 1,
+    CENTRAL_CMD_MESSAGE_HAPPY: 2,
+}
+SIGNALS = dict((code, signal) for signal, code in SIGNAL_CODES.items())
+
+COMMAND_CODES = {
+    'open_valve': 0,
+    'close_valve': 1,
+}
+COMMANDS = dict((code, orders) for orders, code in COMMAND_CODES.items())
+
+ERROR_BAD_MESSAGE = "Unknown message type {0} in frame."
+ERROR_BAD_FRAME = "Frame of {0} bytes exceeds TRANSPORT_MAX_FRAME."
+ERROR_CONNECTION_HANDLER = "ERROR: Transport message handler failed: {0!r}"
+ERROR_PROTOCOL = "ERROR: Bad frame from transport peer, closing connection: {0!r}"
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+def _encodeString(text):
+    data = text.encode("utf-8")
+
+    return STRING_HEADER.pack(len(data)) + data
+
+
+def _decodeString(payload, offset):
+    length, = STRING_HEADER.unpack_from(payload, offset)
+    offset += STRING_HEADER.size
+
+    return payload[offset:offset + length].decode("utf-8"), offset + length
+
+
+def encodeHello(sensor_id, temp_sensor_only, room, name):
+    return HELLO_FORMAT.pack(MSG_HELLO, sensor_id, temp_sensor_only) + \
+        _encodeString(room) + _encodeString(name)
+
+
+def encodeTemp(sensor_id, temp_c, valve_open):
+    return TEMP_FORMAT.pack(MSG_TEMP, sensor_id, temp_c, valve_open)
+
+
+def encodeAlert(sensor_id, signal, temp_c, valve_open, crossing_in=None):
+    return ALERT_FORMAT.pack(MSG_ALERT, sensor_id, SIGNAL_CODES[signal], \
+        temp_c, valve_open, float('nan') if crossing_in is None else crossing_in)
+
+
+def encodeCommand(sensor_id, orders):
+    return COMMAND_FORMAT.pack(MSG_COMMAND, sensor_id, COMMAND_CODES[orders])
+
+
+def decodeMessages(payload):
+    '''Yields the messages in a frame payload as tuples, starting with the
+    message type:
+
+        (MSG_HELLO, sensor_id, temp_sensor_only, room, name)
+        (MSG_TEMP, sensor_id, temp_c, valve_open)
+        (MSG_ALERT, sensor_id, signal, temp_c, valve_open, crossing_in)
+        (MSG_COMMAND, sensor_id, orders)
+    '''
+
+    offset = 0
+    while offset < len(payload):
+        message_type = bytearray(payload[offset:offset + 1])[0]
+
+        if message_type == MSG_TEMP:
+            message = TEMP_FORMAT.unpack_from(payload, offset)
+            offset += TEMP_FORMAT.size
+
+        elif message_type == MSG_ALERT:
+            message_type, sensor_id, signal, temp_c, valve_open, \
+                crossing_in = ALERT_FORMAT.unpack_from(payload, offset)
+            offset += ALERT_FORMAT.size
+            message = (message_type, sensor_id, SIGNALS[signal], temp_c, \
+                valve_open, None if math.isnan(crossing_in) else crossing_in)
+
+        elif message_type == MSG_COMMAND:
+            message_type, sensor_id, orders = \
+                COMMAND_FORMAT.unpack_from(payload, offset)
+            offset += COMMAND_FORMAT.size
+            message = (message_type, sensor_id, COMMANDS[orders])
+
+        elif message_type == MSG_HELLO:
+            message_type, sensor_id, temp_sensor_only = \
+                HELLO_FORMAT.unpack_from(payload, offset)
+            room, offset = _decodeString(payload, offset + HELLO_FORMAT.size)
+            name, offset = _decodeString(payload, offset)
+            message = (message_type, sensor_id, temp_sensor_only, room, name)
+
+        else:
+            raise ValueError(ERROR_BAD_MESSAGE.format(message_type))
+
+        yield message
+
+
+class FramedConnection(object):
+    '''A persistent TCP connection carrying batched messages.
+
+    send() only buffers the message; a writer thread sends everything
+    buffered as one frame, after waiting up to flush_interval for more
+    messages to join it (or right away once TRANSPORT_BATCH_BYTES are
+    buffered). A reader thread decodes incoming frames and calls
+    handler(connection, message) for each message, then on_close(connection)
+    once the connection is closed by either side.
+    '''
+
+    def __init__(self, sock, handler, on_close=None, \
+        flush_interval=TRANSPORT_FLUSH_INTERVAL):
+        '''Init method for the connection. Starts its reader and writer threads.
+
+        :param socket sock: Connected TCP socket.
+        :param handler: Called as handler(connection, message) per message.
+        :param on_close: Optional, called as on_close(connection) once closed.
+        :param float flush_interval: Max seconds a message waits for others
+            to be batched with it.
+
+        :return: FramedConnection object
+        '''
+
+        self.sock = sock
+        self.handler = handler
+        self.on_close = on_close
+        self.flush_interval = flush_interval
+        self.closed = False
+        self.frames_sent = 0
+        self.messages_sent = 0
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._buffered_bytes = 0
+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # We batch ourselves
+
+        for target, name in ((self._runReader, "reader"), (self._runWriter, "writer")):
+            thread = threading.Thread(target=target, \
+                name="mhi-transport-{0}".format(name))
+            thread.daemon = True
+            thread.start()
+
+    def send(self, message):
+        '''Queues an encoded message to be sent with the next frame.
+
+        :return: False if the connection is closed (the message is dropped).
+        '''
+
+        with self._cond:
+            if self.closed:
+                return False
+            self._buffer.append(message)
+            self._buffered_bytes += len(message)
+            self._cond.notify()
+
+        return True
+
+    def close(self):
+        '''Closes the connection (anything still buffered is dropped).'''
+
+        with self._cond:
+            if self.closed:
+                return False
+            self.closed = True
+            self._cond.notify_all()
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+
+        if self.on_close is not None:
+            self.on_close(self)
+
+        return True
+
+    def _runWriter(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+
+                # Give other messages a moment to join this frame (each
+                # send() wakes us up, so wait out the rest of the interval)
+                deadline = _now() + self.flush_interval
+                while self._buffered_bytes < TRANSPORT_BATCH_BYTES and \
+                    not self.closed:
+                    remaining = deadline - _now()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self.closed:
+                    return
+
+                messages, self._buffer = self._buffer, []
+                self._buffered_bytes = 0
+
+            payload = b"".join(messages)
+            try:
+                self.sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+            except (socket.error, OSError):
+                self.close()
+                return
+
+            self.frames_sent += 1
+            self.messages_sent += len(messages)
+
+    def _runReader(self):
+        try:
+            while True:
+                header = self._receive(FRAME_HEADER.size)
+                if header is None:
+                    break
+                length, = FRAME_HEADER.unpack(header)
+                if length > TRANSPORT_MAX_FRAME:
+                    raise ValueError(ERROR_BAD_FRAME.format(length))
+                payload = self._receive(length)
+                if payload is None:
+                    break
+
+                for message in decodeMessages(payload):
+                    try:
+                        self.handler(self, message)
+                    except Exception as e:
+                        print(ERROR_CONNECTION_HANDLER.format(e))
+        except (socket.error, OSError):
+            pass
+        except (KeyError, ValueError, struct.error) as e:  # Unknown codes, bad lengths
+            print(ERROR_PROTOCOL.format(e))
+
+        self.close()
+
+    def _receive(self, size):
+        '''Reads exactly size bytes, or returns None if the peer closed.'''
+
+        chunks = []
+        while size > 0:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        return b"".join(chunks)
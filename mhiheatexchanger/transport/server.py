@@ -0,0 +1,254 @@
+from __future__ import print_function
+
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Central module side of the network transport. Run the central module with:
+#
+#   python -m mhiheatexchanger.transport.server [--host HOST] [--port PORT]
+#
+# and each sensor module with mhiheatexchanger.transport.client.
+
+import argparse, os, socket, sys, threading, time
+sys.path.append(os.getcwd())  # Workaround for import errors for MHI module
+
+from mhiheatexchanger.command.commander import MissionControl, \
+    ALERT_QUEUE_CHECK_PULSE, NO_WORK_MSG
+from mhiheatexchanger.metrics.export import startExport
+from mhiheatexchanger.sensor.fleetstate import FleetStateView
+from mhiheatexchanger.transport.protocol import FramedConnection, \
+    encodeCommand, TRANSPORT_HOST, TRANSPORT_PORT, \
+    MSG_HELLO, MSG_TEMP, MSG_ALERT
+
+TRANSPORT_VALVE_ORDER_TIMEOUT = 5.0  # Max seconds a sent valve order stands in for the sensor's reported valve state
+
+SENSOR_CONNECTED_MSG = "Sensor {0} ({1}/{2}) connected from {3}."
+SENSOR_DISCONNECTED_MSG = "Sensor {0} disconnected."
+SERVER_LISTENING_MSG = "Listening for sensor modules on {0}:{1}..."
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class SensorProxy(FleetStateView):
+    '''Stands in for a remote Sensor inside MissionControl. Keeps the remote
+    sensor's latest reported state (in MissionControl's fleet state), and
+    turns valve orders into COMMAND messages.
+
+    A report sent before the sensor got a valve order still has the old
+    valve state. Until a report agrees with the order (or
+    TRANSPORT_VALVE_ORDER_TIMEOUT passes, if the sensor turns it down), the
+    proxy keeps the state it last ordered, so the same order isn't sent twice.
+    '''
+
+    __slots__ = ('connection', 'sensor_id', 'sensor_room', 'sensor_name', \
+        'temp_sensor_only', 'ordered_valve', 'ordered_at')
+
+    def __init__(self, connection, fleet_state, sensor_id, sensor_room, \
+        sensor_name, temp_sensor_only):
+        self.connection = connection
+        self.fleet_state = fleet_state
+        self.slot = fleet_state.addSensor(sensor_id)
+        self.sensor_id = sensor_id
+        self.sensor_room = sensor_room
+        self.sensor_name = sensor_name
+        self.temp_sensor_only = temp_sensor_only
+        self.ordered_valve = None  # Valve state last ordered, until the sensor reports it
+        self.ordered_at = None
+
+    def updateState(self, temp_c, valve_open):
+        '''Records the state reported by the remote sensor.'''
+
+        self.latest_temp_c = temp_c
+        ordered_valve = self.ordered_valve
+        if ordered_valve is not None:
+            if ordered_valve == valve_open or \
+                _now() - self.ordered_at > TRANSPORT_VALVE_ORDER_TIMEOUT:
+                self.ordered_valve = None
+            else:  # Sent before the order reached the sensor
+                valve_open = ordered_valve
+        self.valve_open = valve_open
+
+        return True
+
+    @staticmethod
+    def respondToMissionControl(self, orders):
+        '''Forwards a command from the central module to the remote sensor.'''
+
+        if orders == 'open_valve':
+            self.openValve()
+
+        elif orders == 'close_valve':
+            self.closeValve()
+
+        return True
+
+    def openValve(self):
+        if self.valve_open or self.temp_sensor_only:
+            return False
+
+        self.valve_open = True  # Commanded state, until the sensor reports back
+        self.ordered_valve, self.ordered_at = True, _now()
+
+        return self.connection.send(encodeCommand(self.sensor_id, 'open_valve'))
+
+    def closeValve(self):
+        if not self.valve_open or self.temp_sensor_only:
+            return False
+
+        self.valve_open = False
+        self.ordered_valve, self.ordered_at = False, _now()
+
+        return self.connection.send(encodeCommand(self.sensor_id, 'close_valve'))
+
+
+class ControllerServer(object):
+    '''Accepts connections from sensor modules and connects their sensors to
+    a MissionControl, as SensorProxy objects. Each sensor module keeps one
+    persistent connection, which can carry any number of sensors. Sensors
+    are disconnected from MissionControl when their connection drops.
+    '''
+
+    def __init__(self, commander, host=TRANSPORT_HOST, port=TRANSPORT_PORT):
+        '''Init method for the server.
+
+        :param MissionControl commander: Central module to connect sensors to.
+        :param str host: Interface to listen on.
+        :param int port: Port to listen on (0 picks a free port).
+
+        :return: ControllerServer object
+        '''
+
+        self.commander = commander
+        self.host = host
+        self.port = port
+        self.address = None  # (host, port) actually bound, once started
+        self._lock = threading.Lock()
+        self._connections = {}  # FramedConnection -> {sensor_id: SensorProxy}
+        self._listener = None
+        self._running = False
+
+    def start(self):
+        '''Starts listening for sensor modules.'''
+
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(16)
+        self.address = self._listener.getsockname()
+        self._running = True
+
+        thread = threading.Thread(target=self._runAcceptor, \
+            name="mhi-transport-acceptor")
+        thread.daemon = True
+        thread.start()
+
+        return self.address
+
+    def stop(self):
+        '''Stops listening and closes every sensor module connection.'''
+
+        self._running = False
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)  # Wakes up accept()
+        except (socket.error, OSError):
+            pass
+        self._listener.close()
+
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+
+        return True
+
+    def _runAcceptor(self):
+        while self._running:
+            try:
+                sock, address = self._listener.accept()
+            except (socket.error, OSError):
+                break
+            if not self._running:
+                sock.close()
+                break
+
+            with self._lock:
+                connection = FramedConnection(sock, self._handleMessage, \
+                    on_close=self._connectionClosed)
+                self._connections[connection] = {}
+
+    def _handleMessage(self, connection, message):
+        message_type, sensor_id = message[0], message[1]
+
+        if message_type == MSG_HELLO:
+            temp_sensor_only, room, name = message[2:]
+            proxy = SensorProxy(connection, self.commander.fleet_state, \
+                sensor_id, room, name, temp_sensor_only)
+            with self._lock:
+                self._connections.setdefault(connection, {})[sensor_id] = proxy
+            self.commander.connectSensor(proxy)
+            print(SENSOR_CONNECTED_MSG.format(sensor_id, room, name, \
+                connection.sock.getpeername()[0]))
+            return
+
+        with self._lock:
+            proxy = self._connections.get(connection, {}).get(sensor_id)
+        if proxy is None:  # Sensor never said hello
+            return
+
+        if message_type == MSG_TEMP:
+            temp_c, valve_open = message[2:]
+            proxy.updateState(temp_c, valve_open)
+            self.commander.receiveTempFromSensor(proxy)
+
+        elif message_type == MSG_ALERT:
+            signal, temp_c, valve_open, crossing_in = message[2:]
+            proxy.updateState(temp_c, valve_open)
+            self.commander.receiveTempFromSensor(proxy)
+            alert = {
+                'sensor': proxy,
+                'signal': signal
+            }
+            if crossing_in is not None:
+                alert['crossing_at'] = _now() + crossing_in
+            self.commander.receiveAlertFromSensor(self.commander, alert)
+
+    def _connectionClosed(self, connection):
+        with self._lock:
+            proxies = self._connections.pop(connection, {})
+
+        for sensor_id, proxy in proxies.items():
+            # Only if the sensor hasn't reconnected on a new connection already
+            if self.commander.sensors_by_id.get(sensor_id) is proxy:
+                self.commander.disconnectSensor(sensor_id)
+                print(SENSOR_DISCONNECTED_MSG.format(sensor_id))
+
+
+def main(argv=None):
+    '''Runs the central module, with sensor modules connecting over the
+    network. To quit, just kill the process (ctrl+c).
+    '''
+
+    parser = argparse.ArgumentParser(description="MHI central module server.")
+    parser.add_argument("--host", default=TRANSPORT_HOST)
+    parser.add_argument("--port", type=int, default=TRANSPORT_PORT)
+    args = parser.parse_args(argv)
+
+    houston = MissionControl(sensor_inventory=[], start_polling=False)
+    server = ControllerServer(houston, args.host, args.port)
+    print(SERVER_LISTENING_MSG.format(*server.start()))
+    exporters = startExport()
+
+    try:
+        while True:
+            work_to_do = houston.checkAlertQueue(timeout=ALERT_QUEUE_CHECK_PULSE)
+            if not work_to_do:
+                print(NO_WORK_MSG)
+
+    except (KeyboardInterrupt, SystemExit):
+        server.stop()
+        houston.shutdown()
+        for exporter in exporters:
+            exporter.stop()
+
+
+if __name__ == '__main__':
+    main()
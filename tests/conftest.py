@@ -0,0 +1,8 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+# Lets the tests import the MHI module from a plain `pytest` run in the
+# repo root (the same workaround the module's own entry points use).
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
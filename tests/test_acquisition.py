@@ -0,0 +1,135 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import pytest
+
+from mhiheatexchanger.drivers.hal import setBackend
+from mhiheatexchanger.sensor import sensor as sensor_module
+from mhiheatexchanger.sensor.acquisition import EwmaFilter, MedianFilter, \
+    MovingAverageFilter, TempAcquisition, makeFilters, TEMP_HYSTERESIS
+from mhiheatexchanger.sensor.fleetstate import FleetState
+from mhiheatexchanger.sensor.motion import MotionExecutor
+from mhiheatexchanger.sensor.sensor import Sensor, \
+    CENTRAL_CMD_MESSAGE_HAPPY, CENTRAL_CMD_MESSAGE_HOT, UTHRESHOLD
+
+
+def _run(temp_filter, values):
+    return [temp_filter.update(value) for value in values]
+
+
+def test_moving_average_filter():
+    temp_filter = MovingAverageFilter(3)
+    assert _run(temp_filter, [1.0, 2.0, 3.0, 4.0, 8.0]) == [1.0, 1.5, 2.0, 3.0, 5.0]
+
+    temp_filter.reset()
+    assert temp_filter.update(10.0) == 10.0
+
+
+def test_median_filter_drops_spikes():
+    temp_filter = MedianFilter(3)
+    assert _run(temp_filter, [20.0, 20.0, 90.0, 20.0, 21.0, 22.0]) == \
+        [20.0, 20.0, 20.0, 20.0, 21.0, 21.0]
+    assert _run(MedianFilter(4), [1.0, 4.0, 2.0, 3.0, 9.0]) == \
+        [1.0, 2.5, 2.0, 2.5, 3.5]
+
+
+def test_ewma_filter():
+    temp_filter = EwmaFilter(0.5)
+    assert _run(temp_filter, [10.0, 20.0, 20.0]) == [10.0, 15.0, 17.5]
+
+    temp_filter.reset()
+    assert temp_filter.update(4.0) == 4.0
+
+
+def test_unknown_filter():
+    with pytest.raises(ValueError):
+        makeFilters([('average', 3), ('kalman', 1)])
+
+
+class FakeTemp(object):
+    def __init__(self, values):
+        self.values = list(values)
+
+    def value(self):
+        return self.values.pop(0)
+
+
+def test_oversampled_reads_are_averaged_then_filtered():
+    acquisition = TempAcquisition(oversample=4, filter_specs=[('ewma', 0.5)])
+    temp = FakeTemp([20.0, 21.0, 22.0, 23.0, 30.0, 30.0, 30.0, 30.0])
+
+    assert acquisition.read(temp) == 21.5
+    assert acquisition.read(temp) == pytest.approx(25.75)
+    assert acquisition.latest_raw_c == 30.0
+    assert temp.values == []
+
+    assert TempAcquisition(oversample=0, filter_specs=[]).\
+        read(FakeTemp([5.0])) == 5.0
+
+
+def test_quantize_rounds_to_the_resolution():
+    acquisition = TempAcquisition()
+    assert acquisition.quantize(23.456) == 23.5
+    assert acquisition.quantize(-0.04) == 0.0
+    assert acquisition.quantize(None) is None
+    assert TempAcquisition(resolution=0.5).quantize(21.3) == 21.5
+
+
+class StubCommander(object):
+    def __init__(self):
+        self.signals = []
+
+    def receiveTempFromSensor(self, sensor):
+        return True
+
+    def receiveAlertFromSensor(self, commander, request):
+        self.signals.append(request['signal'])
+
+
+class RecordingLog(object):
+    def __init__(self):
+        self.rows = []
+
+    def write(self, timestamp, sensor_room, sensor_name, temp_c, temp_f):
+        self.rows.append((temp_c, temp_f))
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def sim_sensor(monkeypatch):
+    setBackend("sim")
+    monkeypatch.setattr(sensor_module, 'PREDICTIVE_ALERTS', False)
+    sensor = Sensor(StubCommander(), "lab", "s1", 1, 0, temp_sensor_only=True, \
+        motion_executor=MotionExecutor(worker_count=0), temp_log=RecordingLog(), \
+        acquisition=TempAcquisition(oversample=1, filter_specs=[]), \
+        fleet_state=FleetState())
+
+    def poll(temp_c):
+        sensor.temp.temp_c = temp_c
+        sensor.runTempCheck()
+        return sensor.threshold_passed
+
+    return sensor, poll
+
+
+def test_hysteresis_rearms_only_once_the_temp_is_back_inside(sim_sensor):
+    sensor, poll = sim_sensor
+    inside = UTHRESHOLD - TEMP_HYSTERESIS
+
+    assert poll(UTHRESHOLD + 0.2) == CENTRAL_CMD_MESSAGE_HOT
+    assert poll(inside + 0.1) == CENTRAL_CMD_MESSAGE_HOT  # Still hovering
+    assert poll(inside - 0.1) is None  # Cleared
+    assert poll(UTHRESHOLD - 0.1) is None  # Below the threshold itself
+    assert poll(UTHRESHOLD) == CENTRAL_CMD_MESSAGE_HOT  # Re-armed
+    # No helper opened the valve, but the alert is still withdrawn
+    assert sensor.commander.signals == [CENTRAL_CMD_MESSAGE_HOT] * 2 + \
+        [CENTRAL_CMD_MESSAGE_HAPPY, CENTRAL_CMD_MESSAGE_HOT]
+
+
+def test_readings_are_logged_to_the_sensor_resolution(sim_sensor):
+    sensor, poll = sim_sensor
+    poll(21.4567)
+
+    assert sensor.latest_temp_c == 21.4567
+    assert sensor.temp_log.rows == [(21.5, 70.6)]
@@ -0,0 +1,147 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading, time
+
+from mhiheatexchanger.command.alertqueue import AlertQueue
+from mhiheatexchanger.command.commander import MissionControl
+from mhiheatexchanger.sensor.fleetstate import FleetStateView
+from mhiheatexchanger.sensor.sensor import CENTRAL_CMD_MESSAGE_COLD, \
+    CENTRAL_CMD_MESSAGE_HAPPY, CENTRAL_CMD_MESSAGE_HOT
+
+
+def test_alerts_come_out_in_order():
+    alerts = AlertQueue()
+    for i in range(5):
+        assert alerts.put({'signal': i})
+    assert len(alerts) == 5
+    assert alerts.get()['signal'] == 0
+    assert [alert['signal'] for alert in alerts.drain()] == [1, 2, 3, 4]
+    assert len(alerts) == 0
+
+
+def test_get_times_out_on_an_empty_queue():
+    alerts = AlertQueue()
+    assert alerts.get() is None  # Default doesn't wait
+    started = time.time()
+    assert alerts.get(timeout=0.1) is None
+    assert time.time() - started >= 0.09
+    assert not alerts.waitForAlerts(timeout=0.05)
+
+
+def test_get_wakes_up_when_an_alert_arrives():
+    alerts = AlertQueue()
+    threading.Timer(0.05, alerts.put, [{'signal': 'hot'}]).start()
+    assert alerts.get(timeout=5) == {'signal': 'hot'}
+
+
+def test_put_on_a_full_queue_times_out():
+    alerts = AlertQueue(capacity=2)
+    assert alerts.put({'signal': 1}) and alerts.put({'signal': 2})
+    started = time.time()
+    assert not alerts.put({'signal': 3}, timeout=0.1)
+    assert time.time() - started >= 0.09
+    assert len(alerts) == 2
+
+
+def test_put_on_a_full_queue_waits_for_room():
+    alerts = AlertQueue(capacity=1)
+    alerts.put({'signal': 1})
+    threading.Timer(0.05, alerts.get).start()
+    assert alerts.put({'signal': 2}, timeout=5)
+    assert alerts.drain() == [{'signal': 2}]
+
+
+def test_drain_makes_room_for_waiting_producers():
+    alerts = AlertQueue(capacity=1)
+    alerts.put({'signal': 1})
+    threading.Timer(0.05, alerts.drain).start()
+    assert alerts.put({'signal': 2}, timeout=5)
+
+
+def test_unbounded_queue_never_blocks():
+    alerts = AlertQueue(capacity=None)
+    for i in range(5000):
+        assert alerts.put(i, timeout=0)
+    assert len(alerts) == 5000
+
+
+class StubSensor(FleetStateView):
+    '''Remote-style sensor kept in a MissionControl's fleet state, that
+    records the commands it's sent.
+    '''
+
+    def __init__(self, houston, sensor_id, temp_c):
+        self.fleet_state = houston.fleet_state
+        self.slot = houston.fleet_state.addSensor(sensor_id)
+        self.sensor_id = sensor_id
+        self.latest_temp_c = temp_c
+        self.orders = []
+        houston.connectSensor(self)
+
+    @staticmethod
+    def respondToMissionControl(self, orders):
+        self.orders.append(orders)
+        self.valve_open = orders == 'open_valve'
+        return True
+
+
+def _alert(houston, sensor, signal):
+    return MissionControl.receiveAlertFromSensor(houston, \
+        {'sensor': sensor, 'signal': signal})
+
+
+def test_repeat_alerts_from_a_sensor_are_coalesced():
+    houston = MissionControl(sensor_inventory=[], start_polling=False)
+    hot = StubSensor(houston, 1, 30.0)
+    cold = StubSensor(houston, 2, 15.0)
+    for signal in (CENTRAL_CMD_MESSAGE_HOT, CENTRAL_CMD_MESSAGE_HAPPY, \
+        CENTRAL_CMD_MESSAGE_HOT, CENTRAL_CMD_MESSAGE_HOT):
+        _alert(houston, hot, signal)
+
+    assert houston.checkAlertQueue()
+    assert houston.alert_stats['alerts'] == 4
+    assert houston.alert_stats['coalesced'] == 3
+    assert hot.orders == cold.orders == ['open_valve']  # Answered once
+
+    # Only the newest state counts: the sensor recovered before the pass
+    _alert(houston, cold, CENTRAL_CMD_MESSAGE_COLD)
+    _alert(houston, cold, CENTRAL_CMD_MESSAGE_HAPPY)
+    assert houston.checkAlertQueue()
+    assert cold.orders == ['open_valve']
+    assert 2 not in houston.open_alerts
+
+
+def test_a_long_queue_is_drained_in_one_pass():
+    houston = MissionControl(sensor_inventory=[], start_polling=False)
+    houston.alert_queue = AlertQueue(capacity=None)
+    sensors = [StubSensor(houston, sensor_id, 20.0 + sensor_id % 5) \
+        for sensor_id in range(50)]
+    count = 5000  # Far more than a recursive drain could handle
+    for i in range(count):
+        _alert(houston, sensors[i % len(sensors)], CENTRAL_CMD_MESSAGE_HAPPY)
+    houston.disconnectSensor(49)  # Its queued alerts are dropped
+
+    assert houston.processAlertQueue()
+    assert len(houston.alert_queue) == 0
+    assert houston.alert_stats['alerts'] == count
+    assert houston.alert_stats['coalesced'] == count - 49
+    assert not houston.processAlertQueue()  # Nothing left
+
+
+def test_withdrawn_alert_is_not_a_two_way_favor():
+    houston = MissionControl(sensor_inventory=[], start_polling=False)
+    warm = StubSensor(houston, 1, 24.5)
+    _alert(houston, warm, CENTRAL_CMD_MESSAGE_HOT)  # Nothing colder to help
+    assert houston.checkAlertQueue()
+    assert houston.open_alerts == {1: CENTRAL_CMD_MESSAGE_HOT}
+    assert warm.orders == []
+
+    warm.latest_temp_c = 23.0
+    _alert(houston, warm, CENTRAL_CMD_MESSAGE_HAPPY)  # Recovered on its own
+    cold = StubSensor(houston, 2, 15.0)
+    _alert(houston, cold, CENTRAL_CMD_MESSAGE_COLD)
+    assert houston.checkAlertQueue()
+
+    assert houston.favor_ledger.helpers(2) == [1]
+    assert houston.favor_ledger.helpers(1) == []  # Not still HOT
+    assert houston.open_alerts == {2: CENTRAL_CMD_MESSAGE_COLD}
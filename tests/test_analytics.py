@@ -0,0 +1,185 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mhiheatexchanger.history.analytics import aggregate, loadHistory, \
+    loadValveMoves, thresholdExcursions, valveDutyCycle, GROUP_SENSOR, \
+    MAX_READING_GAP
+from mhiheatexchanger.history.rollups import Compactor
+from mhiheatexchanger.history.segments import toEpoch
+from mhiheatexchanger.history.valvelog import VALVE_CLOSED, VALVE_OPENED
+from mhiheatexchanger.sensor.sensor import LTHRESHOLD, UTHRESHOLD
+from mhiheatexchanger.sensor.templog import TempLogWriter
+from mhiheatexchanger.sim.replay import ValveLog
+
+START = datetime(2017, 4, 29)
+DAYS = 4
+SENSORS = (("Room_A", "Sensor_1"), ("Room_A", "Sensor_2"), ("Room_B", "Sensor_1"))
+
+
+def _writeHistory(path, seed=4):
+    '''Writes readings for SENSORS over DAYS days, with some gaps longer
+    than MAX_READING_GAP. Returns them as (epoch secs, room, sensor, temp_c).
+    '''
+
+    rng = random.Random(seed)
+    writer = TempLogWriter(str(path), flush_interval=0)
+    readings = []
+    for sensor_room, sensor_name in SENSORS:
+        timestamp = START + timedelta(seconds=rng.randint(0, 59))
+        temp_c = 22.0
+        while timestamp < START + timedelta(days=DAYS):
+            temp_c = round(min(35.0, max(10.0, temp_c + rng.uniform(-1.5, 1.5))), 2)
+            writer.write(timestamp, sensor_room, sensor_name, temp_c, \
+                temp_c * 1.8 + 32)
+            readings.append((toEpoch(timestamp), sensor_room, sensor_name, temp_c))
+            timestamp += timedelta(seconds=rng.choice((5, 30, 60, 90, 300)))
+    writer.close()
+
+    return readings
+
+
+@pytest.fixture(scope="module")
+def recorded(tmpdir_factory):
+    path = tmpdir_factory.mktemp("analytics")
+    return str(path), _writeHistory(path)
+
+
+def _bruteAggregate(readings, period, key):
+    groups = {}
+    for secs, sensor_room, sensor_name, temp_c in readings:
+        group = key(sensor_room, sensor_name)
+        groups.setdefault((group, secs // period * period), []).append(temp_c)
+
+    summary = {}
+    for group, temps in groups.items():
+        mean = sum(temps) / len(temps)
+        summary[group] = (len(temps), mean, \
+            sum((t - mean) ** 2 for t in temps) / len(temps), min(temps), max(temps))
+
+    return summary
+
+
+def _summaryByGroup(summary):
+    return dict(((summary['group'][i], summary['period_start'][i]), \
+        (summary['count'][i], summary['mean'][i], summary['var'][i], \
+        summary['min'][i], summary['max'][i])) for i in range(len(summary['count'])))
+
+
+@pytest.mark.parametrize("period", [3600, 86400])
+def test_aggregate_by_room(recorded, period):
+    path, readings = recorded
+    expected = _bruteAggregate(readings, period, lambda room, sensor: room)
+    summary = _summaryByGroup(aggregate(loadHistory(path), period))
+
+    assert sorted(summary) == sorted(expected)
+    for group, (count, mean, var, low, high) in expected.items():
+        assert summary[group][0] == count
+        assert summary[group][1:3] == pytest.approx((mean, var))
+        assert summary[group][3:] == (low, high)
+
+
+def test_aggregate_by_sensor(recorded):
+    path, readings = recorded
+    expected = _bruteAggregate(readings, 86400, lambda room, sensor: (room, sensor))
+    summary = _summaryByGroup(aggregate(loadHistory(path), 86400, by=GROUP_SENSOR))
+
+    assert sorted(summary) == sorted(expected)
+    for group, (count, mean, var, low, high) in expected.items():
+        assert summary[group][0] == count
+        assert summary[group][1] == pytest.approx(mean)
+
+
+def _bruteExcursions(readings, threshold, above):
+    seconds, covered, excursions = {}, {}, []
+    by_sensor = {}
+    for secs, sensor_room, sensor_name, temp_c in readings:
+        by_sensor.setdefault((sensor_room, sensor_name), []).append((secs, temp_c))
+
+    for key, rows in by_sensor.items():
+        rows.sort()
+        seconds[key] = covered[key] = 0.0
+        in_excursion = False
+        for i, (secs, temp_c) in enumerate(rows):
+            hold = min(rows[i + 1][0] - secs, MAX_READING_GAP) \
+                if i + 1 < len(rows) else 0.0
+            past = temp_c >= threshold if above else temp_c < threshold
+            covered[key] += hold
+            if past:
+                seconds[key] += hold
+                gap = secs - rows[i - 1][0] if i else None
+                if not in_excursion or gap > MAX_READING_GAP:
+                    excursions.append([key, secs, None])
+                excursions[-1][2] = secs + hold
+            in_excursion = past
+
+    return seconds, covered, excursions
+
+
+@pytest.mark.parametrize("threshold,above", [(UTHRESHOLD, True), (LTHRESHOLD, False)])
+def test_threshold_excursions(recorded, threshold, above):
+    path, readings = recorded
+    seconds, covered, excursions = _bruteExcursions(readings, threshold, above)
+    result = thresholdExcursions(loadHistory(path), threshold, above)
+
+    assert excursions
+    for i, key in enumerate(result['sensors']):
+        assert result['seconds'][i] == pytest.approx(seconds[key])
+        assert result['fraction'][i] == pytest.approx(seconds[key] / covered[key])
+        assert result['count'][i] == len([e for e in excursions if e[0] == key])
+
+    found = sorted((result['sensors'][sensor], start, end) for sensor, start, end \
+        in zip(result['excursion_sensor'], result['excursion_start'], \
+        result['excursion_end']))
+    assert found == sorted(tuple(excursion) for excursion in excursions)
+
+
+def test_compacted_days_are_loaded_from_rollups(tmp_path):
+    readings = _writeHistory(tmp_path, seed=6)
+    now = START + timedelta(days=DAYS - 1, hours=12)
+    # Day 3 stays raw, 1-2 are kept to the minute, 0 to the hour
+    assert Compactor(str(tmp_path), raw_days=1, minute_days=2, hour_days=None).\
+        compact(now=now) == (3 * len(SENSORS), len(SENSORS))
+
+    history = loadHistory(str(tmp_path))
+    assert sorted(history.sensors) == sorted(SENSORS)
+    assert history.weight.sum() == len(readings)
+
+    expected = _bruteAggregate(readings, 86400, lambda room, sensor: room)
+    summary = _summaryByGroup(aggregate(history, 86400))
+    assert sorted(summary) == sorted(expected)
+    for group, (count, mean, var, low, high) in expected.items():
+        assert summary[group][0] == count
+        assert summary[group][1] == pytest.approx(mean)
+        assert summary[group][3:] == (low, high)
+
+    # Loading part of the range only picks up the rollups inside it
+    part = loadHistory(str(tmp_path), START + timedelta(days=1, hours=6), \
+        START + timedelta(days=2, hours=6))
+    assert part.timestamp.min() >= toEpoch(START + timedelta(days=1, hours=6))
+    assert part.timestamp.max() < toEpoch(START + timedelta(days=2, hours=6))
+    assert part.weight.sum() == len([secs for secs, room, sensor, temp_c in \
+        readings if toEpoch(START + timedelta(days=1, hours=6)) <= secs < \
+        toEpoch(START + timedelta(days=2, hours=6))])
+
+
+def test_valve_moves_round_trip(tmp_path):
+    valve_log = ValveLog()
+    valve_log.moves = [
+        (START, "Room_A", "Sensor_1", VALVE_OPENED),
+        (START + timedelta(hours=1), "Room_A", "Sensor_1", VALVE_CLOSED),
+        (START + timedelta(hours=2), "Room_B", "Sensor_1", VALVE_OPENED),
+    ]
+    path = str(tmp_path / "moves.csv")
+    with open(path, "w") as output:
+        valve_log.write(output)
+
+    sensors, duty = valveDutyCycle(loadValveMoves(path), START, \
+        START + timedelta(hours=4))
+    assert dict(zip(sensors, duty)) == {("Room_A", "Sensor_1"): 0.25, \
+        ("Room_B", "Sensor_1"): 0.5}
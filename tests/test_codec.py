@@ -0,0 +1,195 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import glob, os, random
+from datetime import datetime, timedelta
+
+import pytest
+
+from mhiheatexchanger.history.codec import CodecWriter, SeriesDecoder, \
+    SeriesEncoder, compressCsvFile, dailyLogFiles, iterCompressedFile, \
+    CODEC_FILE_PATTERN
+from mhiheatexchanger.history.query import TempHistory
+from mhiheatexchanger.history.rollups import Compactor
+from mhiheatexchanger.history.segments import toEpoch
+from mhiheatexchanger.sensor.templog import TempLogWriter
+from mhiheatexchanger.sim.replay import replay
+
+START = datetime(2017, 4, 28)
+DAYS = 3
+
+
+def _readings(seed, start=START, days=DAYS, sensors=(("lab", "s1"),)):
+    '''Returns (datetime, room, sensor, temp_c) readings every 1-200 s,
+    sorted by time.
+    '''
+
+    rng = random.Random(seed)
+    readings = []
+    for sensor_room, sensor_name in sensors:
+        timestamp = start + timedelta(seconds=rng.randint(0, 59))
+        while timestamp < start + timedelta(days=days):
+            temp_c = round(rng.uniform(-20.0, 45.0), 2)
+            readings.append((timestamp, sensor_room, sensor_name, temp_c))
+            timestamp += timedelta(seconds=rng.choice((1, 2, 30, 60, 61, 200)))
+
+    return sorted(readings)
+
+
+def _write(writer, readings):
+    for timestamp, sensor_room, sensor_name, temp_c in readings:
+        writer.write(timestamp, sensor_room, sensor_name, temp_c, \
+            temp_c * 1.8 + 32)
+    writer.close()
+
+
+def test_series_round_trip():
+    rng = random.Random(5)
+    secs = toEpoch(START)
+    rows = []
+    for i in range(2000):
+        secs += rng.choice((0, 1, 15, 60, 3600, 100000))
+        rows.append((secs, round(rng.uniform(-150.0, 150.0), 2)))
+
+    encoder = SeriesEncoder()
+    for row in rows:
+        encoder.encode(*row)
+    data = bytes(encoder.bits.data) + encoder.bits.tail()
+
+    assert list(SeriesDecoder(data)) == rows
+
+
+def test_writer_resumes_a_closed_file(tmp_path):
+    readings = _readings(7, days=1)
+    half = len(readings) // 2
+    _write(CodecWriter(str(tmp_path), flush_rows=100), readings[:half])
+    _write(CodecWriter(str(tmp_path), flush_rows=100), readings[half:])
+
+    paths = glob.glob(os.path.join(str(tmp_path), CODEC_FILE_PATTERN))
+    assert len(paths) == 1
+    assert list(iterCompressedFile(paths[0])) == readings
+
+
+def test_writer_drops_a_torn_write_and_resumes(tmp_path):
+    readings = _readings(8, days=1)
+    half = len(readings) // 2
+    _write(CodecWriter(str(tmp_path)), readings[:half])
+    path = glob.glob(os.path.join(str(tmp_path), CODEC_FILE_PATTERN))[0]
+    with open(path, "r+b") as f:  # Cut the last reading short
+        f.truncate(os.path.getsize(path) - 3)
+
+    kept = list(iterCompressedFile(path))
+    assert 0 < len(kept) < half
+    assert kept == readings[:len(kept)]
+
+    _write(CodecWriter(str(tmp_path)), readings[half:])
+    assert list(iterCompressedFile(path)) == kept + readings[half:]
+
+
+@pytest.fixture(scope="module")
+def compressed(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp("compressed"))
+    readings = _readings(9)
+    _write(CodecWriter(path), readings)
+
+    return path, [(timestamp, temp_c) for timestamp, room, sensor, temp_c \
+        in readings]
+
+
+RANGES = [
+    (START, START + timedelta(days=DAYS)),  # Everything
+    (START + timedelta(hours=5, seconds=17), START + timedelta(hours=6)),
+    (START + timedelta(hours=23), START + timedelta(days=1, hours=1)),
+    (START + timedelta(days=DAYS + 1), START + timedelta(days=DAYS + 2)),
+]
+
+
+@pytest.mark.parametrize("start,end", RANGES)
+def test_queries_over_compressed_logs(compressed, start, end):
+    path, readings = compressed
+    history = TempHistory(path, block_rows=16)
+    expected = [reading for reading in readings if start <= reading[0] <= end]
+
+    assert history.readings("lab", "s1", start, end) == expected
+
+    summary = history.summary("lab", "s1", start, end)
+    if not expected:
+        assert summary is None
+        return
+    temps = [temp_c for timestamp, temp_c in expected]
+    assert summary['count'] == len(temps)
+    assert summary['min'] == min(temps)
+    assert summary['max'] == max(temps)
+    assert summary['mean'] == pytest.approx(sum(temps) / len(temps))
+
+
+def test_latest_over_compressed_logs(compressed):
+    path, readings = compressed
+    history = TempHistory(path, block_rows=16)
+
+    assert history.latest("lab", "s1", 40) == readings[-40:]
+
+
+def test_query_picks_up_rows_appended_to_a_compressed_log(tmp_path):
+    readings = _readings(10, days=1)
+    half = len(readings) // 2
+    _write(CodecWriter(str(tmp_path)), readings[:half])
+    history = TempHistory(str(tmp_path), block_rows=16)
+    end = START + timedelta(days=1)
+    assert history.summary("lab", "s1", START, end)['count'] == half
+
+    _write(CodecWriter(str(tmp_path)), readings[half:])
+    assert history.summary("lab", "s1", START, end)['count'] == len(readings)
+
+
+def test_csv_is_preferred_over_compressed_copy(tmp_path):
+    readings = _readings(11, days=1)
+    _write(TempLogWriter(str(tmp_path), flush_interval=0), readings)
+    csv_path = dailyLogFiles(str(tmp_path))[0]
+    compressCsvFile(csv_path, str(tmp_path))
+    _write(TempLogWriter(str(tmp_path), flush_interval=0), \
+        [(START + timedelta(hours=23, minutes=59, seconds=59), "lab", "s1", 99.0)])
+
+    assert dailyLogFiles(str(tmp_path)) == [csv_path]
+    history = TempHistory(str(tmp_path))
+    assert history.latest("lab", "s1")[0][1] == 99.0
+
+
+def test_compaction_of_compressed_logs(tmp_path):
+    readings = _readings(12)
+    _write(CodecWriter(str(tmp_path)), readings)
+    now = START + timedelta(days=DAYS - 1, hours=12)
+
+    assert Compactor(str(tmp_path), raw_days=1, minute_days=None, \
+        hour_days=None).compact(now=now) == (DAYS - 1, 0)
+    assert len(dailyLogFiles(str(tmp_path))) == 1
+
+    end = START + timedelta(days=DAYS)
+    temps = [temp_c for timestamp, room, sensor, temp_c in readings]
+    summary = TempHistory(str(tmp_path)).summary("lab", "s1", START, end)
+    assert summary['count'] == len(temps)
+    assert summary['min'] == min(temps)
+    assert summary['max'] == max(temps)
+    assert summary['mean'] == pytest.approx(sum(temps) / len(temps))
+
+
+def test_replay_of_compressed_logs(tmp_path):
+    readings = _readings(13, start=datetime(2017, 4, 29, 23), days=0.1, \
+        sensors=(("Room_A", "Sensor_1"), ("Room_B", "Sensor_1")))
+    csv_dir, tsz_dir = str(tmp_path / "csv"), str(tmp_path / "tsz")
+    _write(TempLogWriter(csv_dir, flush_interval=0), readings)
+    _write(CodecWriter(tsz_dir), readings)
+
+    csv_log, csv_results = replay(csv_dir)
+    tsz_log, tsz_results = replay(tsz_dir)
+
+    assert tsz_results['sensors'] == 2
+    assert tsz_results['readings'] == len(readings)
+    assert csv_log.moves and tsz_log.moves == csv_log.moves
+
+
+def test_empty_log_is_skipped(tmp_path):
+    csv_path = tmp_path / "2017-28-04_Room_A_Sensor_1_sensorTemps.csv"
+    csv_path.write_text(u"Date-UTC,Time-UTC,Room,Sensor,TempC,TempF\n")
+
+    assert compressCsvFile(str(csv_path), str(tmp_path)) == (None, 0)
+    assert glob.glob(os.path.join(str(tmp_path), CODEC_FILE_PATTERN)) == []
@@ -0,0 +1,53 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+from mhiheatexchanger.sensor.display import LcdDisplay
+
+
+class FakeLcd(object):
+    '''Records the calls made to a Jhd1313m1.'''
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name,) + args)
+
+
+def test_only_changed_characters_are_written():
+    lcd = FakeLcd()
+    display = LcdDisplay(lcd, refresh_interval=0)
+    display.start("Current temp:", (0, 255, 0))
+    del lcd.calls[:]
+
+    display.setLine(1, "21.5 C / 70.7 F")
+    display.refresh()
+    display.setLine(1, "21.6 C / 70.9 F")
+    display.refresh()
+    assert lcd.calls[-4:] == [('setCursor', 1, 3), ('write', '6'), \
+        ('setCursor', 1, 12), ('write', '9')]
+
+    del lcd.calls[:]
+    display.setColor(0, 255, 0)
+    display.refresh()
+    assert lcd.calls == []
+
+
+def test_refreshes_are_rate_limited():
+    lcd = FakeLcd()
+    display = LcdDisplay(lcd, refresh_interval=60)
+    display.start("Current temp:", (0, 255, 0))
+    display.setLine(1, "21.5 C")
+    assert not display.refresh()
+    assert display.refresh(force=True)
+
+
+def test_color_is_resent_after_a_stop():
+    lcd = FakeLcd()
+    display = LcdDisplay(lcd, refresh_interval=0)
+    display.start("Current temp:", (255, 0, 0))
+    display.stop()
+    del lcd.calls[:]
+
+    display.setColor(255, 0, 0)
+    display.refresh()
+    assert ('setColor', 255, 0, 0) in lcd.calls
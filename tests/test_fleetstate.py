@@ -0,0 +1,93 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from mhiheatexchanger.sensor.fleetstate import FleetState, FleetStateView
+
+
+class View(FleetStateView):
+    __slots__ = ()
+
+    def __init__(self, fleet_state, sensor_id):
+        self.fleet_state = fleet_state
+        self.slot = fleet_state.addSensor(sensor_id)
+
+
+def test_removed_slots_are_cleared_and_reused():
+    state = FleetState(capacity=4)
+    first = View(state, 1)
+    first.latest_temp_c, first.valve_open, first.has_passed_threshold = \
+        30.0, True, True
+    View(state, 2)
+    assert state.addSensor(1) == first.slot  # Already has one
+
+    assert state.removeSensor(1)
+    assert not state.removeSensor(1)
+    assert state.slot(1) is None
+
+    reused = View(state, 3)
+    assert reused.slot == first.slot
+    assert reused.latest_temp_c is None
+    assert not reused.valve_open and not reused.has_passed_threshold
+    assert len(state) == 2
+
+
+def test_columns_grow_past_the_capacity():
+    state = FleetState(capacity=2)
+    views = [View(state, sensor_id) for sensor_id in range(100, 110)]
+    for i, view in enumerate(views):
+        view.latest_temp_c = float(i)
+
+    assert state.capacity >= 10
+    assert len(set(view.slot for view in views)) == 10
+    assert [view.latest_temp_c for view in views] == [float(i) for i in range(10)]
+    assert sorted(state.snapshot()[0].tolist()) == list(range(100, 110))
+
+
+def _setTemp(state, sensor_id, temp_c):
+    state.temp_c[state.slot(sensor_id)] = temp_c
+
+
+def test_shared_state_has_a_fixed_capacity():
+    state = FleetState(capacity=2, shared=True)
+    view = View(state, 1)
+    view.latest_temp_c = 21.5
+    View(state, 2)
+    with pytest.raises(MemoryError):
+        state.addSensor(3)
+
+    # Written by a worker process, read back here
+    worker = multiprocessing.Process(target=_setTemp, args=(state, 1, 30.0))
+    worker.start()
+    worker.join(10)
+    assert worker.exitcode == 0
+    assert view.latest_temp_c == 30.0
+    assert state.sensorsAbove(25.0) == [1]
+
+    state.removeSensor(2)
+    assert state.addSensor(3) is not None
+
+
+def test_fleet_queries():
+    state = FleetState(capacity=8)
+    temps = {1: 25.0, 2: 19.0, 3: None, 4: 24.0, 5: 22.0}
+    for sensor_id, temp_c in temps.items():
+        view = View(state, sensor_id)
+        view.latest_temp_c = temp_c
+        view.valve_open = sensor_id in (2, 5)
+    state.removeSensor(5)
+
+    sensor_ids, snapshot_temps, valve_open = state.snapshot()
+    assert sorted(sensor_ids.tolist()) == [1, 2, 3, 4]
+    by_id = dict(zip(sensor_ids.tolist(), snapshot_temps.tolist()))
+    assert by_id[3] != by_id[3]  # NaN until polled
+    assert by_id[1] == 25.0
+
+    assert sorted(state.sensorsAbove(24.0)) == [1, 4]
+    assert state.sensorsBelow(20.0) == [2]  # Unpolled sensors are neither
+    assert state.openValves() == [2]
+    assert valve_open.dtype == bool
@@ -0,0 +1,63 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import os, subprocess, sys
+
+import pytest
+
+from mhiheatexchanger.drivers import hal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code, backend="upm"):
+    '''Runs code in a fresh interpreter, so nothing is imported yet.'''
+
+    env = dict(os.environ, MHI_DRIVER_BACKEND=backend)
+    return subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, \
+        env=env, stderr=subprocess.STDOUT).decode().split()
+
+
+def test_upm_backend_is_only_imported_on_first_use():
+    output = _run(
+        "import sys\n"
+        "import mhiheatexchanger.sensor.sensor, mhiheatexchanger.command.commander\n"
+        "print('mhiheatexchanger.drivers.upmdrivers' in sys.modules)\n"
+        "print('upm' in sys.modules)\n")
+
+    assert output == ["False", "False"]
+
+
+def test_sim_backend_works_without_upm():
+    output = _run(
+        "import sys\n"
+        "from mhiheatexchanger.drivers.hal import getBackend, setBackend\n"
+        "backend = setBackend('sim')\n"
+        "print(getBackend() is backend)\n"
+        "print(backend.GroveTemp(0).value())\n"
+        "print('upm' in sys.modules)\n")
+
+    assert output == ["True", "22.0", "False"]
+
+    # The environment variable picks the backend too
+    assert _run("from mhiheatexchanger.drivers.hal import getBackend\n"
+        "print(getBackend().__name__)\n", backend="sim") == \
+        ["mhiheatexchanger.drivers.simdrivers"]
+
+
+def test_upm_backend_fails_on_use_without_upm(monkeypatch):
+    monkeypatch.setattr(hal, '_backend', None)
+    monkeypatch.setattr(hal, 'DRIVER_BACKEND', "upm")
+    try:
+        import upm  # noqa: F401
+        pytest.skip("upm is installed")
+    except ImportError:
+        pass
+
+    with pytest.raises(ImportError):
+        hal.getBackend()
+    assert hal._backend is None  # Tried again on the next use
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        hal.setBackend("gpio")
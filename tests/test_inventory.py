@@ -0,0 +1,62 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import signal, threading
+
+from mhiheatexchanger.command.commander import MissionControl
+from mhiheatexchanger.command.inventory import diffInventory
+from mhiheatexchanger.drivers.hal import setBackend
+
+
+def _sensor(sensor_id, room, pin):
+    return {'sensor_id': sensor_id, 'sensor_room': room, \
+        'sensor_name': "Sensor_1", 'temp_sensor_pin': pin}
+
+
+def test_diff_inventory():
+    current = {1: _sensor(1, "A", 0), 2: _sensor(2, "B", 1), 3: _sensor(3, "C", 2)}
+    added, removed, changed = diffInventory(current, \
+        [_sensor(1, "A", 0), _sensor(2, "B", 5), _sensor(4, "D", 3)])
+
+    assert [sensor['sensor_id'] for sensor in added] == [4]
+    assert removed == [3]
+    assert [sensor['sensor_id'] for sensor in changed] == [2]
+
+
+def test_inventory_changes_apply_from_another_thread(monkeypatch):
+    drivers = setBackend("sim")
+    GroveTemp = drivers.GroveTemp
+
+    def flakyGroveTemp(pin):
+        if pin == 7:
+            raise IOError("No temp sensor on pin 7")
+        return GroveTemp(pin)
+
+    sigint_handler = signal.getsignal(signal.SIGINT)
+    houston = MissionControl([_sensor(10, "A", 0), _sensor(11, "B", 1)], \
+        start_polling=False)
+    try:
+        monkeypatch.setattr(drivers, 'GroveTemp', flakyGroveTemp)
+        errors = []
+
+        def apply():
+            try:
+                houston.applyInventory([_sensor(10, "A", 2), \
+                    _sensor(12, "C", 3), _sensor(13, "D", 7)])
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=apply)
+        thread.start()
+        thread.join()
+
+        assert errors == []
+        assert sorted(houston.inventory) == [10, 12]
+        assert houston.inventory[10]['temp_sensor_pin'] == 2  # Set up again
+        assert houston.sensors_by_id[10].temp_sensor_pin == 2
+        # Sensor 13 never came up, so it didn't keep a slot
+        assert sorted(houston.fleet_state.slots) == [10, 12]
+    finally:
+        houston.shutdown()
+
+    # Once the last sensor is torn down, the SIGINT handler is put back
+    assert signal.getsignal(signal.SIGINT) == sigint_handler
@@ -0,0 +1,102 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+from mhiheatexchanger.command.commander import MissionControl
+from mhiheatexchanger.command.ledger import FavorLedger
+from mhiheatexchanger.sensor.sensor import CENTRAL_CMD_MESSAGE_COLD, \
+    CENTRAL_CMD_MESSAGE_HOT
+
+
+def test_valve_ref_counts_follow_favors():
+    ledger = FavorLedger()
+    assert ledger.recordFavor(1, 10)
+    assert not ledger.recordFavor(1, 10)  # Already recorded
+    assert ledger.recordFavor(2, 10)
+    assert ledger.recordFavor(2, 11)
+
+    assert 1 in ledger and 10 not in ledger
+    assert ledger[2] == [10, 11]
+    assert ledger.serving(10) == [1, 2]
+    assert ledger.valveRefCount(10) == 2
+    assert ledger.valveRefCount(2) == 1  # Being helped holds its own valve
+
+    assert ledger.release(1) == ([10], [])  # Still serving sensor 2
+    assert ledger.valveRefCount(10) == 1
+    assert ledger.release(2) == ([10, 11], [10, 11])
+    assert ledger.valveRefCount(10) == 0 and len(ledger) == 0
+    assert ledger.release(2) == ([], [])
+
+
+def test_helpers_being_helped_themselves_are_not_freed():
+    ledger = FavorLedger()
+    ledger.recordFavor(1, 2)  # HOT/COLD pair, both ways
+    ledger.recordFavor(2, 1)
+
+    assert ledger.release(1) == ([2], [])  # 2 still needs 1's help
+    assert ledger.valveRefCount(1) == 1
+    assert ledger.release(2) == ([1], [1])
+
+
+def test_remove_sensor_drops_favors_both_ways():
+    ledger = FavorLedger()
+    ledger.recordFavor(1, 10)
+    ledger.recordFavor(2, 10)
+    ledger.recordFavor(10, 3)  # The helper is being helped as well
+    ledger.recordFavor(4, 3)
+
+    assert ledger.removeSensor(10) == []  # 3 is still serving sensor 4
+    assert ledger.helpers(1) == [] and ledger.helpers(2) == []
+    assert 1 not in ledger and 10 not in ledger
+    assert ledger.serving(3) == [4]
+    assert ledger.valveRefCount(10) == 0
+    assert ledger.removeSensor(4) == [3]
+
+
+class StubValve(object):
+    def __init__(self, sensor_id, valve_open=True):
+        self.sensor_id = sensor_id
+        self.valve_open = valve_open
+
+
+class StubMissionControl(object):
+    '''Just what MissionControl uses to settle favors.'''
+
+    def __init__(self, sensors):
+        self.favor_ledger = FavorLedger()
+        self.sensors_by_id = dict((sensor.sensor_id, sensor) for sensor in sensors)
+        self.open_alerts = {}
+        self.commands = []
+
+    def sendCommandToSensor(self, sensor, command):
+        self.commands.append((sensor.sensor_id, command))
+        return True
+
+
+def test_happy_sensor_keeps_its_valve_open_while_serving():
+    hot, cold, other = StubValve(1), StubValve(2), StubValve(3)
+    houston = StubMissionControl([hot, cold, other])
+    MissionControl.recordFavor(houston, hot, cold)  # Only hot alerted
+    MissionControl.recordFavor(houston, other, hot)  # Hot also helps sensor 3
+
+    MissionControl.closeAssistingSensorValves(houston, hot)
+    assert houston.commands == [(2, 'close_valve')]  # Hot still serves 3
+
+    MissionControl.closeAssistingSensorValves(houston, other)
+    assert houston.commands[1:] == [(1, 'close_valve'), (3, 'close_valve')]
+
+
+def test_hot_cold_pairs_record_the_favor_both_ways():
+    hot, cold = StubValve(1), StubValve(2)
+    houston = StubMissionControl([hot, cold])
+    houston.open_alerts = {1: CENTRAL_CMD_MESSAGE_HOT, 2: CENTRAL_CMD_MESSAGE_COLD}
+    MissionControl.recordFavor(houston, hot, cold)
+
+    assert houston.favor_ledger.helpers(1) == [2]
+    assert houston.favor_ledger.helpers(2) == [1]
+
+    del houston.open_alerts[1]
+    MissionControl.closeAssistingSensorValves(houston, hot)
+    assert houston.commands == []  # Cold still needs hot's valve, and its own
+
+    del houston.open_alerts[2]
+    MissionControl.closeAssistingSensorValves(houston, cold)
+    assert sorted(houston.commands) == [(1, 'close_valve'), (2, 'close_valve')]
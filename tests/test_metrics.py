@@ -0,0 +1,56 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+from mhiheatexchanger.command import sharding
+from mhiheatexchanger.metrics import registry
+from mhiheatexchanger.metrics.registry import MetricsRegistry
+from mhiheatexchanger.sensor.fleetstate import FleetState
+
+
+def test_histogram_since_records_the_elapsed_time(monkeypatch):
+    metrics = MetricsRegistry(enabled=True)
+    histogram = metrics.histogram('poll_seconds')
+    monkeypatch.setattr(registry, '_now', lambda: 10.003)
+    histogram.since(10.0)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 1
+    assert abs(snapshot['sum'] - 0.003) < 1e-9
+    assert [bound for bound, count in snapshot['buckets'] if count == 1][0] == 0.005
+
+
+def test_remote_snapshots_are_merged():
+    worker = MetricsRegistry(enabled=True)
+    worker.counter('valve.opens').inc(3)
+    worker.histogram('sensor.poll_seconds').observe(0.002)
+    worker.gauge('worker.only').set(7)
+
+    metrics = MetricsRegistry(enabled=True)
+    metrics.counter('valve.opens').inc()
+    metrics.histogram('sensor.poll_seconds').observe(0.2)
+    metrics.mergeRemote(0, worker.snapshot())
+    metrics.mergeRemote(1, worker.snapshot())
+    worker.counter('valve.opens').inc()
+    metrics.mergeRemote(1, worker.snapshot())  # Replaces shard 1's snapshot
+
+    values = metrics.snapshot()['metrics']
+    assert values['valve.opens'] == 1 + 3 + 4
+    assert values['worker.only'] == 14
+    poll = values['sensor.poll_seconds']
+    assert poll['count'] == 3 and abs(poll['sum'] - 0.204) < 1e-9
+    assert poll['buckets'][-1] == ['+Inf', 3]
+    assert dict((bound, count) for bound, count in poll['buckets'])[0.0025] == 2
+
+
+def test_shard_worker_sends_its_metrics_on_the_way_out():
+    alert_queue, command_queue = queue.Queue(), queue.Queue()
+    command_queue.put(None)
+    sharding._runShard(2, [], FleetState(), alert_queue, command_queue, None)
+
+    message = alert_queue.get_nowait()
+    assert message[:2] == (sharding.SHARD_METRICS_MESSAGE, 2)
+    assert 'metrics' in message[2]
@@ -0,0 +1,149 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading
+
+import pytest
+
+from mhiheatexchanger.sensor.motion import MotionExecutor
+
+CW, CCW = 0, 1
+TIMEOUT = 5.0
+
+
+class FakeStepper(object):
+    '''Records its moves into a shared log. While gate is set to an
+    unset Event, each move waits on it.
+    '''
+
+    def __init__(self, name, log, gate=None, fail=False):
+        self.name = name
+        self.log = log
+        self.gate = gate
+        self.fail = fail
+        self.started = threading.Event()
+        self._direction = None
+
+    def setDirection(self, direction):
+        self._direction = direction
+
+    def stepperSteps(self, steps):
+        self.started.set()
+        if self.gate is not None:
+            assert self.gate.wait(TIMEOUT)
+        if self.fail:
+            raise IOError("Stepper jammed")
+        self.log.append((self.name, self._direction, steps))
+
+
+def test_synchronous_moves_run_inside_submit():
+    log = []
+    executor = MotionExecutor(worker_count=0)
+    stepper = FakeStepper("a", log)
+
+    future = executor.submit("a", stepper, CW, 100)
+    assert future.done() and future.result() is True
+    assert log == [("a", CW, 100)]
+
+    called = []
+    future.addDoneCallback(called.append)  # Already done: runs right away
+    assert called == [future]
+
+
+def test_failed_move_raises_from_result(capsys):
+    executor = MotionExecutor(worker_count=0)
+    future = executor.submit("a", FakeStepper("a", [], fail=True), CW, 100)
+
+    with pytest.raises(IOError):
+        future.result()
+    assert "Stepper jammed" in capsys.readouterr().out
+
+
+def test_moves_run_in_order_per_motor_and_in_parallel_across_motors():
+    log = []
+    gate = threading.Event()
+    executor = MotionExecutor(worker_count=2)
+    try:
+        slow = FakeStepper("a", log, gate)
+        futures = [executor.submit("a", slow, CW, 10)]
+        assert slow.started.wait(TIMEOUT)
+        futures += [executor.submit("a", slow, CCW, 20), \
+            executor.submit("a", slow, CW, 30)]
+        assert executor.pendingMoves("a") == 2
+
+        # Another motor isn't held up by the one that's busy
+        executor.submit("b", FakeStepper("b", log), CW, 5).result(TIMEOUT)
+        assert log == [("b", CW, 5)]
+
+        gate.set()
+        for future in futures:
+            assert future.result(TIMEOUT) is True
+        assert log[1:] == [("a", CW, 10), ("a", CCW, 20), ("a", CW, 30)]
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_opposite_queued_moves_cancel_out():
+    log = []
+    gate = threading.Event()
+    executor = MotionExecutor(worker_count=1)
+    try:
+        stepper = FakeStepper("a", log, gate)
+        running = executor.submit("a", stepper, CW, 100)
+        assert stepper.started.wait(TIMEOUT)
+
+        opened = executor.submit("a", stepper, CCW, 100)
+        closed = executor.submit("a", stepper, CW, 100)
+        assert opened.done() and opened.cancelled() and opened.result() is True
+        assert closed.done() and closed.cancelled()
+        assert executor.pendingMoves("a") == 0
+
+        # Different step counts don't cancel
+        partial = executor.submit("a", stepper, CCW, 50)
+        assert not partial.done()
+
+        gate.set()
+        assert running.result(TIMEOUT) and partial.result(TIMEOUT)
+        assert not running.cancelled()
+        assert log == [("a", CW, 100), ("a", CCW, 50)]
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_done_callbacks_run_once_and_errors_are_contained(capsys):
+    gate = threading.Event()
+    executor = MotionExecutor(worker_count=1)
+    try:
+        stepper = FakeStepper("a", [], gate)
+        future = executor.submit("a", stepper, CW, 100)
+        called = []
+        future.addDoneCallback(called.append)
+        future.addDoneCallback(lambda future: 1 / 0)
+        assert called == []
+
+        gate.set()
+        future.result(TIMEOUT)
+        executor.shutdown()
+        assert called == [future]
+        assert "ZeroDivisionError" in capsys.readouterr().out
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_shutdown_runs_queued_moves_and_refuses_new_ones():
+    log = []
+    gate = threading.Event()
+    executor = MotionExecutor(worker_count=1)
+    stepper = FakeStepper("a", log, gate)
+    executor.submit("a", stepper, CW, 10)
+    assert stepper.started.wait(TIMEOUT)
+    queued = executor.submit("a", stepper, CCW, 20)
+
+    gate.set()
+    executor.shutdown()
+    assert queued.done()
+    assert log == [("a", CW, 10), ("a", CCW, 20)]
+    with pytest.raises(RuntimeError):
+        executor.submit("a", stepper, CW, 10)
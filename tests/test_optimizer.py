@@ -0,0 +1,107 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import itertools, random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mhiheatexchanger.command import optimizer
+from mhiheatexchanger.command.optimizer import HeatExchangePlanner, \
+    DIRECTION_COLD, DIRECTION_HOT
+
+NAN = float("nan")
+
+
+def _bruteAssignment(cost):
+    '''Stand-in for scipy's linear_sum_assignment on small matrices.'''
+
+    rows = list(range(cost.shape[0]))
+    best = min(itertools.permutations(range(cost.shape[1]), len(rows)), \
+        key=lambda cols: sum(cost[row, col] for row, col in zip(rows, cols)))
+    return np.array(rows), np.array(best)
+
+
+@pytest.fixture(params=["greedy", "assignment"])
+def planner(request, monkeypatch):
+    solver = None if request.param == "greedy" else _bruteAssignment
+    monkeypatch.setattr(optimizer, '_linearSumAssignment', lambda: solver)
+    return HeatExchangePlanner()
+
+
+def test_hot_and_cold_alerts_pair_with_each_other(planner):
+    sensor_ids = [1, 2, 3]
+    plan = planner.plan([1, 2], [DIRECTION_HOT, DIRECTION_COLD], sensor_ids, \
+        [30.0, 10.0, 20.0], [False, False, False])
+
+    assert len(plan) == 1
+    assert set(plan[0]) == set([1, 2])
+
+
+def test_no_sensor_is_in_two_pairs(planner):
+    rng = random.Random(3)
+    sensor_ids = list(range(100, 106))
+    temps = [rng.uniform(5.0, 35.0) for sensor_id in sensor_ids]
+    alert_ids = [100, 101, 102]
+    directions = [DIRECTION_HOT if temps[i] > 20.0 else DIRECTION_COLD \
+        for i in range(3)]
+
+    plan = planner.plan(alert_ids, directions, sensor_ids, temps, \
+        [rng.random() < 0.5 for sensor_id in sensor_ids])
+
+    paired = [sensor_id for pair in plan for sensor_id in pair]
+    assert len(paired) == len(set(paired))
+    temp_of = dict(zip(sensor_ids, temps))
+    direction_of = dict(zip(alert_ids, directions))
+    for alert_id, helper_id in plan:
+        # Helpers are always on the far side of the alerting sensor
+        assert direction_of[alert_id] * (temp_of[alert_id] - temp_of[helper_id]) > 0
+
+
+def test_sensors_without_a_temp_are_skipped(planner):
+    sensor_ids = [1, 2, 3, 4]
+    plan = planner.plan([1, 2], [DIRECTION_HOT, DIRECTION_HOT], sensor_ids, \
+        [30.0, NAN, NAN, 15.0], [False] * 4)
+
+    assert plan == [(1, 4)]
+
+    # Nothing can help when the only candidates haven't been polled
+    assert planner.plan([1], [DIRECTION_HOT], [1, 2], [30.0, NAN], \
+        [False, False]) == []
+
+
+def test_open_valves_and_urgency_break_ties(planner):
+    # Both helpers are equally cold; the one already open costs a move less
+    assert planner.plan([1], [DIRECTION_HOT], [1, 2, 3], [30.0, 15.0, 15.0], \
+        [False, False, True]) == [(1, 3)]
+
+    # One helper for two alerts: the one about to cross gets it
+    plan = planner.plan([1, 2], [DIRECTION_HOT, DIRECTION_HOT], [1, 2, 3], \
+        [30.0, 30.0, 15.0], [False] * 3, alert_lead_times=[60.0, 0.0])
+    assert plan == [(2, 3)]
+
+
+def test_greedy_plan_without_scipy(monkeypatch):
+    monkeypatch.setattr(optimizer, '_linearSumAssignment', lambda: None)
+    planner = HeatExchangePlanner(candidates_per_alert=1)
+    rng = random.Random(8)
+    sensor_ids = list(range(40))
+    temps = [rng.uniform(5.0, 35.0) for sensor_id in sensor_ids]
+    alert_ids = [i for i in sensor_ids if temps[i] > 28.0 or temps[i] < 12.0]
+    directions = [DIRECTION_HOT if temps[i] > 28.0 else DIRECTION_COLD \
+        for i in alert_ids]
+
+    plan = planner.plan(alert_ids, directions, sensor_ids, temps, \
+        [False] * len(sensor_ids))
+
+    # Even one candidate per round answers every alert when helpers abound
+    answered = set(sensor_id for pair in plan for sensor_id in pair)
+    assert set(alert_ids) <= answered
+    assert len(answered) == 2 * len(plan)
+
+
+def test_empty_batches():
+    planner = HeatExchangePlanner()
+
+    assert planner.plan([], [], [1, 2], [20.0, 21.0], [False, False]) == []
+    assert planner.plan([1], [DIRECTION_HOT], [], [], []) == []
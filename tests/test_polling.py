@@ -0,0 +1,75 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import pytest
+
+from mhiheatexchanger.sensor.sensor import Sensor, CENTRAL_CMD_MESSAGE_HOT, \
+    LTHRESHOLD, MAX_POLL_INTERVAL, MIN_POLL_INTERVAL, POLL_CALM_MARGIN, \
+    POLL_INTERVAL, POLL_INTERVAL_GROWTH, POLL_READS_PER_MARGIN, UTHRESHOLD
+
+MIDDLE = (UTHRESHOLD + LTHRESHOLD) / 2.0
+
+
+class StubSensor(object):
+    '''Just what Sensor.updatePollInterval() uses.'''
+
+    def __init__(self, poll_interval=POLL_INTERVAL, threshold_passed=None):
+        self.poll_interval = poll_interval
+        self.threshold_passed = threshold_passed
+        self.latest_temp_c = None
+
+    def poll(self, temp_c):
+        previous_temp_c, self.latest_temp_c = self.latest_temp_c, temp_c
+        return Sensor.updatePollInterval(self, previous_temp_c)
+
+
+def test_first_reading_keeps_the_interval():
+    assert StubSensor().poll(MIDDLE) == POLL_INTERVAL
+
+
+def test_steady_temp_grows_the_interval_up_to_the_max():
+    assert MIDDLE - LTHRESHOLD >= POLL_CALM_MARGIN  # Calm in the middle
+    sensor = StubSensor()
+    sensor.poll(MIDDLE)
+
+    intervals = [sensor.poll(MIDDLE) for i in range(5)]
+    expected, interval = [], POLL_INTERVAL
+    for i in range(5):
+        interval = min(MAX_POLL_INTERVAL, interval * POLL_INTERVAL_GROWTH)
+        expected.append(interval)
+    assert intervals == expected
+    assert intervals[-1] == MAX_POLL_INTERVAL
+
+
+def test_fast_change_resets_the_interval():
+    sensor = StubSensor(poll_interval=MAX_POLL_INTERVAL)
+    sensor.latest_temp_c = MIDDLE - 6.0
+
+    # At this rate the temp reaches a threshold within a few polls
+    rate = 6.0 / MAX_POLL_INTERVAL
+    margin = UTHRESHOLD - MIDDLE
+    assert sensor.poll(MIDDLE) == pytest.approx(max(MIN_POLL_INTERVAL, \
+        margin / rate / POLL_READS_PER_MARGIN))
+    assert sensor.poll_interval < POLL_INTERVAL
+
+
+def test_interval_stays_within_bounds_near_a_threshold():
+    sensor = StubSensor()
+    sensor.latest_temp_c = UTHRESHOLD - 0.1
+    assert sensor.poll(UTHRESHOLD) == MIN_POLL_INTERVAL
+
+    # Once the alert is out, polls don't speed up past POLL_INTERVAL
+    sensor = StubSensor(threshold_passed=CENTRAL_CMD_MESSAGE_HOT)
+    sensor.latest_temp_c = UTHRESHOLD
+    assert sensor.poll(UTHRESHOLD + 0.5) == POLL_INTERVAL
+
+    sensor = StubSensor(poll_interval=MAX_POLL_INTERVAL)
+    sensor.latest_temp_c = MIDDLE
+    assert sensor.poll(MIDDLE) == MAX_POLL_INTERVAL
+
+
+def test_interval_shrinks_approaching_a_threshold():
+    sensor = StubSensor(poll_interval=MAX_POLL_INTERVAL)
+    sensor.latest_temp_c = LTHRESHOLD + 1.0
+    interval = sensor.poll(LTHRESHOLD + 1.0)  # Steady, but half the calm margin
+
+    assert interval == pytest.approx(MAX_POLL_INTERVAL * 1.0 / POLL_CALM_MARGIN)
@@ -0,0 +1,57 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+from mhiheatexchanger.sensor.predictor import TrendPredictor
+from mhiheatexchanger.sensor.sensor import Sensor, UTHRESHOLD, LTHRESHOLD, \
+    CENTRAL_CMD_MESSAGE_COLD, CENTRAL_CMD_MESSAGE_HOT
+
+
+class StubSensor(object):
+    '''Just what Sensor.checkPredictedCrossing() uses.'''
+
+    sensor_id = 1
+
+    def __init__(self, threshold_passed, temps):
+        self.threshold_passed = threshold_passed
+        self.predictor = TrendPredictor()
+        for i, temp_c in enumerate(temps):
+            self.predictor.update(i * 10.0, temp_c)
+        self.alerts = []
+
+    def pollInterval(self):
+        return 10.0
+
+    def handleUpperThresholdPassed(self, crossing_in=0.0):
+        self.alerts.append(CENTRAL_CMD_MESSAGE_HOT)
+
+    def handleLowerThresholdPassed(self, crossing_in=0.0):
+        self.alerts.append(CENTRAL_CMD_MESSAGE_COLD)
+
+
+def _rising_to(threshold):
+    return [threshold - 2.0 + 0.4 * i for i in range(5)]  # 0.4 deg C below
+
+
+def _falling_to(threshold):
+    return [threshold + 2.0 - 0.4 * i for i in range(5)]
+
+
+def test_rising_trend_near_upper_threshold_alerts_early():
+    sensor = StubSensor(None, _rising_to(UTHRESHOLD))
+    assert Sensor.checkPredictedCrossing(sensor)
+    assert sensor.alerts == [CENTRAL_CMD_MESSAGE_HOT]
+
+
+def test_recovering_from_cold_is_not_an_early_hot_alert():
+    sensor = StubSensor(CENTRAL_CMD_MESSAGE_COLD, _rising_to(UTHRESHOLD))
+    assert not Sensor.checkPredictedCrossing(sensor)
+    assert sensor.alerts == []
+
+
+def test_recovering_from_hot_is_not_an_early_cold_alert():
+    sensor = StubSensor(CENTRAL_CMD_MESSAGE_HOT, _falling_to(LTHRESHOLD))
+    assert not Sensor.checkPredictedCrossing(sensor)
+    assert sensor.alerts == []
+
+    sensor = StubSensor(None, _falling_to(LTHRESHOLD))
+    assert Sensor.checkPredictedCrossing(sensor)
+    assert sensor.alerts == [CENTRAL_CMD_MESSAGE_COLD]
@@ -0,0 +1,90 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from mhiheatexchanger.history.query import TempHistory
+from mhiheatexchanger.sensor.templog import TempLogWriter
+
+START = datetime(2026, 10, 15, 22, 0, 0)
+
+
+def _writeHistory(path, hours=30, seed=5):
+    '''Writes readings every 7-60 s for two sensors; returns the lab/s1 ones.'''
+
+    rng = random.Random(seed)
+    writer = TempLogWriter(path, flush_interval=0)
+    readings = []
+    timestamp = START
+    while timestamp < START + timedelta(hours=hours):
+        temp_c = round(rng.uniform(18.0, 26.0), 3)
+        writer.write(timestamp, "lab", "s1", temp_c, temp_c * 1.8 + 32)
+        writer.write(timestamp, "lab", "s2", temp_c + 1, temp_c * 1.8 + 33.8)
+        readings.append((timestamp, temp_c))
+        timestamp += timedelta(seconds=rng.choice([7, 10, 10, 60]))
+    writer.close()
+
+    return readings
+
+
+@pytest.fixture
+def history(tmpdir):
+    readings = _writeHistory(str(tmpdir))
+    return TempHistory(str(tmpdir), block_rows=16), readings
+
+
+RANGES = [
+    (START, START + timedelta(hours=30)),
+    (START + timedelta(minutes=17, seconds=3), START + timedelta(hours=2, seconds=11)),
+    (START + timedelta(hours=1, minutes=59), START + timedelta(hours=2, minutes=1)),  # Across midnight
+    (START + timedelta(hours=5), START + timedelta(hours=5)),
+    (START - timedelta(days=3), START - timedelta(days=2)),
+]
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_readings_match_a_full_scan(history, start, end):
+    temp_history, readings = history
+    assert temp_history.readings("lab", "s1", start, end) == \
+        [(timestamp, temp_c) for timestamp, temp_c in readings \
+        if start <= timestamp <= end]
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_summary_matches_a_full_scan(history, start, end):
+    temp_history, readings = history
+    temps = [temp_c for timestamp, temp_c in readings if start <= timestamp <= end]
+    summary = temp_history.summary("lab", "s1", start, end)
+
+    if not temps:
+        assert summary is None
+        return
+    assert summary['count'] == len(temps)
+    assert summary['min'] == min(temps)
+    assert summary['max'] == max(temps)
+    assert summary['mean'] == pytest.approx(sum(temps) / len(temps))
+
+
+@pytest.mark.parametrize("count", [1, 5, 16, 17, 100000])
+def test_latest_matches_the_tail(history, count):
+    temp_history, readings = history
+    assert temp_history.latest("lab", "s1", count) == readings[-count:]
+
+
+def test_index_picks_up_appended_rows_and_is_reused_from_disk(tmpdir):
+    temp_history = TempHistory(str(tmpdir), block_rows=16)
+    readings = _writeHistory(str(tmpdir), hours=1)
+    end = START + timedelta(days=1)
+    assert len(temp_history.readings("lab", "s1", START, end)) == len(readings)
+
+    writer = TempLogWriter(str(tmpdir), flush_interval=0)
+    writer.write(START + timedelta(hours=1, minutes=30), "lab", "s1", 30.5, 86.9)
+    writer.close()
+    summary = temp_history.summary("lab", "s1", START, end)
+    assert summary['count'] == len(readings) + 1
+    assert summary['max'] == 30.5
+
+    reloaded = TempHistory(str(tmpdir), block_rows=16)
+    assert reloaded.summary("lab", "s1", START, end) == summary
@@ -0,0 +1,44 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import signal, threading
+from datetime import datetime, timedelta
+
+from mhiheatexchanger.history.valvelog import VALVE_OPENED
+from mhiheatexchanger.sensor.sensor import LTHRESHOLD, UTHRESHOLD
+from mhiheatexchanger.sensor.templog import TempLogWriter
+from mhiheatexchanger.sim.replay import replay
+
+
+def _writeHistory(path):
+    writer = TempLogWriter(str(path), flush_interval=0)
+    start = datetime(2017, 4, 29, 23, 50)
+    for i in range(120):  # 20 minutes, across midnight
+        timestamp = start + timedelta(seconds=10 * i)
+        hot = UTHRESHOLD + 2.0 if i >= 30 else UTHRESHOLD - 2.0
+        writer.write(timestamp, "Room_A", "Sensor_1", hot, hot * 1.8 + 32)
+        cold = LTHRESHOLD - 2.0 if i >= 30 else LTHRESHOLD + 2.0
+        writer.write(timestamp, "Room_B", "Sensor_1", cold, cold * 1.8 + 32)
+    writer.close()
+
+
+def test_replay_drives_mission_control_and_cleans_up(tmp_path):
+    _writeHistory(tmp_path)
+    sigint_handler = signal.getsignal(signal.SIGINT)
+    threads = set(threading.enumerate())
+
+    valve_log, results = replay(str(tmp_path), speed=0)
+
+    assert results['sensors'] == 2
+    assert results['readings'] == 240
+    assert results['first'] == datetime(2017, 4, 29, 23, 50)
+    opened = set((room, move) for timestamp, room, sensor, move in valve_log.moves)
+    assert ("Room_A", VALVE_OPENED) in opened
+    assert ("Room_B", VALVE_OPENED) in opened
+    # Both rooms are still off at the end; the valves closed at teardown
+    # aren't replayed moves
+    assert [move for timestamp, room, sensor, move in valve_log.moves] == \
+        [VALVE_OPENED, VALVE_OPENED]
+
+    # No handlers or threads are left behind
+    assert signal.getsignal(signal.SIGINT) == sigint_handler
+    assert [thread.name for thread in set(threading.enumerate()) - threads] == []
@@ -0,0 +1,138 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import glob, os, random, threading, time
+from datetime import datetime, timedelta
+
+import pytest
+
+from mhiheatexchanger.history.query import TempHistory
+from mhiheatexchanger.history.rollups import CompactionJob, Compactor, \
+    compactedBuckets, mergeBuckets, rollUp, ROLLUP_DIRNAME, RESOLUTION_HOUR, \
+    RESOLUTION_MINUTE
+from mhiheatexchanger.sensor.templog import TempLogWriter
+
+START = datetime(2017, 4, 25)  # Ten days, across a month boundary
+DAYS = 10
+NOW = START + timedelta(days=DAYS - 1, hours=12)
+
+
+def _writeHistory(path, seed=3):
+    '''Writes a reading every 61-127 s for one sensor, over DAYS days.'''
+
+    rng = random.Random(seed)
+    writer = TempLogWriter(path, flush_interval=0)
+    readings = []
+    timestamp = START + timedelta(seconds=5)
+    while timestamp < START + timedelta(days=DAYS):
+        temp_c = round(rng.uniform(16.0, 28.0), 2)
+        writer.write(timestamp, "lab", "s1", temp_c, temp_c * 1.8 + 32)
+        readings.append((timestamp, temp_c))
+        timestamp += timedelta(seconds=rng.randint(61, 127))
+    writer.close()
+
+    return readings
+
+
+@pytest.fixture(scope="module")
+def compacted(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp("history"))
+    readings = _writeHistory(path)
+    # Days 7-9 stay raw, 4-6 are kept to the minute, 0-3 to the hour
+    compactor = Compactor(path, raw_days=3, minute_days=5, hour_days=None)
+    assert compactor.compact(now=NOW) == (7, 4)
+
+    return path, readings
+
+
+def _bruteSummary(readings, start, end):
+    temps = [temp_c for timestamp, temp_c in readings if start <= timestamp <= end]
+    if not temps:
+        return None
+    return {'count': len(temps), 'min': min(temps), 'max': max(temps), \
+        'mean': sum(temps) / len(temps)}
+
+
+def _day(day, hours=0, seconds=0):
+    return START + timedelta(days=day, hours=hours, seconds=seconds)
+
+
+# Ranges over compacted days start and end on bucket boundaries (hours),
+# so the rollups answer them exactly; raw days are exact to the second
+RANGES = [
+    (_day(0), _day(DAYS)),  # Everything
+    (_day(1, 5), _day(2, 17, -1)),  # Hour rollups only
+    (_day(5, 3), _day(5, 4, -1)),  # Minute rollups only, one hour
+    (_day(3, 20), _day(4, 6, -1)),  # Hour rollups into minute rollups
+    (_day(6, 22), _day(7, 1, 1234)),  # Minute rollups into raw
+    (_day(2), _day(8, 13, 77)),  # Hour, minute and raw
+    (_day(8, 3, 17), _day(9, 9, 5)),  # Raw only
+    (_day(12), _day(13)),  # Nothing recorded
+]
+
+
+@pytest.mark.parametrize("start,end", RANGES)
+def test_summary_across_compacted_and_raw_days(compacted, start, end):
+    path, readings = compacted
+    expected = _bruteSummary(readings, start, end)
+    summary = TempHistory(path, block_rows=16).summary("lab", "s1", start, end)
+
+    if expected is None:
+        assert summary is None
+        return
+    assert summary['count'] == expected['count']
+    assert summary['min'] == expected['min']
+    assert summary['max'] == expected['max']
+    assert summary['mean'] == pytest.approx(expected['mean'], rel=1e-9)
+
+
+def test_compaction_leaves_the_expected_files(compacted):
+    path, readings = compacted
+    rollup_path = os.path.join(path, ROLLUP_DIRNAME)
+
+    assert len(glob.glob(os.path.join(path, "*_sensorTemps.csv"))) == 3
+    assert len(glob.glob(os.path.join(rollup_path, RESOLUTION_MINUTE, "*"))) == 3
+    assert len(glob.glob(os.path.join(rollup_path, RESOLUTION_HOUR, "*"))) == 2
+
+    # Nothing left to do on a second pass, and nothing is counted twice
+    assert Compactor(path, raw_days=3, minute_days=5, hour_days=None).\
+        compact(now=NOW) == (0, 0)
+    buckets = list(compactedBuckets("lab", "s1", _day(0), _day(7, 0, -1), path))
+    assert sum(bucket[1] for bucket in buckets) == \
+        len([reading for reading in readings if reading[0] < _day(7)])
+
+
+def test_minute_buckets_merge_into_hour_buckets():
+    rng = random.Random(11)
+    readings = [(START + timedelta(seconds=secs), rng.uniform(15.0, 30.0)) \
+        for secs in sorted(rng.sample(range(4 * 3600), 500))]
+
+    direct = list(rollUp(readings, 3600))
+    merged = list(mergeBuckets(rollUp(readings, 60), 3600))
+
+    assert len(direct) == len(merged) == 4
+    for (start, count, low, high, total), bucket in zip(direct, merged):
+        assert (start, count, low, high) == bucket[:4]
+        assert total == pytest.approx(bucket[4])
+
+
+class SlowCompactor(object):
+    def __init__(self):
+        self.started = threading.Event()
+        self.passes = []
+
+    def compact(self):
+        self.started.set()
+        time.sleep(0.2)
+        self.passes.append(True)
+        return 0, 0
+
+
+def test_compaction_job_stop_waits_for_the_pass_in_progress():
+    compactor = SlowCompactor()
+    job = CompactionJob(compactor, interval=3600)
+    job.start()
+    assert compactor.started.wait(5)
+
+    job.stop()
+    assert compactor.passes == [True]
+    assert not job._thread.is_alive()
@@ -0,0 +1,45 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import threading, time
+
+from mhiheatexchanger.command.scheduler import PollScheduler
+
+
+def test_removed_job_queued_behind_a_busy_worker_never_runs():
+    scheduler = PollScheduler(worker_count=1)
+    release = threading.Event()
+    ran = []
+    scheduler.addJob('busy', release.wait, 100)
+    scheduler.addJob('removed', lambda: ran.append(True), 100)
+    scheduler.start()
+    try:
+        time.sleep(0.1)  # 'removed' is now queued behind 'busy'
+        assert scheduler.removeJob('removed')
+        release.set()
+        time.sleep(0.1)
+        assert ran == []
+    finally:
+        release.set()
+        scheduler.stop()
+
+
+def test_remove_job_waits_for_the_run_in_flight():
+    scheduler = PollScheduler(worker_count=1)
+    started, release = threading.Event(), threading.Event()
+    finished = []
+
+    def task():
+        started.set()
+        release.wait()
+        finished.append(True)
+
+    scheduler.addJob('sensor', task, 100)
+    scheduler.start()
+    try:
+        assert started.wait(1)
+        threading.Timer(0.1, release.set).start()
+        scheduler.removeJob('sensor', wait=True)
+        assert finished == [True]
+    finally:
+        release.set()
+        scheduler.stop()
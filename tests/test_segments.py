@@ -0,0 +1,63 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import os
+from datetime import datetime
+
+import pytest
+
+from mhiheatexchanger.history.segments import SegmentWriter, SensorTable, \
+    importCsvFiles, iterSegment, listSegments, toEpoch, SENSOR_TABLE_FILENAME
+from mhiheatexchanger.sensor.templog import TempLogWriter
+
+
+def _readings():
+    return [(datetime(2026, 10, 17, 12, 0, i), "lab" if i % 2 else "hall", \
+        "s{0}".format(i % 2), 20.0 + i / 4.0) for i in range(10)]
+
+
+def test_records_round_trip_through_segments(tmpdir):
+    writer = SegmentWriter(str(tmpdir), flush_rows=4, max_records=3)
+    for timestamp, room, sensor, temp_c in _readings():
+        writer.write(timestamp, room, sensor, temp_c)
+    writer.close()
+
+    segments = listSegments(str(tmpdir))
+    assert len(segments) == 4  # 10 records, 3 per segment
+    records = [record for path in segments for record in iterSegment(path)]
+    table = SensorTable(os.path.join(str(tmpdir), SENSOR_TABLE_FILENAME))
+    assert [(secs, table.names[sensor_id], temp_c) for secs, sensor_id, temp_c \
+        in records] == [(toEpoch(timestamp), (room, sensor), temp_c) for \
+        timestamp, room, sensor, temp_c in _readings()]
+
+
+def test_reopened_writer_appends_to_the_newest_segment(tmpdir):
+    for timestamp, room, sensor, temp_c in _readings()[:2]:
+        writer = SegmentWriter(str(tmpdir), max_records=3)
+        writer.write(timestamp, room, sensor, temp_c)
+        writer.close()
+
+    assert len(listSegments(str(tmpdir))) == 1
+    assert len(list(iterSegment(listSegments(str(tmpdir))[0]))) == 2
+    assert SensorTable(os.path.join(str(tmpdir), SENSOR_TABLE_FILENAME)).ids == \
+        {("hall", "s0"): 0, ("lab", "s1"): 1}
+
+
+def test_csv_import_matches_load_segments(tmpdir):
+    np = pytest.importorskip("numpy")
+    from mhiheatexchanger.history.segments import loadSegments
+
+    csv_dir, segment_dir = str(tmpdir.mkdir("csv")), str(tmpdir.mkdir("seg"))
+    csv_writer = TempLogWriter(csv_dir, flush_interval=0)
+    for timestamp, room, sensor, temp_c in _readings():
+        csv_writer.write(timestamp, room, sensor, temp_c, temp_c * 1.8 + 32)
+    csv_writer.close()
+
+    writer = SegmentWriter(segment_dir)
+    csv_paths = sorted(os.path.join(csv_dir, name) for name in os.listdir(csv_dir))
+    assert importCsvFiles(csv_paths, writer) == 10
+    writer.close()
+
+    records = loadSegments(segment_dir)
+    assert len(records) == 10
+    assert np.allclose(np.sort(records['temp_c']), \
+        sorted(temp_c for _, _, _, temp_c in _readings()))
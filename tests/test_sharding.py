@@ -0,0 +1,71 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+from mhiheatexchanger.command import sharding
+from mhiheatexchanger.command.sharding import ShardSensorProxy, shardRooms
+from mhiheatexchanger.sensor.fleetstate import FleetState
+
+
+class StubFleet(object):
+    def __init__(self):
+        self.fleet_state = FleetState()
+        self.command_queues = [queue.Queue()]
+
+
+def _proxy(fleet, sensor_id=7):
+    return ShardSensorProxy(fleet, 0, {'sensor_id': sensor_id, \
+        'sensor_room': "lab", 'sensor_name': "s1"}, False)
+
+
+def _orders(fleet):
+    orders = []
+    while not fleet.command_queues[0].empty():
+        orders.append(fleet.command_queues[0].get())
+    return orders
+
+
+def test_valve_orders_are_not_repeated_before_the_worker_picks_them_up():
+    fleet = StubFleet()
+    proxy = _proxy(fleet)
+
+    assert proxy.openValve()
+    assert proxy.valve_open
+    assert not proxy.openValve()  # Still in flight to the worker
+    assert _orders(fleet) == [(7, 'open_valve')]
+
+    fleet.fleet_state.valve_open[proxy.slot] = 1  # Worker opened it
+    assert proxy.valve_open and proxy.ordered_valve is None
+    assert proxy.closeValve()
+    assert not proxy.valve_open
+    assert not proxy.closeValve()
+    assert _orders(fleet) == [(7, 'close_valve')]
+
+
+def test_orders_the_worker_turned_down_expire(monkeypatch):
+    fleet = StubFleet()
+    proxy = _proxy(fleet)
+    now = [100.0]
+    monkeypatch.setattr(sharding, '_now', lambda: now[0])
+
+    proxy.openValve()
+    assert proxy.valve_open
+    now[0] += sharding.SHARD_VALVE_ORDER_TIMEOUT + 1
+    assert not proxy.valve_open  # Back to the worker's state
+    assert proxy.openValve()
+
+
+def test_rooms_are_never_split_between_shards():
+    inventory = [{'sensor_id': i, 'sensor_room': "room{0}".format(i % 5)} \
+        for i in range(23)]
+    shards = shardRooms(inventory, 3)
+
+    assert sorted(sensor['sensor_id'] for shard in shards for sensor in shard) == \
+        list(range(23))
+    rooms = [set(sensor['sensor_room'] for sensor in shard) for shard in shards]
+    for i in range(len(rooms)):
+        for j in range(i + 1, len(rooms)):
+            assert not rooms[i] & rooms[j]
@@ -0,0 +1,61 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import random
+
+from mhiheatexchanger.command.tempindex import TempIndex, COMPACT_MIN_ENTRIES
+
+
+def test_coldest_and_hottest_follow_updates_and_removal():
+    index = TempIndex()
+    for sensor_id, temp_c in [(1, 20.0), (2, 25.0), (3, 18.0), (4, 22.0)]:
+        index.update(sensor_id, temp_c)
+
+    assert index.coldest(2) == [(3, 18.0), (1, 20.0)]
+    assert index.hottest(1) == [(2, 25.0)]
+
+    index.update(3, 30.0)  # Old entries for sensor 3 are now stale
+    assert index.coldest(1) == [(1, 20.0)]
+    assert index.hottest(1) == [(3, 30.0)]
+    assert index.temp(3) == 30.0
+
+    assert index.remove(3)
+    assert not index.remove(3)
+    assert index.hottest(1) == [(2, 25.0)]
+    assert index.temp(3) is None
+    assert len(index) == 3
+
+
+def test_bounds_and_exclusions():
+    index = TempIndex()
+    for sensor_id, temp_c in [(1, 20.0), (2, 25.0), (3, 18.0), (4, 22.0)]:
+        index.update(sensor_id, temp_c)
+
+    assert index.coldest(10, below=21.0) == [(3, 18.0), (1, 20.0)]
+    assert index.hottest(10, above=21.0) == [(2, 25.0), (4, 22.0)]
+    assert index.coldest(2, exclude={3}) == [(1, 20.0), (4, 22.0)]
+    # Excluded sensors are still there for the next query
+    assert index.coldest(1) == [(3, 18.0)]
+
+
+def test_matches_a_sorted_scan_after_many_updates():
+    rng = random.Random(3)
+    index = TempIndex()
+    latest = {}
+    for i in range(20 * COMPACT_MIN_ENTRIES):
+        sensor_id = rng.randrange(40)
+        if rng.random() < 0.1:
+            index.remove(sensor_id)
+            latest.pop(sensor_id, None)
+        else:
+            temp_c = round(rng.uniform(15, 30), 2)
+            index.update(sensor_id, temp_c)
+            latest[sensor_id] = temp_c
+
+    by_temp = sorted(latest.items(), key=lambda item: (item[1], item[0]))
+    assert [temp_c for _, temp_c in index.coldest(5)] == \
+        [temp_c for _, temp_c in by_temp[:5]]
+    assert [temp_c for _, temp_c in index.hottest(5)] == \
+        [temp_c for _, temp_c in reversed(by_temp[-5:])]
+    assert len(index) == len(latest)
+    # Stale entries get compacted away rather than piling up
+    assert len(index._min_heap) <= max(COMPACT_MIN_ENTRIES, 2 * len(latest)) + 1
@@ -0,0 +1,106 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import os, threading, time
+from datetime import datetime, timedelta
+
+from mhiheatexchanger.sensor.templog import TempLogWriter, \
+    LOCAL_OUTPUT_FILENAME, TEMP_RECORD_FILE_HEADER
+
+
+def _rows(path):
+    with open(path) as f:
+        return f.readlines()
+
+
+def test_rows_are_buffered_until_flush_rows(tmpdir):
+    writer = TempLogWriter(str(tmpdir), flush_rows=3, flush_interval=0)
+    path = os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-17-10", "lab", "s1"))
+
+    writer.write(datetime(2026, 10, 17, 12, 0, 0), "lab", "s1", 21.5, 70.7)
+    writer.write(datetime(2026, 10, 17, 12, 0, 10), "lab", "s1", 21.6, 70.88)
+    assert not os.path.exists(path)
+
+    writer.write(datetime(2026, 10, 17, 12, 0, 20), "lab", "s1", 21.7, 71.06)
+    assert _rows(path) == [TEMP_RECORD_FILE_HEADER,
+        "2026-17-10,12:00:00,lab,s1,21.5,70.7\n",
+        "2026-17-10,12:00:10,lab,s1,21.6,70.88\n",
+        "2026-17-10,12:00:20,lab,s1,21.7,71.06\n"]
+    writer.close()
+
+
+def test_close_flushes_and_days_roll_over_into_new_files(tmpdir):
+    writer = TempLogWriter(str(tmpdir), flush_rows=100, flush_interval=0)
+    writer.write(datetime(2026, 10, 17, 23, 59, 50), "lab", "s1", 21.5, 70.7)
+    writer.write(datetime(2026, 10, 18, 0, 0, 0), "lab", "s1", 21.6, 70.88)
+    writer.write(datetime(2026, 10, 18, 0, 0, 0), "hall", "s2", 19.0, 66.2)
+    writer.close()
+
+    day1 = _rows(os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-17-10", "lab", "s1")))
+    day2 = _rows(os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-18-10", "lab", "s1")))
+    other = _rows(os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-18-10", "hall", "s2")))
+    assert len(day1) == len(day2) == len(other) == 2
+    assert day2[1].startswith("2026-18-10,00:00:00,lab,s1,21.6")
+
+
+def test_reopened_files_are_appended_to_without_a_second_header(tmpdir):
+    for second in (0, 10):
+        writer = TempLogWriter(str(tmpdir), flush_rows=100, flush_interval=0)
+        writer.write(datetime(2026, 10, 17, 12, 0, second), "lab", "s1", 21.5, 70.7)
+        writer.close()
+
+    rows = _rows(os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-17-10", "lab", "s1")))
+    assert rows.count(TEMP_RECORD_FILE_HEADER) == 1
+    assert len(rows) == 3
+
+
+def test_pending_rows_are_flushed_after_the_interval(tmpdir):
+    writer = TempLogWriter(str(tmpdir), flush_rows=100, flush_interval=0.1)
+    path = os.path.join(str(tmpdir), \
+        LOCAL_OUTPUT_FILENAME.format("2026-17-10", "lab", "s1"))
+    writer.write(datetime(2026, 10, 17, 12, 0, 0), "lab", "s1", 21.5, 70.7)
+    assert not os.path.exists(path)
+
+    deadline = time.time() + 5
+    while not os.path.exists(path):
+        assert time.time() < deadline, "Rows were never flushed"
+        time.sleep(0.02)
+    assert len(_rows(path)) == 2
+
+    writer.close()
+    deadline = time.time() + 5
+    while writer._flusher is not None:  # Flusher thread stops once closed
+        assert time.time() < deadline, "Flusher kept running"
+        time.sleep(0.02)
+
+
+def test_concurrent_writers_lose_and_split_no_rows(tmpdir):
+    writer = TempLogWriter(str(tmpdir), flush_rows=7, flush_interval=0)
+    start = datetime(2026, 10, 17, 12, 0, 0)
+    rows_per_thread = 300
+
+    def writeRows(sensor_name):
+        for i in range(rows_per_thread):
+            writer.write(start + timedelta(seconds=i), "lab", sensor_name, \
+                float(i), 0.0)
+
+    threads = [threading.Thread(target=writeRows, args=("s{0}".format(i % 3),)) \
+        for i in range(6)]  # Two threads per file
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    for sensor_id in range(3):
+        rows = _rows(os.path.join(str(tmpdir), LOCAL_OUTPUT_FILENAME.\
+            format("2026-17-10", "lab", "s{0}".format(sensor_id))))
+        assert rows[0] == TEMP_RECORD_FILE_HEADER
+        assert len(rows) == 1 + 2 * rows_per_thread
+        assert all(len(row.split(",")) == 6 for row in rows)
+        temps = sorted(float(row.split(",")[4]) for row in rows[1:])
+        assert temps == sorted(2 * [float(i) for i in range(rows_per_thread)])
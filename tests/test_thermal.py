@@ -0,0 +1,54 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import pytest
+
+from mhiheatexchanger.sim.benchmark import runBenchmark
+from mhiheatexchanger.sim.thermal import ThermalModel
+
+HEAT_CAPACITY = 1000.0
+
+
+def _heat(model):
+    return sum(HEAT_CAPACITY * room.temp_c for room in model.rooms)
+
+
+def test_heat_exchange_conserves_energy():
+    # No load conductance: the duct is the only path heat can take
+    model = ThermalModel(heat_capacity=HEAT_CAPACITY, load_conductance=0.0, \
+        valve_conductance=10.0, valve_actuation_time=5.0)
+    rooms = [model.addRoom("Room_{0}".format(i), temp_c, 22.0) \
+        for i, temp_c in enumerate((30.0, 14.0, 18.0, 25.0))]
+    for room in rooms[:3]:
+        model.moveValve(room, True)
+    heat = _heat(model)
+
+    for i in range(4):  # Valves still moving
+        model.step(1.0)
+    assert [room.temp_c for room in rooms] == [30.0, 14.0, 18.0, 25.0]
+
+    for i in range(2000):
+        model.step(1.0)
+        assert _heat(model) == pytest.approx(heat)
+
+    # The connected rooms settle at their mean; the closed one is untouched
+    for room in rooms[:3]:
+        assert room.temp_c == pytest.approx(sum((30.0, 14.0, 18.0)) / 3.0)
+    assert rooms[3].temp_c == 25.0
+
+
+def test_single_open_valve_exchanges_nothing():
+    model = ThermalModel(heat_capacity=HEAT_CAPACITY, load_conductance=0.0, \
+        valve_actuation_time=0.0)
+    room = model.addRoom("Room_A", 30.0, 22.0)
+    model.moveValve(room, True)
+    model.step(10.0)
+
+    assert room.valve_open and room.temp_c == 30.0
+
+
+def test_benchmark_run():
+    results = runBenchmark(4, hours=0.05, seed=1)
+
+    assert results['sensors'] == 4
+    assert results['polls'] > 0
+    assert results['sim_seconds'] == pytest.approx(180.0)
@@ -0,0 +1,157 @@
+# Author: "Mars Home Improvement" Space Apps 2017 Team.
+
+import socket, threading, time
+
+from mhiheatexchanger.command.commander import MissionControl
+from mhiheatexchanger.sensor.fleetstate import FleetState
+from mhiheatexchanger.sensor.sensor import CENTRAL_CMD_MESSAGE_HOT
+from mhiheatexchanger.transport import server
+from mhiheatexchanger.transport.client import RemoteCommander
+from mhiheatexchanger.transport.protocol import FramedConnection, \
+    decodeMessages, encodeCommand, encodeTemp, FRAME_HEADER
+from mhiheatexchanger.transport.server import ControllerServer, SensorProxy
+
+TIMEOUT = 5.0
+
+
+class FakeSensor(object):
+    '''Sensor module stand-in that records the commands it's sent.'''
+
+    def __init__(self, sensor_id, sensor_room, temp_c):
+        self.sensor_id = sensor_id
+        self.sensor_room = sensor_room
+        self.sensor_name = "Sensor_1"
+        self.temp_sensor_only = False
+        self.latest_temp_c = temp_c
+        self.valve_open = False
+        self.orders = []
+
+    @staticmethod
+    def respondToMissionControl(self, orders):
+        self.orders.append(orders)
+        self.valve_open = orders == 'open_valve'
+        return True
+
+
+class RecordingConnection(object):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        return True
+
+
+def _waitFor(condition):
+    deadline = time.time() + TIMEOUT
+    while not condition():
+        assert time.time() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_loopback_alert_pairs_a_helper():
+    houston = MissionControl(sensor_inventory=[], start_polling=False)
+    controller = ControllerServer(houston, "127.0.0.1", 0)
+    host, port = controller.start()
+    commander = RemoteCommander(host, port)
+    try:
+        hot = FakeSensor(10, "Room_A", 30.0)
+        cold = FakeSensor(11, "Room_B", 15.0)
+        for sensor in (hot, cold):
+            commander.registerSensor(sensor)
+        assert commander.connected.wait(TIMEOUT)
+        _waitFor(lambda: set(houston.sensors_by_id) == set([10, 11]))
+
+        commander.receiveTempFromSensor(cold)
+        commander.receiveAlertFromSensor(commander, \
+            {'sensor': hot, 'signal': CENTRAL_CMD_MESSAGE_HOT})
+        assert houston.checkAlertQueue(timeout=TIMEOUT)
+
+        _waitFor(lambda: hot.orders and cold.orders)
+        assert cold.orders == ['open_valve']
+        assert hot.orders == ['open_valve']
+        assert houston.favor_ledger.helpers(10) == [11]
+        assert houston.favor_ledger.valveRefCount(11) == 1
+    finally:
+        commander.close()
+        controller.stop()
+        houston.shutdown()
+
+    # Dropping the connection disconnects the remote sensors
+    _waitFor(lambda: not houston.sensors_by_id)
+
+
+def test_stale_report_does_not_revert_a_valve_order(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(server, '_now', lambda: now[0])
+    connection = RecordingConnection()
+    proxy = SensorProxy(connection, FleetState(), 7, "lab", "s1", False)
+
+    assert proxy.openValve()
+    proxy.updateState(21.0, False)  # Sent before the order arrived
+    assert proxy.valve_open
+    assert not proxy.openValve()
+    assert len(connection.sent) == 1
+
+    proxy.updateState(21.5, True)  # Sensor has it now
+    assert proxy.ordered_valve is None
+    proxy.updateState(22.0, False)  # Closed by the sensor itself
+    assert not proxy.valve_open
+
+    proxy.openValve()
+    now[0] += server.TRANSPORT_VALVE_ORDER_TIMEOUT + 1
+    proxy.updateState(22.0, False)  # Turned down; take the sensor's word
+    assert not proxy.valve_open
+
+
+def _pair(handler=lambda connection, message: None, on_close=None, \
+    flush_interval=0):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    peer = socket.create_connection(listener.getsockname(), TIMEOUT)
+    sock = listener.accept()[0]
+    listener.close()
+    return FramedConnection(sock, handler, on_close, flush_interval), peer
+
+
+def _readFrame(sock):
+    data = b""
+    while len(data) < FRAME_HEADER.size:
+        data += sock.recv(FRAME_HEADER.size - len(data))
+    length, = FRAME_HEADER.unpack(data)
+    payload = b""
+    while len(payload) < length:
+        payload += sock.recv(length - len(payload))
+    return payload
+
+
+def test_unknown_code_closes_the_connection():
+    closed = threading.Event()
+    connection, peer = _pair(on_close=lambda connection: closed.set())
+    try:
+        bad = bytearray(encodeCommand(3, 'open_valve'))
+        bad[-1] = 99  # No such command
+        peer.sendall(FRAME_HEADER.pack(len(bad)) + bytes(bad))
+
+        assert closed.wait(TIMEOUT)
+        assert connection.closed
+    finally:
+        connection.close()
+        peer.close()
+
+
+def test_writer_batches_for_the_whole_flush_interval():
+    connection, peer = _pair(flush_interval=0.3)
+    try:
+        start = time.time()
+        for i in range(5):
+            connection.send(encodeTemp(i, 20.0 + i, False))
+            time.sleep(0.02)
+
+        messages = list(decodeMessages(_readFrame(peer)))
+        assert time.time() - start >= 0.25
+        assert [message[1] for message in messages] == list(range(5))
+    finally:
+        connection.close()
+        peer.close()